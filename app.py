@@ -13,10 +13,10 @@ import qrcode
 
 # --- Imports (Logic) ---
 try:
-    from logic.drive_utils import load_data_from_drive, read_confirmed_sheet
+    from logic.drive_utils import read_confirmed_sheet, is_confirmed, confirmed_sheet_version
     from logic.production_logic import calculate_production_events
     from logic.inventory import calculate_inventory, confirm_production, cancel_confirmation
-    from logic.master_loader import convert_csv_to_json, convert_dataframe_to_json, load_master_json, merge_event_targets
+    from logic.master_loader import convert_csv_to_json, load_master_json
     from components.CatalogCard import render_catalog_card
     from logic import zeus_chat
     import logic.master_loader
@@ -25,8 +25,12 @@ try:
     importlib.reload(zeus_chat)
     importlib.reload(logic.master_loader)
     importlib.reload(logic.bi_dashboard)
-    from logic.bi_dashboard import calc_countdown, calc_sales_gap, calc_remaining_hours, calc_today_tasks, calc_material_alerts, calc_dev_slot, calc_burnup_data, calc_burndown_hours
+    from logic.kpi_engine import compute_kpis
     from logic.zeus_chat import build_system_prompt, get_chat_response
+    from logic.master_loader import refresh_master
+    from logic.process_times import register_version
+    from logic import calendar_scheduler, data_layer, perf, upload_queue
+    from logic.data_products import ProductRegistry
 except ImportError as e:
     st.error(f"Modules not found: {e}")
     st.stop()
@@ -207,7 +211,20 @@ else:
     st.markdown("※クラウド環境のため、日程の直接編集は別画面（GAS）から行ってください。")
 
 # --- Data Loading ---
-master_df, log_df, event_sheet_names, excel_bytes = load_data_from_drive()
+# 最後に正しく読めたマスタ・ログを即座に使い、古ければバックグラウンドで取り直す（初回のみ待つ）
+if data_layer.status()['generation'] == 0:
+    with st.spinner("🔵 Google Driveからデータを取得中..."):
+        drive_snapshot = data_layer.get_snapshot()
+else:
+    drive_snapshot = data_layer.get_snapshot()
+if drive_snapshot:
+    master_df = drive_snapshot['master_df']
+    log_df = drive_snapshot['log_df']
+    event_sheet_names = drive_snapshot['event_sheet_names']
+    excel_bytes = drive_snapshot['excel_bytes']
+else:
+    master_df, log_df, event_sheet_names, excel_bytes = None, None, [], None
+    st.warning(f"⚠️ Driveからのデータ取得に失敗しました: {data_layer.status()['last_error']}")
 
 # イベントシート情報をsession_stateに保存
 if event_sheet_names:
@@ -218,15 +235,25 @@ if excel_bytes:
 # --- Master Data (Drive連携: DF → JSON 自動変換) ---
 if master_df is not None:
     # Driveから取得できた場合、JSONを自動更新・保存
-    # convert_dataframe_to_json 内部で merge_event_targets も呼ばれるように excel_bytes を渡す
-    master_list = convert_dataframe_to_json(master_df, force=True, excel_bytes=excel_bytes)
+    # ワークブックのコンテンツハッシュでメモ化されており、未変更の再実行では
+    # ディスク書き込みもDriveアップロードも発生しない
+    # 手動更新ボタンの後に届いた版は、ハッシュが同じでも再変換・合算を実行する
+    force_refresh = drive_snapshot['generation'] > st.session_state.get('force_master_after', drive_snapshot['generation'])
+    master_list, master_version, refreshed = refresh_master(master_df, excel_bytes, force=force_refresh)
+    if force_refresh:
+        st.session_state.pop('force_master_after', None)
     st.session_state['master_data'] = master_list
-    if master_list:
+    st.session_state['master_version'] = master_version
+    # 工程時間テーブルはマスタの版ごとに1度だけ構築し、KPI/Zeus で共有する
+    register_version(master_list, master_version, rebuild=refreshed)
+    if master_list and refreshed:
         st.toast(f"📦 マスタデータ更新: {len(master_list)} 件 (from Drive)")
 else:
     # Drive取得失敗時は既存JSONまたはローカルCSVフォールバック
     master_list = convert_csv_to_json()
     st.session_state['master_data'] = master_list
+    # 版の分からないマスタなので、前回の版で KPI のメモを引かせない
+    st.session_state.pop('master_version', None)
 
 # --- DEBUG: Verify Loaded Data ---
 with st.sidebar.expander("🛠️ Debug Information"):
@@ -249,40 +276,59 @@ with st.sidebar.expander("🛠️ Debug Information"):
     else:
         st.write("Master Data: Empty")
 
-# --- イベント目標のマージ (自動合算) は convert_dataframe_to_json 内で実行済み ---
+with st.sidebar.expander("⏱️ Performance"):
+    perf_summary = perf.summary()
+    if perf_summary['stages']:
+        st.caption("処理段階ごとの所要時間（直近の記録, ms）")
+        st.dataframe(
+            pd.DataFrame(perf_summary['stages']).set_index('stage'),
+            use_container_width=True,
+        )
+    else:
+        st.write("計測データなし")
+    if perf_summary['counters']:
+        st.json(perf_summary['counters'])
+
+# --- イベント目標のマージ (自動合算) は refresh_master → convert_dataframe_to_json 内で実行済み ---
 # (以前の明示的な呼び出しコードは削除されました)
 
 # --- Calendar & Tasks Data Loading (Zeus Aggressive Suggestions) ---
-@st.cache_data(ttl=3600)
-def fetch_and_cache_calendar_data():
-    try:
-        from logic.calendar_agent import run as run_calendar_agent
-        # Drive同期は不要、ローカル（エフェメラル）へのJSON出力を有効にして既存ロジックと互換性を保つ
-        return run_calendar_agent(output_local=True, output_drive=False)
-    except Exception as e:
-        print(f"Error executing calendar agent: {e}")
-        return {}
-
-calendar_data_cache = fetch_and_cache_calendar_data() or {}
-
-# --- Logic Execution ---
-production_events = []
-inventory_df = pd.DataFrame()
-
-# 1. Production Events (Strict Column Logic - 14 cols)
-if log_df is not None and not log_df.empty:
+# カレンダーエージェントはバックグラウンドスレッドで定期実行し、ページ表示では
+# 最後に書き出されたスナップショット（atlas_integrated_data.json）だけを読む
+calendar_scheduler.start()
+
+# --- Logic Execution (Data Products) ---
+# ここでは算出方法と入力の版だけを登録し、各ページが必要とした時に初めて算出する。
+# 結果は入力の版（Driveスナップショットの世代・CONFIRMEDログの版）ごとにメモ化される
+drive_generation = drive_snapshot['generation'] if drive_snapshot else None
+products = ProductRegistry()
+
+def _production_events():
+    # 1. Production Events (Strict Column Logic - 14 cols)
+    if log_df is None or log_df.empty:
+        return []
     with st.spinner("Processing Production Logs..."):
-        production_events = calculate_production_events(log_df)
-
-# 2. Inventory (導出方式: H列 + CONFIRMED - 販売)
-confirmed_df = pd.DataFrame()
-try:
-    confirmed_df = read_confirmed_sheet()
-except Exception:
-    confirmed_df = pd.DataFrame()
+        return calculate_production_events(log_df, incremental=True)
 
-if master_df is not None and log_df is not None:
-    inventory_df = calculate_inventory(master_df, log_df, confirmed_df)
+def _confirmed_df():
+    try:
+        return read_confirmed_sheet()
+    except Exception:
+        return pd.DataFrame()
+
+def _inventory_df():
+    # 2. Inventory (導出方式: H列 + CONFIRMED - 販売)
+    if master_df is None or log_df is None:
+        return pd.DataFrame()
+    # スナップショットは全セッションで共有するため、列を追加する calculate_inventory には浅いコピーを渡す
+    return calculate_inventory(master_df.copy(deep=False), log_df.copy(deep=False), products.get('confirmed'))
+
+products.register('production_events', lambda: drive_generation, _production_events)
+products.register('confirmed', confirmed_sheet_version, _confirmed_df)
+products.register('inventory', lambda: (drive_generation, confirmed_sheet_version()) if drive_generation else None,
+                  _inventory_df)
+# カレンダーはスナップショットのファイルが変わるまで read_snapshot 側でパース結果を共有している
+products.register('calendar', lambda: None, calendar_scheduler.read_snapshot)
 
 # --- Navigation ---
 if IS_LOCAL:
@@ -293,6 +339,17 @@ else:
     PAGES = ["📊 BI Dashboard", "📋 Inspector", "📦 Catalog", "📦 Stock", "⚔️ 軍師Zeus"]
     default_page = "📊 BI Dashboard"
 
+# 各ページが使うデータ製品（ここに無いものはそのページでは算出しない）
+PAGE_PRODUCTS = {
+    "📊 BI Dashboard": ("calendar",),
+    "📅 Strategic Mind": ("production_events",),
+    "📋 Inspector": (),
+    "📦 Catalog": ("inventory",),
+    "🏭 Input": (),
+    "📦 Stock": ("production_events", "inventory", "confirmed"),
+    "⚔️ 軍師Zeus": (),  # 在庫は質問を送信した時にだけ算出する
+}
+
 if 'current_page' not in st.session_state:
     st.session_state.current_page = default_page
 
@@ -367,8 +424,10 @@ with st.sidebar:
                 
                 if changed:
                     try:
-                        with open(event_master_path, 'w', encoding='utf-8') as f:
-                            json.dump(event_list, f, ensure_ascii=False, indent=2)
+                        # Drive同期はワーカーが後でファイルを読むため、書きかけを読まれないよう丸ごと差し替える
+                        from logic.drive_utils import write_atomic
+                        write_atomic(event_master_path,
+                                     json.dumps(event_list, ensure_ascii=False, indent=2).encode('utf-8'))
                         
                         # Drive同期（ローカル環境のみ実行。クラウドは_is_cloud()ガードで自動スキップ）
                         try:
@@ -376,7 +435,7 @@ with st.sidebar:
                             if upload_to_drive and EVENT_MASTER_DRIVE_ID:
                                 _ok, _msg = upload_to_drive(event_master_path, EVENT_MASTER_DRIVE_ID)
                                 if _ok:
-                                    st.success("✅ 応募ステータスを保存 & Drive同期しました")
+                                    st.success("✅ 応募ステータスを保存しました（Drive同期はバックグラウンドで実行）")
                                 else:
                                     st.warning(f"⚠️ ローカル保存OK、Drive同期失敗: {_msg}")
                             else:
@@ -391,29 +450,25 @@ with st.sidebar:
             pass
 
     st.divider()
+    drive_status = data_layer.status()
+    drive_caption = f"🗂️ Driveデータ: {calendar_scheduler.format_age(drive_status['age_sec'])}に取得"
+    if drive_status['refreshing']:
+        drive_caption += "（更新中…）"
+    elif drive_status['last_error']:
+        drive_caption += f"（前回の更新に失敗: {drive_status['last_error']}）"
+    st.caption(drive_caption)
+    sync_status = upload_queue.status()
+    if sync_status['pending']:
+        st.caption(f"☁️ Drive同期待ち: {sync_status['pending']}件")
+    elif sync_status['last_error']:
+        st.caption(f"⚠️ Drive同期に失敗: {sync_status['last_error']}")
     if st.button("🔄 最新データに更新", use_container_width=True, help="Driveから最新のメニュー.xlsxを再取得します"):
-        try:
-            with st.spinner("Google Driveから最新マスタを取得中..."):
-                # キャッシュを破棄してDriveから強制再取得
-                st.cache_data.clear()
-                new_master_df, _, new_sheets, new_bytes = load_data_from_drive()
-                if new_master_df is not None:
-                    master_list = convert_dataframe_to_json(new_master_df, force=True)
-                    
-                    # 更新後即座に合算を実行
-                    master_list = merge_event_targets(master_list, new_bytes, None)
-                    
-                    st.session_state['master_data'] = master_list
-                    if new_sheets:
-                        st.session_state['event_sheet_names'] = new_sheets
-                    if new_bytes:
-                        st.session_state['excel_bytes'] = new_bytes
-                    st.success(f"✅ マスタデータ更新完了（{len(master_list)} 件）")
-                else:
-                    st.warning("⚠️ Driveからのデータ取得に失敗しました。認証情報を確認してください。")
-        except Exception as e:
-            st.error(f"❌ データ更新中にエラーが発生しました: {e}")
-        st.rerun()
+        # 表示中のデータはそのままに、バックグラウンドで再取得する（届いた版で再変換・合算）
+        st.session_state['force_master_after'] = drive_status['generation']
+        if data_layer.refresh_async(force=True) or drive_status['refreshing']:
+            st.toast("🔄 Driveから最新データを取得しています。完了後の再表示で反映されます")
+        else:
+            st.warning("⚠️ データ更新を開始できませんでした")
 
     st.divider()
     # QRコード表示はローカル時のみ（クラウドではローカルIP不要）
@@ -434,10 +489,14 @@ with st.sidebar:
         st.image(buf, caption="カメラで読み取ってアクセス", width=200)
         st.code(app_url, language=None)
 
+# ページが宣言したデータ製品だけを算出する（入力が同じならメモを返す）
+page_data = products.require(PAGE_PRODUCTS.get(selection, ()))
+
 # ---------------------------------------------------------
 # TAB 1: STRATEGIC MIND UI (Integrated)
 # ---------------------------------------------------------
 if selection == "📅 Strategic Mind":
+    production_events = page_data['production_events']
     if not IS_LOCAL:
         # クラウド環境ではStrategic Mind（iframe）は利用不可
         st.warning("☁️ この機能はローカル環境専用です。")
@@ -537,6 +596,7 @@ elif selection == "📋 Inspector":
 # ---------------------------------------------------------
 elif selection == "📦 Catalog":
     st.header("📦 Inventory Catalog")
+    inventory_df = page_data['inventory']
     if not inventory_df.empty:
         cols = st.columns(3)
         for i, row in inventory_df.iterrows():
@@ -574,35 +634,17 @@ elif selection == "🏭 Input":
 # ---------------------------------------------------------
 elif selection == "📦 Stock":
     st.header("📦 在庫管理 & 生産確定")
+    production_events = page_data['production_events']
+    inventory_df = page_data['inventory']
+    confirmed_df = page_data['confirmed']
     
     # --- 在庫確定キュー ---
     st.subheader("🔄 生産確定 (CONFIRMEDシートへ記録)")
     st.caption("確定ボタンを押すと、アトラスのスプレッドシートに確定記録が追記されます。マスタファイルは変更しません。")
     
-    # 済みの Source Hashes を収集 (Dedup用: Hash Base)
-    confirmed_hashes = set()
-    if not confirmed_df.empty and 'SOURCE_HASHES' in confirmed_df.columns:
-        for val in confirmed_df['SOURCE_HASHES'].dropna().astype(str):
-            for h in val.split(','):
-                if h.strip():
-                    confirmed_hashes.add(h.strip())
-    
     # 未確定イベントのみフィルタリング
-    valid_events = []
-    for evt in production_events:
-        props = evt.get('extendedProps', {})
-        src_hashes = props.get('source_hashes', '')
-        
-        # イベントに含まれるハッシュが一つでも確定済みなら「確定済み」とみなす
-        is_confirmed = False
-        if src_hashes:
-            for h in src_hashes.split(','):
-                if h.strip() in confirmed_hashes:
-                    is_confirmed = True
-                    break
-        
-        if not is_confirmed:
-            valid_events.append(evt)
+    # イベントに含まれるハッシュが一つでも確定済みなら「確定済み」とみなす（確定済みハッシュ索引で判定）
+    valid_events = [evt for evt in production_events if not is_confirmed(evt)]
             
     if valid_events:
         high_conf = [e for e in valid_events if e.get('extendedProps', {}).get('confidence') == 'high']
@@ -713,8 +755,10 @@ elif selection == "⚔️ 軍師Zeus":
     col1, col2 = st.columns([6, 1])
     with col1:
         master_count = len(st.session_state.get("master_data", []))
-        inv_count = len(inventory_df) if not inventory_df.empty else 0
-        st.caption(f"📦 コンテキスト: マスタ {master_count} 件 / 在庫 {inv_count} 件")
+        # 在庫は質問送信時に算出する（算出済みの版があれば件数を表示）
+        memo_inventory = products.peek('inventory')
+        inv_label = f"{len(memo_inventory)} 件" if memo_inventory is not None else "質問時に算出"
+        st.caption(f"📦 コンテキスト: マスタ {master_count} 件 / 在庫 {inv_label}")
     with col2:
         if st.button("🔄 リセット", use_container_width=True):
             st.session_state.zeus_messages = []
@@ -761,6 +805,7 @@ elif selection == "⚔️ 軍師Zeus":
                 if master_data and 'event_data' in master_data[0]:
                     current_event = master_data[0]['event_data'].get('アクティブイベント', current_event)
                 all_events = st.session_state.get('event_sheet_names', [])
+                inventory_df = products.get('inventory')
                 # System Prompt構築（ユーザー入力を渡して検索させる）
                 system_prompt = build_system_prompt(
                     st.session_state['master_data'],
@@ -804,7 +849,29 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # カレンダー統合データ読み込み（キャッシュから取得）
     # ==========================
+    calendar_data_cache, calendar_age_sec = page_data['calendar']
     calendar_data = calendar_data_cache
+    cal_col1, cal_col2 = st.columns([4, 1])
+    with cal_col1:
+        cal_status = calendar_scheduler.status()
+        cal_caption = f"📅 カレンダー: {calendar_scheduler.format_age(calendar_age_sec)}に更新"
+        if calendar_age_sec is None:
+            cal_caption = "📅 カレンダー: バックグラウンドで取得中です（完了後の再表示で反映）"
+        elif cal_status['running']:
+            cal_caption += "（更新中）"
+        elif cal_status['last_error']:
+            cal_caption += f"（前回の更新に失敗: {cal_status['last_error']}）"
+        st.caption(cal_caption)
+    with cal_col2:
+        if st.button("🔄 カレンダー再取得", use_container_width=True):
+            calendar_scheduler.request_refresh()
+            st.toast("📅 カレンダーの再取得を開始しました")
+
+    # 全KPIを同じスナップショットで1回だけ算出（マスタ・カレンダーの版が変わらない再実行ではキャッシュを返す）
+    kpis = compute_kpis(master_data, excel_bytes=st.session_state.get('excel_bytes'),
+                        calendar_data=calendar_data_cache,
+                        master_version=st.session_state.get('master_version'),
+                        calendar_version=calendar_scheduler.snapshot_version())
 
     # ==========================
     # 🚨 Google Tasks アラート（期日付きタスク）
@@ -902,7 +969,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # KPI 1: カウントダウン
     # ==========================
-    countdown = calc_countdown()
+    countdown = kpis['countdown']
     if countdown:
         days = countdown['days_remaining']
         # 緊急度による色分け
@@ -926,7 +993,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # KPI 2: 目標売上ギャップ
     # ==========================
-    gap = calc_sales_gap(master_data)
+    gap = kpis['sales_gap']
     st.markdown(f"""
     <div class="bi-card bi-revenue">
         <h3>💰 目標売上 vs 現在完成額</h3>
@@ -939,7 +1006,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # バーンアップチャート
     # ==========================
-    burnup = calc_burnup_data(master_data, excel_bytes=st.session_state.get('excel_bytes'))
+    burnup = kpis['burnup']
     if burnup and burnup['actual']:
         st.markdown("#### 📈 目標 vs 実績 フィーバーチャート")
 
@@ -1010,7 +1077,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # 🔥 バーンダウンチャート（残り総作業時間）
     # ==========================
-    burndown = calc_burndown_hours(master_data, calendar_data=calendar_data_cache)
+    burndown = kpis['burndown']
     if burndown and burndown['actual']:
         st.markdown("#### 🔥 バーンダウンチャート — 理想 vs 現実")
         is_calendar_linked = burndown.get('capacity_source') == 'calendar'
@@ -1218,6 +1285,12 @@ elif selection == "📊 BI Dashboard":
             <div class="bi-sub" style="margin-top: 0.3rem; font-weight: 700; color: {'#ff8a80' if '🔴' in gap_msg else '#a5d6a7'};">{gap_msg}</div>
         </div>
         """, unsafe_allow_html=True)
+
+        # what-if: 土日に作業時間を足した場合の完了予定
+        what_if = [w for w in burndown.get('what_if', []) if w['days_saved'] > 0]
+        if what_if:
+            st.caption("💡 もし土日に作業時間を追加したら: " + " / ".join(
+                f"{w['label']} → {w['finish_date']}（{w['days_saved']}日短縮）" for w in what_if))
     else:
         st.info("🔥 バーンダウンチャート: 履歴データが不足しています。スキャンを蓄積すると表示されます。")
 
@@ -1226,7 +1299,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # KPI 3: 残り加工時間 & 効率ルート
     # ==========================
-    hours = calc_remaining_hours(master_data)
+    hours = kpis['remaining_hours']
     col_a, col_b = st.columns(2)
     with col_a:
         st.metric("🔧 NC残時間", f"{hours['total_nc_hours']}h")
@@ -1257,7 +1330,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # KPI 4: 本日の最適タスク
     # ==========================
-    tasks = calc_today_tasks(master_data)
+    tasks = kpis['today_tasks']
 
     if tasks['all_done']:
         st.markdown(f"""
@@ -1298,7 +1371,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # KPI 5: 材料発注アラート
     # ==========================
-    mat_info = calc_material_alerts(master_data)
+    mat_info = kpis['material_alerts']
 
     if mat_info['alerts']:
         for alert_msg in mat_info['alerts']:
@@ -1320,7 +1393,7 @@ elif selection == "📊 BI Dashboard":
     # ==========================
     # KPI 6: 新作開発枠
     # ==========================
-    dev = calc_dev_slot(master_data)
+    dev = kpis['dev_slot']
     if dev['is_ok']:
         card_cls = "bi-ok"
     elif dev['progress_ratio'] >= 0.5:
@@ -0,0 +1,91 @@
+"""
+bench_production_events.py - calculate_production_events のベンチマーク
+
+10万行の合成 Atlas ログに対し、旧実装（グループごとの iterrows + 行単位ハッシュ）と
+現行の列単位実装の処理時間を比較し、出力が同一であることも確認する。
+あわせて増分モード（incremental=True）で100行追記した場合の再計算時間を測る。
+
+実行:
+    python benchmarks/bench_production_events.py [行数]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.production_logic import calculate_production_events, determine_side, hash_row
+from generators import generate_log
+
+DEFAULT_ROWS = 100_000
+
+
+def legacy_calculate_production_events(log_df):
+    """比較用: 行単位 (iterrows) の旧実装。"""
+    events = []
+    df = log_df.copy()
+    df['dt_parsed'] = pd.to_datetime(df['TIMESTAMP'], errors='coerce')
+    df = df.dropna(subset=['dt_parsed'])
+    df = df[df['dt_parsed'] >= datetime.now() - timedelta(days=90)]
+    df['LOG_DATE'] = df['dt_parsed'].dt.strftime('%Y-%m-%d')
+    for (d_str, proj_name, part_name), group in df.groupby(['LOG_DATE', 'PROJECT', 'PART']):
+        sides = set()
+        hashes = []
+        for _, row in group.iterrows():
+            sides.add(determine_side(row['PATH']))
+            hashes.append(hash_row(row))
+        high = '表' in sides and '裏' in sides
+        events.append({
+            "title": f"{proj_name} ({part_name})" if part_name else proj_name,
+            "start": d_str,
+            "color": "#28a745" if high else "#ffc107",
+            "extendedProps": {
+                "details": f"Sides: {list(sides)}",
+                "project": proj_name,
+                "part": part_name,
+                "confidence": "high" if high else "low",
+                "source_hashes": ",".join(hashes),
+                "atlas_timestamp": group['dt_parsed'].max().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        })
+    return events
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    log_df = generate_log(n_rows)
+    print(f"[bench] 合成ログ {n_rows} 行")
+
+    legacy, legacy_sec = _timed(legacy_calculate_production_events, log_df)
+    current, current_sec = _timed(calculate_production_events, log_df)
+
+    print(f"[bench] 旧実装 (iterrows): {legacy_sec:.2f}s / {len(legacy)} events")
+    print(f"[bench] 現行 (列単位):     {current_sec:.2f}s / {len(current)} events")
+    print(f"[bench] 高速化: x{legacy_sec / current_sec:.1f}")
+    print(f"[bench] 出力一致: {legacy == current}")
+    if legacy != current:
+        sys.exit(1)
+
+    # 増分モード: 初回（全件）→ 100行追記後の再計算
+    appended = pd.concat([log_df, generate_log(100, days=0, seed=1)], ignore_index=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_path = os.path.join(tmp_dir, 'production_events_state.json')
+        _, first_sec = _timed(calculate_production_events, log_df, True, state_path)
+        incremental, inc_sec = _timed(calculate_production_events, appended, True, state_path)
+    print(f"[bench] 増分モード 初回: {first_sec:.2f}s / 100行追記後: {inc_sec:.2f}s")
+    print(f"[bench] 増分結果一致: {incremental == calculate_production_events(appended)}")
+
+
+if __name__ == "__main__":
+    main()
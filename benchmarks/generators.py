@@ -0,0 +1,205 @@
+"""
+generators.py - ベンチマーク用の合成データ生成
+
+本番と同じ形式のデータを、件数を指定して決定的に（seed 固定で）生成する。
+  - generate_workbook:  メニュー.xlsx（商品マスタ / イベントシート × M / イベントマスタ）
+  - generate_log:       Atlas ログ CSV（TIMESTAMP, PROJECT, PART, PATH, MESSAGE）
+  - generate_confirmed: CONFIRMED ログ（drive_utils.CONFIRMED_HEADERS 形式）
+  - generate_history:   history_summary.json（旧形式の JSON 配列。initial 1件 + scan × N）
+  - generate_calendar:  calendar_agent の出力（daily_schedule のみ）
+"""
+
+import io
+import json
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+MASTER_COLUMNS = [
+    'ID', 'カテゴリ', '商品名', '部位', '単価1', '在庫数', '取数', '材料種別', 'NCマシン',
+    '生地_固定', '生地_単体', '生地乾燥h', 'NC表_粗分', 'NC表_仕分', 'NC裏_粗分', 'NC裏_仕分',
+    '切離分', '組付接着分', '組付乾燥h', '嵌合調整分', '機械加工分', '研磨手加分', '組立玉入分',
+]
+EVENT_MASTER_COLUMNS = ['イベント名', '対象シート', 'アクティブ', '表示', '締切', '開催日', '会場', 'ブース', '搬入', '備考']
+CATEGORIES = ['万年筆', 'ボールペン', 'ペンレスト', 'キーホルダー']
+MATERIALS = ['エボナイト', 'アクリル', '黒檀', 'セルロイド']
+
+
+def product_name(i):
+    return f"商品{i:03d}"
+
+
+def master_rows(n_products, seed=0):
+    """
+    商品マスタの行を作る。3商品に1つは鞘付き（本体・鞘の2行、別ID）。
+
+    Returns:
+        list[dict]: MASTER_COLUMNS をキーに持つ行
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_products):
+        parts = ['本体', '鞘'] if i % 3 == 0 else ['本体']
+        for j, part in enumerate(parts):
+            rows.append({
+                'ID': f"P{i:04d}{'S' if j else ''}",
+                'カテゴリ': CATEGORIES[i % len(CATEGORIES)],
+                '商品名': product_name(i),
+                '部位': part,
+                '単価1': rng.randrange(3000, 60000, 500),
+                '在庫数': rng.randint(0, 8),
+                '取数': rng.choice([1, 1, 2, 4]),
+                '材料種別': rng.choice(MATERIALS),
+                'NCマシン': rng.choice(['Both', 'CNC-A', 'CNC-B']),
+                '生地_固定': rng.randint(0, 20),
+                '生地_単体': rng.randint(0, 20),
+                '生地乾燥h': rng.choice([0, 12, 24]),
+                'NC表_粗分': rng.randint(5, 40),
+                'NC表_仕分': rng.randint(5, 50),
+                'NC裏_粗分': rng.randint(0, 30),
+                'NC裏_仕分': rng.randint(0, 40),
+                '切離分': rng.randint(0, 10),
+                '組付接着分': rng.randint(0, 15),
+                '組付乾燥h': rng.choice([0, 4, 8]),
+                '嵌合調整分': rng.randint(0, 30),
+                '機械加工分': rng.randint(0, 20),
+                '研磨手加分': rng.randint(5, 40),
+                '組立玉入分': rng.randint(0, 30),
+            })
+    # 本番のマスタ同様、末尾に ID の無い合計行を置く
+    rows.append({'商品名': '合計'})
+    return rows
+
+
+def event_sheet_name(k):
+    return f"イベント{k + 1:02d}"
+
+
+def generate_workbook(n_products, n_event_sheets, seed=0, now=None):
+    """
+    メニュー.xlsx 相当のワークブックを生成する。
+
+    - 商品マスタ: master_rows() の内容
+    - イベントシート: 1行目タイトル、2行目ヘッダー（C列 ID / F列 目標 / G列 在庫）
+    - イベントマスタ: 全シートを表示対象とし、先頭の半分をアクティブにする
+
+    Returns:
+        bytes: xlsx のバイナリ
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    rows = master_rows(n_products, seed)
+    ids = [r['ID'] for r in rows if r.get('ID')]
+
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
+        pd.DataFrame(rows, columns=MASTER_COLUMNS).to_excel(writer, sheet_name='商品マスタ', index=False)
+
+        events = []
+        for k in range(n_event_sheets):
+            sheet = event_sheet_name(k)
+            picked = rng.sample(ids, k=max(1, len(ids) * 2 // 3))
+            body = [[f"{sheet} 目標表", None, None, None, None, None, None],
+                    ['No', None, 'ID', '商品名', '部位', '目標', '在庫']]
+            for n, pid in enumerate(picked, start=1):
+                body.append([n, None, pid, None, None, rng.randint(0, 10), rng.randint(0, 6)])
+            pd.DataFrame(body).to_excel(writer, sheet_name=sheet, index=False, header=False)
+
+            event_date = (now + timedelta(days=30 + 21 * k)).strftime('%Y-%m-%d')
+            events.append({
+                'イベント名': f"合成イベント{k + 1}",
+                '対象シート': sheet,
+                'アクティブ': 'TRUE' if k < max(1, n_event_sheets // 2) else 'FALSE',
+                '表示': 'TRUE',
+                '締切': (now + timedelta(days=10 + 21 * k)).strftime('%Y-%m-%d'),
+                '開催日': event_date,
+                '会場': '東京ビッグサイト',
+                'ブース': f"A-{k + 1:02d}",
+                '搬入': event_date,
+                '備考': None,
+            })
+        pd.DataFrame(events, columns=EVENT_MASTER_COLUMNS).to_excel(writer, sheet_name='イベントマスタ', index=False)
+    return buf.getvalue()
+
+
+def generate_log(n_rows, n_projects=60, days=80, seed=0):
+    """Atlas ログ形式 (TIMESTAMP, PROJECT, PART, PATH, MESSAGE) の合成データを作る。"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    projects = [product_name(i) for i in range(n_projects)]
+    parts = ['', '本体', '鞘']
+    paths = ['{p}_Face_Op1.nc', '{p}_Back_Op2.nc', '{p}_omote.nc', '{p}_base.nc', '{p}_misc.nc']
+    rows = []
+    for _ in range(n_rows):
+        project = rng.choice(projects)
+        ts = now - timedelta(days=rng.randint(0, days), minutes=rng.randint(0, 1439))
+        rows.append({
+            'TIMESTAMP': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'PROJECT': project,
+            'PART': rng.choice(parts),
+            'PATH': rng.choice(paths).format(p=project),
+            'MESSAGE': rng.choice(['OK', 'Done', '']),
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_confirmed(n_rows, n_projects=60, seed=0):
+    """CONFIRMED ログ（PRODUCED 9割 / CANCEL 1割）の合成データを作る。"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for _ in range(n_rows):
+        ts = now - timedelta(minutes=rng.randint(0, 60 * 24 * 80))
+        rows.append({
+            'TIMESTAMP': ts.strftime('%Y-%m-%d %H:%M:%S'),
+            'PROJECT': product_name(rng.randrange(n_projects)),
+            'PART': rng.choice(['本体', '鞘']),
+            'ACTION': 'CANCEL' if rng.random() < 0.1 else 'PRODUCED',
+            'SOURCE_HASHES': ",".join(f"{rng.getrandbits(256):064x}" for _ in range(rng.randint(1, 3))),
+            'ATLAS_TIMESTAMP': ts.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return pd.DataFrame(rows, columns=['TIMESTAMP', 'PROJECT', 'PART', 'ACTION', 'SOURCE_HASHES', 'ATLAS_TIMESTAMP'])
+
+
+def generate_history(product_ids, n_scans, days=180, seed=0):
+    """
+    history_summary.json（旧形式の JSON 配列）を生成する。
+    先頭が type="initial"、以降は数商品ずつ在庫が増減する scan が時系列に並ぶ。
+
+    Returns:
+        bytes: UTF-8 の JSON
+    """
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(1, n_scans)
+    details = {pid: {"count": rng.randint(0, 5), "target": rng.randint(0, 10)} for pid in product_ids}
+
+    entries = []
+    for n in range(n_scans + 1):
+        if n:
+            for pid in rng.sample(product_ids, k=min(len(product_ids), rng.randint(1, 4))):
+                details[pid] = {"count": max(0, details[pid]["count"] + rng.choice([-1, 1, 1, 2])),
+                                "target": details[pid]["target"]}
+        ts = start + step * n
+        entries.append({
+            "type": "initial" if n == 0 else "scan",
+            "timestamp": ts.isoformat(),
+            "date": ts.strftime('%Y-%m-%d'),
+            "total_current": sum(d["count"] for d in details.values()),
+            "total_target": sum(d["target"] for d in details.values()),
+            "details": {pid: dict(d) for pid, d in details.items()},
+        })
+    return json.dumps(entries, ensure_ascii=False).encode('utf-8')
+
+
+def generate_calendar(days=60, seed=0):
+    """calendar_agent の出力のうち、バーンダウンが使う daily_schedule だけを生成する。"""
+    rng = random.Random(seed)
+    today = datetime.now()
+    return {
+        "daily_schedule": [{
+            "date": (today + timedelta(days=d)).strftime('%Y-%m-%d'),
+            "total_free_hours": rng.choice([0, 2, 4, 6, 8]),
+        } for d in range(days)]
+    }
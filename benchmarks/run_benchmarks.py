@@ -0,0 +1,268 @@
+"""
+run_benchmarks.py - 主要な処理段階のオフライン・ベンチマーク（回帰検知つき）
+
+generators.py の合成データ（メニュー.xlsx / Atlas ログ / CONFIRMED ログ / history_summary.json）を
+一時ディレクトリに用意し、Drive に接続せずに以下の段階の所要時間を測る。
+
+  parse_workbook              メニュー.xlsx のパース（ワークブックキャッシュを空にした状態）
+  convert_dataframe_to_json   商品マスタ DataFrame → マスタ（ストア・JSON 書き出し込み）
+  merge_event_targets         イベント目標の合算 + 履歴追記（パース済みワークブックを共有）
+  calculate_inventory         在庫計算
+  calculate_production_events 生産イベント算出（全件）
+  calc_burndown_hours         バーンダウン（履歴 × マスタの行列計算 + 理想線）
+  build_system_prompt         Zeus のシステムプロンプト構築
+
+各段階を --repeat 回実行し、中央値を baseline.json の中央値と比べる。
+許容幅 (--tolerance) と MIN_REGRESSION_MS の両方を超えて遅くなった段階があれば終了コード 1 を返す。
+データ規模が baseline と異なる場合は比較しない。
+
+実行:
+    python benchmarks/run_benchmarks.py                    # 計測して baseline と比較
+    python benchmarks/run_benchmarks.py --update-baseline  # 計測結果を baseline として保存
+    python benchmarks/run_benchmarks.py --products 50 --log-rows 10000 --scans 200  # 小規模で試す
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from contextlib import ExitStack, redirect_stdout
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic import bi_dashboard, history_store, master_loader, perf, workbook, zeus_chat
+from logic.inventory import calculate_inventory
+from logic.production_logic import calculate_production_events
+from generators import (
+    event_sheet_name, generate_calendar, generate_confirmed, generate_history, generate_log,
+    generate_workbook, master_rows,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+DEFAULT_PARAMS = {
+    'products': 300,
+    'event_sheets': 6,
+    'log_rows': 100_000,
+    'confirmed_rows': 5_000,
+    'scans': 3_000,
+}
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25   # 中央値が baseline の 1.25 倍を超えたら回帰
+MIN_REGRESSION_MS = 5.0    # 数ms の揺れは回帰とみなさない
+
+
+def _sandbox(stack, data_dir):
+    """各モジュールのデータパスを一時ディレクトリに向け、Drive 連携を無効にする。"""
+    targets = [
+        (master_loader, 'DATA_DIR', data_dir),
+        (master_loader, 'JSON_PATH', os.path.join(data_dir, 'production_master.json')),
+        (master_loader, 'REFRESH_STAMP_PATH', os.path.join(data_dir, 'master_refresh_stamp.json')),
+        (master_loader, 'drive_utils', None),
+        (master_loader, 'upload_to_drive', None),
+        (history_store, 'HISTORY_PATH', os.path.join(data_dir, 'history_summary.jsonl')),
+        (history_store, 'LEGACY_HISTORY_PATH', os.path.join(data_dir, 'history_summary.json')),
+        (history_store, 'EXPORT_PATH', os.path.join(data_dir, 'history_summary_export.json')),
+        (bi_dashboard, 'DATA_DIR', data_dir),
+        (zeus_chat, 'DATA_DIR', data_dir),
+        (perf, 'METRICS_PATH', os.path.join(data_dir, 'perf_metrics.jsonl')),
+    ]
+    for module, name, value in targets:
+        stack.enter_context(patch.object(module, name, value))
+    # バッファに残った計測は、パスの差し替えが戻る前（ExitStack は逆順に戻す）に一時ディレクトリへ書き出す
+    stack.callback(perf.flush)
+    # クラウド判定で Drive から履歴を取りに行かないようにする
+    stack.enter_context(patch('logic.drive_utils._is_cloud', return_value=False))
+    # 各段階のログ出力（システムプロンプト全文など）は計測結果の表示を埋もれさせるので捨てる
+    devnull = stack.enter_context(open(os.devnull, 'w', encoding='utf-8'))
+    stack.enter_context(redirect_stdout(devnull))
+
+
+def prepare(params, data_dir):
+    """合成データを生成し、各段階の入力を返す。"""
+    excel_bytes = generate_workbook(params['products'], params['event_sheets'])
+    product_ids = [r['ID'] for r in master_rows(params['products']) if r.get('ID')]
+    with open(os.path.join(data_dir, 'history_summary.json'), 'wb') as f:
+        f.write(generate_history(product_ids, params['scans']))
+    return {
+        'excel_bytes': excel_bytes,
+        'log_df': generate_log(params['log_rows'], n_projects=params['products']),
+        'confirmed_df': generate_confirmed(params['confirmed_rows'], n_projects=params['products']),
+        'calendar': generate_calendar(),
+        'event_sheets': [event_sheet_name(k) for k in range(params['event_sheets'])],
+    }
+
+
+def _measure(func, repeat):
+    """func を repeat 回実行し、(最後の戻り値, [ms, ...]) を返す。"""
+    result = None
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, samples
+
+
+def run(params, repeat):
+    """
+    全段階を計測する。
+
+    Returns:
+        dict: {stage: {'median_ms', 'min_ms', 'max_ms', 'runs'}}
+    """
+    data_dir = tempfile.mkdtemp(prefix='atlas_bench_')
+    samples = {}
+    try:
+        with ExitStack() as stack:
+            _sandbox(stack, data_dir)
+            inputs = prepare(params, data_dir)
+            excel_bytes = inputs['excel_bytes']
+            log_df = inputs['log_df']
+
+            def parse_workbook():
+                with workbook._cache_lock:
+                    workbook._cache.clear()
+                wb = workbook.get_workbook(excel_bytes)
+                for name in wb.sheet_names:
+                    wb.sheet(name)
+                return wb
+
+            wb, samples['parse_workbook'] = _measure(parse_workbook, repeat)
+            master_df = wb.sheet('商品マスタ')
+
+            master_list, samples['convert_dataframe_to_json'] = _measure(
+                lambda: master_loader.convert_dataframe_to_json(master_df), repeat)
+            master_list, samples['merge_event_targets'] = _measure(
+                lambda: master_loader.merge_event_targets(master_list, excel_bytes), repeat)
+            inventory_df, samples['calculate_inventory'] = _measure(
+                lambda: calculate_inventory(master_df.copy(deep=False), log_df.copy(deep=False),
+                                            inputs['confirmed_df']), repeat)
+            _, samples['calculate_production_events'] = _measure(
+                lambda: calculate_production_events(log_df), repeat)
+
+            event_master = zeus_chat.load_event_master()
+            history_source = bi_dashboard._ensure_history_store()
+            _, samples['calc_burndown_hours'] = _measure(
+                lambda: bi_dashboard.calc_burndown_hours(master_list, event_master, inputs['calendar'],
+                                                         history_source=history_source), repeat)
+            _, samples['build_system_prompt'] = _measure(
+                lambda: zeus_chat.build_system_prompt(master_list, inventory_df, inputs['event_sheets'][0],
+                                                      inputs['event_sheets'], user_message="商品001 の残りは？"),
+                repeat)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        stage: {
+            'median_ms': round(statistics.median(values), 2),
+            'min_ms': round(min(values), 2),
+            'max_ms': round(max(values), 2),
+            'runs': len(values),
+        }
+        for stage, values in samples.items()
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    baseline と比べて遅くなった段階を返す。
+
+    Returns:
+        list[tuple]: [(stage, baseline_ms, current_ms), ...]
+    """
+    regressions = []
+    for stage, current in results.items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base:
+            continue
+        limit = base['median_ms'] * (1 + tolerance)
+        if current['median_ms'] > limit and current['median_ms'] - base['median_ms'] > MIN_REGRESSION_MS:
+            regressions.append((stage, base['median_ms'], current['median_ms']))
+    return regressions
+
+
+def _load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_baseline(path, params, repeat, results):
+    payload = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': params,
+        'repeat': repeat,
+        'stages': results,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Atlas Hub オフライン・ベンチマーク")
+    parser.add_argument('--products', type=int, default=DEFAULT_PARAMS['products'])
+    parser.add_argument('--event-sheets', type=int, default=DEFAULT_PARAMS['event_sheets'])
+    parser.add_argument('--log-rows', type=int, default=DEFAULT_PARAMS['log_rows'])
+    parser.add_argument('--confirmed-rows', type=int, default=DEFAULT_PARAMS['confirmed_rows'])
+    parser.add_argument('--scans', type=int, default=DEFAULT_PARAMS['scans'])
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="計測結果を baseline として保存する")
+    args = parser.parse_args(argv)
+
+    params = {
+        'products': args.products,
+        'event_sheets': args.event_sheets,
+        'log_rows': args.log_rows,
+        'confirmed_rows': args.confirmed_rows,
+        'scans': args.scans,
+    }
+    print(f"[bench] params={params} repeat={args.repeat}")
+    results = run(params, args.repeat)
+
+    baseline = _load_baseline(args.baseline)
+    comparable = baseline is not None and baseline.get('params') == params
+    print(f"\n{'stage':<30} {'median':>10} {'min':>10} {'baseline':>10}")
+    for stage, r in results.items():
+        base = baseline['stages'].get(stage, {}).get('median_ms') if comparable else None
+        base_str = f"{base:.1f}" if base is not None else '-'
+        print(f"{stage:<30} {r['median_ms']:>10.1f} {r['min_ms']:>10.1f} {base_str:>10}")
+
+    if args.update_baseline:
+        _save_baseline(args.baseline, params, args.repeat, results)
+        print(f"\n[bench] baseline を更新しました: {args.baseline}")
+        return 0
+    if baseline is None:
+        print("\n[bench] baseline がありません（--update-baseline で作成）")
+        return 0
+    if not comparable:
+        print(f"\n[bench] データ規模が baseline と異なるため比較しません (baseline: {baseline.get('params')})")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n[bench] ❌ 回帰を検出 (許容 +{args.tolerance:.0%}):")
+        for stage, base, current in regressions:
+            print(f"  {stage}: {base:.1f}ms → {current:.1f}ms (x{current / base:.2f})")
+        return 1
+    print(f"\n[bench] ✅ 回帰なし (許容 +{args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,8 +3,8 @@ import json
 from datetime import datetime, timedelta
 import sys
 
-# File path
-HISTORY_FILE = r'c:\Users\yjing\.gemini\atlas-hub\data\history_summary.json'
+# File path（履歴ストアは history_summary.jsonl に移行済み。JSON配列は Drive 同期用の書き出しを読む）
+HISTORY_FILE = r'c:\Users\yjing\.gemini\atlas-hub\data\history_summary_export.json'
 TARGET_DATE = '2026-02-17'
 
 def parse_timestamp(ts):
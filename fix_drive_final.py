@@ -1,6 +1,7 @@
 import json
 import os
 from googleapiclient.http import MediaFileUpload
+from logic import history_store
 from logic.drive_utils import authenticate, download_content
 
 def fix_drive():
@@ -16,7 +17,8 @@ def fix_drive():
     except Exception as e:
         print(f"Could not delete duplicate (maybe already deleted): {e}")
 
-    local_path = os.path.abspath('data/history_summary.json')
+    # Drive 上は旧形式（JSON配列）のまま。ローカルの JSON Lines ストアから書き出して送る
+    local_path = os.path.abspath(history_store.export_json_array())
     print(f"2. Updating the target file ({id_target}) with {local_path}...")
     try:
         media = MediaFileUpload(local_path, mimetype='application/json', resumable=True)
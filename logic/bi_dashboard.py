@@ -13,13 +13,17 @@ KPI:
   6. 新作開発枠判定
 """
 
-import io
 import json
 import os
 import math
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+from logic.workbook import get_workbook
+from logic import history_store, perf
+from logic.process_times import get_process_table
+
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
 
 
@@ -48,36 +52,60 @@ def _get_active_event(event_master=None):
     return None
 
 
-def _calc_item_times(item):
-    """アイテムの1個あたりNC/手作業/合計時間(分)を算出"""
-    proc = item.get('process', {})
-    nc = proc.get('nc', {})
-    prep = proc.get('prep', {})
-    assembly = proc.get('assembly', {})
-    manual = proc.get('manual', {})
-
-    nc_min = (
-        nc.get('front_rough_min', 0)
-        + nc.get('front_finish_min', 0)
-        + nc.get('back_rough_min', 0)
-        + nc.get('back_finish_min', 0)
-    )
-    manual_min = (
-        prep.get('unit_min', 0)
-        + assembly.get('cut_off_min', 0)
-        + assembly.get('bonding_min', 0)
-        + manual.get('fitting_min', 0)
-        + manual.get('machine_work_min', 0)
-        + manual.get('sanding_min', 0)
-        + manual.get('assembly_min', 0)
-    )
-    return nc_min, manual_min, nc_min + manual_min
+class _MasterColumns:
+    """
+    master_data を KPI 計算用の列 (NumPy 配列) に1パスで展開したもの。
+    工程時間は process_times のテーブル（リスト順と同じ行）をそのまま使う。
+    """
+
+    def __init__(self, master_data):
+        self.items = list(master_data or [])
+        reqs = [item.get('requirements', {}) for item in self.items]
+        self.price = np.array([item.get('price', 0) for item in self.items])
+        self.target_quantity = np.array([item.get('target_quantity', 0) for item in self.items])
+        self.event_sheet_stock = np.array([item.get('event_sheet_stock', 0) for item in self.items])
+        self.remaining = np.array([item.get('remaining', 0) for item in self.items])
+        self.yield_per_board = np.array([r.get('yield', 1) or 1 for r in reqs], dtype=np.float64)
+        self.material = [r.get('material_type', '不明') for r in reqs]
+
+        self.table = table = get_process_table(master_data)
+        if len(table) == len(self.items):
+            self.nc_min, self.manual_min, self.total_min = table.nc_min, table.manual_min, table.total_min
+        else:
+            times = np.array([table.unit_times(item) for item in self.items], dtype=np.float64).reshape(-1, 3)
+            self.nc_min, self.manual_min, self.total_min = times[:, 0], times[:, 1], times[:, 2]
+
+
+_columns_cache = {}  # {id(master_data): (master_data, _MasterColumns)} 直近1件
+
+
+def _master_columns(master_data):
+    """同じ master_data に対する KPI 計算で列の展開を1回で済ませる。"""
+    master_data = master_data if master_data is not None else []
+    cached = _columns_cache.get(id(master_data))
+    if cached and cached[0] is master_data and len(cached[1].items) == len(master_data):
+        return cached[1]
+    columns = _MasterColumns(master_data)
+    _columns_cache.clear()
+    _columns_cache[id(master_data)] = (master_data, columns)
+    return columns
+
+
+def _seq_sum(values):
+    """
+    先頭から順に足し込んだ合計（Python の sum と同じ丸め結果になる）。
+    np.sum はペアワイズ加算で末尾の桁が変わりうるため累積和の末尾を使う。
+    """
+    if len(values) == 0:
+        return 0
+    return np.cumsum(values)[-1].item()
 
 
 # =============================================================
 # KPI 1: イベントカウントダウン
 # =============================================================
 
+@perf.timed('calc_countdown')
 def calc_countdown(now=None, event_master=None):
     """
     アクティブイベントまでの残り日数を算出。
@@ -114,6 +142,7 @@ def calc_countdown(now=None, event_master=None):
 # KPI 2: 目標売上ギャップ
 # =============================================================
 
+@perf.timed('calc_sales_gap')
 def calc_sales_gap(master_data):
     """
     目標売上と現在完成額のギャップを算出。
@@ -127,15 +156,10 @@ def calc_sales_gap(master_data):
             "progress_ratio": float (0.0 ~ 1.0),
         }
     """
-    target_rev = 0
-    current_rev = 0
-
-    for item in (master_data or []):
-        price = item.get('price', 0)
-        if price <= 0:
-            continue
-        target_rev += item.get('target_quantity', 0) * price
-        current_rev += item.get('event_sheet_stock', 0) * price
+    cols = _master_columns(master_data)
+    mask = cols.price > 0
+    target_rev = _seq_sum(cols.target_quantity[mask] * cols.price[mask])
+    current_rev = _seq_sum(cols.event_sheet_stock[mask] * cols.price[mask])
 
     progress = current_rev / target_rev if target_rev > 0 else 0.0
     return {
@@ -150,6 +174,7 @@ def calc_sales_gap(master_data):
 # KPI 3: 残り総加工時間 & 最適生産ルート
 # =============================================================
 
+@perf.timed('calc_remaining_hours')
 def calc_remaining_hours(master_data):
     """
     残り数量 × 工程時間で総残り加工時間を算出。
@@ -166,19 +191,17 @@ def calc_remaining_hours(master_data):
             ],  # 上位5件
         }
     """
-    total_nc = 0
-    total_manual = 0
-    efficiency_items = []
-
-    for item in (master_data or []):
-        remaining = item.get('remaining', 0)
-        if remaining <= 0:
-            continue
-
-        nc_min, manual_min, total_min = _calc_item_times(item)
-        total_nc += remaining * nc_min
-        total_manual += remaining * manual_min
+    cols = _master_columns(master_data)
+    rows = np.flatnonzero(cols.remaining > 0)
+    remaining = cols.remaining[rows]
+    total_nc = _seq_sum(remaining * cols.nc_min[rows])
+    total_manual = _seq_sum(remaining * cols.manual_min[rows])
 
+    efficiency_items = []
+    for pos, nc_min, manual_min, total_min in zip(
+            rows.tolist(), cols.nc_min[rows].tolist(),
+            cols.manual_min[rows].tolist(), cols.total_min[rows].tolist()):
+        item = cols.items[pos]
         price = item.get('price', 0)
         # 効率 = 1個あたり売上 / 1個あたり所要時間
         yen_per_min = price / total_min if total_min > 0 else 0
@@ -187,7 +210,7 @@ def calc_remaining_hours(master_data):
             "name": item.get('name', '?'),
             "part": item.get('part', '?'),
             "id": item.get('id', ''),
-            "remaining": remaining,
+            "remaining": item.get('remaining', 0),
             "yen_per_min": round(yen_per_min, 1),
             "total_min_per_unit": round(total_min, 1),
             "nc_min_per_unit": round(nc_min, 1),
@@ -210,6 +233,7 @@ def calc_remaining_hours(master_data):
 # KPI 4: 本日の最適タスク (Go/No-Go)
 # =============================================================
 
+@perf.timed('calc_today_tasks')
 def calc_today_tasks(master_data, current_hour=None):
     """
     今から着手すべき作業指示を提示。
@@ -233,25 +257,10 @@ def calc_today_tasks(master_data, current_hour=None):
     nc_available = not is_night
 
     # 残りがあるアイテムを抽出
-    remaining_items = []
-    for item in (master_data or []):
-        rem = item.get('remaining', 0)
-        if rem <= 0:
-            continue
-        nc_min, manual_min, total_min = _calc_item_times(item)
-        remaining_items.append({
-            "name": item.get('name', '?'),
-            "part": item.get('part', '?'),
-            "id": item.get('id', ''),
-            "remaining": rem,
-            "nc_min": nc_min,
-            "manual_min": manual_min,
-            "total_min": total_min,
-            "price": item.get('price', 0),
-            "nc_machine_type": item.get('requirements', {}).get('nc_machine_type', 'Both'),
-        })
+    cols = _master_columns(master_data)
+    rows = np.flatnonzero(cols.remaining > 0)
 
-    if not remaining_items:
+    if len(rows) == 0:
         return {
             "is_night_mode": is_night,
             "nc_available": nc_available,
@@ -261,16 +270,35 @@ def calc_today_tasks(master_data, current_hour=None):
             "message": "🎉 全品目の目標を達成済み！",
         }
 
-    # NC推奨: NC時間があるアイテムで、残数が多い順
-    nc_candidates = [i for i in remaining_items if i['nc_min'] > 0]
-    nc_candidates.sort(key=lambda x: x['remaining'], reverse=True)
+    def _task(pos):
+        item = cols.items[pos]
+        # 表示用の値はテーブルから引く（整数の工程時間は "25分/個" と整数のまま表示する）
+        nc_min, manual_min, total_min = cols.table.unit_times(item)
+        return {
+            "name": item.get('name', '?'),
+            "part": item.get('part', '?'),
+            "id": item.get('id', ''),
+            "remaining": item.get('remaining', 0),
+            "nc_min": nc_min,
+            "manual_min": manual_min,
+            "total_min": total_min,
+            "price": item.get('price', 0),
+            "nc_machine_type": item.get('requirements', {}).get('nc_machine_type', 'Both'),
+        }
+
+    def _most_remaining(candidates):
+        # 残数が最大のアイテム（同数ならマスタ順で先のもの）
+        if len(candidates) == 0:
+            return None
+        return _task(candidates[np.argmax(cols.remaining[candidates])])
 
+    # NC推奨: NC時間があるアイテムで、残数が多い順
+    nc_candidates = rows[cols.nc_min[rows] > 0]
     # 手作業推奨: 手作業時間があるアイテムで、残数が多い順
-    manual_candidates = [i for i in remaining_items if i['manual_min'] > 0]
-    manual_candidates.sort(key=lambda x: x['remaining'], reverse=True)
+    manual_candidates = rows[cols.manual_min[rows] > 0]
 
-    recommended_nc = nc_candidates[0] if nc_candidates and nc_available else None
-    recommended_manual = manual_candidates[0] if manual_candidates else None
+    recommended_nc = _most_remaining(nc_candidates) if nc_available else None
+    recommended_manual = _most_remaining(manual_candidates)
 
     # メッセージ構築
     if is_night:
@@ -301,6 +329,7 @@ def calc_today_tasks(master_data, current_hour=None):
 # KPI 5: 材料発注アラート
 # =============================================================
 
+@perf.timed('calc_material_alerts')
 def calc_material_alerts(master_data, days_remaining=None, event_master=None):
     """
     材料種別ごとに必要量を算出し、不足予測を提示。
@@ -318,24 +347,31 @@ def calc_material_alerts(master_data, days_remaining=None, event_master=None):
         countdown = calc_countdown(event_master=event_master)
         days_remaining = countdown['days_remaining'] if countdown else 30
 
-    # 材料種別ごとに集計
-    material_map = {}  # {material: {"remaining": int, "boards": float, "items": [...]}}
-
-    for item in (master_data or []):
-        remaining = item.get('remaining', 0)
-        if remaining <= 0:
-            continue
-
-        material = item.get('requirements', {}).get('material_type', '不明')
-        yield_per_board = item.get('requirements', {}).get('yield', 1) or 1
-
-        if material not in material_map:
-            material_map[material] = {"remaining_count": 0, "boards_needed": 0, "items": []}
-
-        material_map[material]["remaining_count"] += remaining
-        material_map[material]["boards_needed"] += remaining / yield_per_board
-        material_map[material]["items"].append(
-            f"{item.get('name', '?')}({item.get('part', '?')}) ×{remaining}"
+    # 材料種別ごとに集計（初出順）
+    cols = _master_columns(master_data)
+    rows = np.flatnonzero(cols.remaining > 0)
+    materials = [cols.material[pos] for pos in rows.tolist()]
+    codes = {}
+    group = np.array([codes.setdefault(mat, len(codes)) for mat in materials], dtype=np.int64)
+
+    remaining = cols.remaining[rows]
+    remaining_count = np.zeros(len(codes), dtype=remaining.dtype)
+    boards_needed = np.zeros(len(codes), dtype=np.float64)
+    # ufunc.at は添字順に加算するため、旧実装の逐次加算と同じ結果になる
+    np.add.at(remaining_count, group, remaining)
+    np.add.at(boards_needed, group, remaining / cols.yield_per_board[rows])
+
+    material_map = {}  # {material: {"remaining_count": int, "boards_needed": float, "items": [...]}}
+    for mat, code in codes.items():
+        material_map[mat] = {
+            "remaining_count": remaining_count[code].item(),
+            "boards_needed": boards_needed[code].item(),
+            "items": [],
+        }
+    for pos, mat in zip(rows.tolist(), materials):
+        item = cols.items[pos]
+        material_map[mat]["items"].append(
+            f"{item.get('name', '?')}({item.get('part', '?')}) ×{item.get('remaining', 0)}"
         )
 
     # アラート判定
@@ -365,6 +401,7 @@ def calc_material_alerts(master_data, days_remaining=None, event_master=None):
 # KPI 6: 新作開発枠
 # =============================================================
 
+@perf.timed('calc_dev_slot')
 def calc_dev_slot(master_data, event_master=None, now=None):
     """
     進捗に余裕がある場合のみ、新規開発OKサインを表示。
@@ -408,14 +445,17 @@ def calc_dev_slot(master_data, event_master=None, now=None):
 # KPI 7: バーンアップチャート（目標 vs 実績）
 # =============================================================
 
-def _load_history_summary():
-    """
-    history_summary.json を読み込む。
-    ローカルファイルが存在しない場合は、Google DriveからHISTORY_SUMMARY_DRIVE_IDを
-    使って最新データをダウンロードし、ローカルにキャッシュする。
+def _ensure_history_store():
     """
-    path = os.path.join(DATA_DIR, 'history_summary.json')
+    ローカルの履歴ストア (history_summary.jsonl) を使える状態にする。
+    ローカルに存在しない場合（およびクラウド環境）は、Google Driveから
+    HISTORY_SUMMARY_DRIVE_IDを使って最新データをダウンロードし、ローカルにキャッシュする。
 
+    Returns:
+        tuple: (ok, raw)
+            ok: ローカルストアから読める場合 True
+            raw: キャッシュ保存に失敗した場合のダウンロード内容（それ以外は None）
+    """
     # クラウド環境（Streamlit Cloud）かどうかを判定し、クラウドなら常にDriveから最新を取得
     try:
         from logic.drive_utils import _is_cloud
@@ -423,43 +463,121 @@ def _load_history_summary():
     except Exception:
         is_cloud = False
 
-    # 1. ローカル環境時のみ、ローカルファイルがあればそれを使用
-    if not is_cloud and os.path.exists(path):
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            pass
+    # 1. ローカル環境時のみ、ローカルストアがあればそれを使用
+    if not is_cloud and history_store.exists():
+        return True, None
 
     # 2. ローカルに無い場合、DriveからHISTORY_SUMMARY_DRIVE_IDでダウンロード
     try:
         from logic.drive_utils import authenticate, download_content, HISTORY_SUMMARY_DRIVE_ID
         if not HISTORY_SUMMARY_DRIVE_ID:
-            return []
+            return False, None
 
         service = authenticate()
         if not service:
-            return []
+            return False, None
 
         stream = download_content(service, HISTORY_SUMMARY_DRIVE_ID, 'application/json')
         if not stream:
-            return []
+            return False, None
 
-        data = json.loads(stream.read().decode('utf-8'))
+        raw = stream.read()
 
-        # ローカルにキャッシュ保存
+        # ローカルにキャッシュ保存（旧形式のJSON配列でも JSON Lines に変換される）
         try:
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            history_store.restore_from_bytes(raw)
+            return True, None
         except Exception:
-            pass  # キャッシュ失敗は無視
-
-        return data
+            return False, raw
     except ImportError:
-        return []
+        return False, None
     except Exception:
+        return False, None
+
+
+def _load_history_matrix(start=None, history_source=None):
+    """
+    履歴ストアの details 付きスナップショットを (スナップショット × 商品ID) の行列で読み込む。
+    ローカルストアから読む場合、行列はファイルが変わるまで history_store にキャッシュされる。
+
+    Args:
+        start: 'YYYY-MM-DD'（この日付以降の行だけ。None は全件）
+        history_source: 取得済みの _ensure_history_store() の結果（None の場合はここで取得）
+
+    Returns:
+        history_store.SnapshotMatrix or None
+    """
+    ok, raw = history_source or _ensure_history_store()
+    try:
+        if ok:
+            return history_store.read_matrix(start)
+        if raw:
+            # キャッシュ失敗時はダウンロード内容からメモリ上で構築する
+            entries = history_store.parse_history_bytes(raw)
+            return history_store.SnapshotMatrix.from_entries(entries).since(start)
+    except Exception as e:
+        print(f"[bi_dashboard] WARNING: 履歴の読み込みに失敗: {e}")
+    return None
+
+
+def _parse_snapshot_date(ts):
+    """タイムスタンプ1件を 'YYYY-MM-DD' にする（ISO形式 → 先頭10文字の順に試す）。失敗時は None。"""
+    try:
+        dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        try:
+            dt = datetime.strptime(str(ts)[:10], '%Y-%m-%d')
+        except Exception:
+            return None
+    return dt.strftime('%Y-%m-%d')
+
+
+def _snapshot_dates(timestamps):
+    """
+    タイムスタンプ列を日付文字列のリストにする（解釈できないものは None）。
+    'YYYY-MM-DD...' 形式は先頭10文字を一括で検証し、それ以外だけ1件ずつ解釈する。
+    """
+    if not timestamps:
         return []
+    heads = pd.Series(timestamps, dtype=object).str[:10]
+    parsed = pd.to_datetime(heads, format='%Y-%m-%d', errors='coerce')
+    dates = parsed.dt.strftime('%Y-%m-%d').where(parsed.notna() & (parsed.dt.strftime('%Y-%m-%d') == heads))
+    return [d if isinstance(d, str) else _parse_snapshot_date(ts)
+            for d, ts in zip(dates.tolist(), timestamps)]
+
+
+def _calc_history_remaining_hours(time_map, nc_time_map, manual_time_map, history_source=None):
+    """
+    履歴の (スナップショット × 商品) 行列から、日別の残り作業時間（最新値）を算出する。
+
+    商品ごとの残り個数 max(0, target - count) の行列と1個あたり時間のベクトルの積で
+    各スナップショットの残り分数を求める。
+
+    history_source は取得済みの _ensure_history_store() の結果（None の場合はここで取得）。
+
+    Returns:
+        dict: {date_str: {'total', 'nc', 'manual'}}（時間, 小数1桁）
+    """
+    matrix = _load_history_matrix(history_source=history_source)
+    if not matrix:
+        return {}
+
+    remaining = np.maximum(matrix.target - matrix.count, 0)
+    total_min = (remaining @ matrix.vector(time_map, 0.0)).tolist()
+    nc_min = (remaining @ matrix.vector(nc_time_map, 0.0)).tolist()
+    manual_min = (remaining @ matrix.vector(manual_time_map, 0.0)).tolist()
+
+    # タイムスタンプ順（同時刻はファイル順）の行なので、同一日は最新値で上書き
+    daily_hours = {}
+    for i, date_str in enumerate(_snapshot_dates(matrix.timestamps)):
+        if date_str is None:
+            continue
+        daily_hours[date_str] = {
+            'total': round(total_min[i] / 60, 1),
+            'nc': round(nc_min[i] / 60, 1),
+            'manual': round(manual_min[i] / 60, 1),
+        }
+    return daily_hours
 
 
 def _calc_burnup_start_date(excel_bytes=None):
@@ -481,11 +599,7 @@ def _calc_burnup_start_date(excel_bytes=None):
 
     try:
         # イベントマスタシートを読み込む（1行目=ヘッダー）
-        df = pd.read_excel(
-            io.BytesIO(excel_bytes if isinstance(excel_bytes, bytes) else excel_bytes),
-            sheet_name='イベントマスタ',
-            header=0,
-        )
+        df = get_workbook(excel_bytes).sheet('イベントマスタ', header=0)
         print(f"[_calc_burnup_start_date] イベントマスタ読込: {len(df)}行")
 
         # アクティブイベント行のインデックスを特定
@@ -538,11 +652,12 @@ def _calc_burnup_start_date(excel_bytes=None):
         return None
 
 
-def calc_burnup_data(master_data, event_master=None, excel_bytes=None):
+@perf.timed('calc_burnup_data')
+def calc_burnup_data(master_data, event_master=None, excel_bytes=None, history_source=None):
     """
     バーンアップチャート用データを生成。
 
-    1. history_summary.json の details 付きエントリから各時点の完成金額を算出
+    1. 履歴ストアの起点日以降の details 付きエントリから各時点の完成金額を算出
     2. アクティブイベント日付までの3本の目標ペースラインを生成
     3. 同日に複数スキャンがある場合は最新のみ採用
     4. 起点日はメニュー.xlsxのイベントマスタシートから動的算出
@@ -551,6 +666,7 @@ def calc_burnup_data(master_data, event_master=None, excel_bytes=None):
         master_data: 商品マスタデータ
         event_master: イベントマスタJSON（オプション）
         excel_bytes: メニュー.xlsxのバイナリデータ（起点日算出用）
+        history_source: 取得済みの _ensure_history_store() の結果（オプション）
 
     Returns:
         dict: {
@@ -565,8 +681,19 @@ def calc_burnup_data(master_data, event_master=None, excel_bytes=None):
             "event_name": str,
         } or None
     """
-    history = _load_history_summary()
-    if not history or not master_data:
+    if not master_data:
+        return None
+
+    # start_date: メニュー.xlsxのイベントマスタシートから動的算出
+    start_date = _calc_burnup_start_date(excel_bytes)
+    # フォールバック: Excel読込失敗時は実績データの最古日付または決め打ち
+    if not start_date:
+        start_date = "2025-12-14"
+        print(f"[calc_burnup_data] フォールバック: 起点日 {start_date} を使用")
+
+    # 起点日以降の履歴だけを行列で読み込む
+    matrix = _load_history_matrix(start=start_date, history_source=history_source)
+    if not matrix:
         return None
 
     # master_data から ID→price のマップと目標総売上を作成
@@ -580,55 +707,25 @@ def calc_burnup_data(master_data, event_master=None, excel_bytes=None):
             price_map[item_id] = price
             valid_target_revenue += target * price
 
-    # 履歴エントリからの完成金額算出（推測計算を廃止、事実行のみ計算）
+    # 各スナップショットの完成金額 = 個数行列 × 単価ベクトル（推測計算を廃止、事実行のみ計算）
+    revenues = (matrix.count @ matrix.vector(price_map, 0)).tolist()
     daily_data = {}  # {date_str: valid_revenue}
-    has_details_flag = set()
-
-    for entry in history:
-        # 日付パース
-        ts = entry.get('timestamp') or entry.get('date', '')
-        if not ts:
-            continue
-
-        try:
-            dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-        except (ValueError, TypeError):
-            try:
-                dt = datetime.strptime(str(ts)[:10], '%Y-%m-%d')
-            except Exception:
-                continue
-
-        date_str = dt.strftime('%Y-%m-%d')
-
-        details = entry.get('details')
-        if details:
-            # detailsがある場合は、各アイテムの「個数×単価」を合算
-            valid_revenue = sum(item_data.get('count', 0) * price_map.get(item_id, 0)
-                                for item_id, item_data in details.items() if item_id in price_map)
+    for date_str, valid_revenue in zip(_snapshot_dates(matrix.timestamps), revenues):
+        if date_str is not None:
             daily_data[date_str] = valid_revenue
-            has_details_flag.add(date_str)
-        # detailsがない推測値の利用（旧合計個数ベース等の推定計算）は行わず無視する（グラフを点のみにする）
 
     if not daily_data:
         return None
 
     # 日付順にソート
     sorted_dates = sorted(daily_data.keys())
-    
-    # start_date: メニュー.xlsxのイベントマスタシートから動的算出
-    start_date = _calc_burnup_start_date(excel_bytes)
-    # フォールバック: Excel読込失敗時は実績データの最古日付または決め打ち
-    if not start_date:
-        start_date = "2025-12-14"
-        print(f"[calc_burnup_data] フォールバック: 起点日 {start_date} を使用")
 
     # 起点日の初期資産額を計算（クリマ2512シートの「残数」から）
     initial_revenue = 0
     if excel_bytes:
         try:
-            import io
             # C列(ID) と AK列(残数) を取得
-            df_cur = pd.read_excel(io.BytesIO(excel_bytes), sheet_name='クリマ2512', usecols="C,AK")
+            df_cur = get_workbook(excel_bytes).sheet('クリマ2512', usecols="C,AK")
             for _, row in df_cur.iterrows():
                 raw_id = row.iloc[0]
                 raw_count = row.iloc[1]
@@ -678,13 +775,71 @@ def calc_burnup_data(master_data, event_master=None, excel_bytes=None):
 # KPI 8: バーンダウンチャート（残り総作業時間の推移）
 # =============================================================
 
-def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
+# 理想線の投影日数の上限（無限ループ防止の名残。これ以上先は描画しない）
+PROJECTION_MAX_DAYS = 365
+# カレンダー未連携日の1日あたり作業時間
+HOURS_PER_DAY_FALLBACK = 8
+# what-if シナリオ: 土日に追加で確保する作業時間（時間/日）
+WHAT_IF_WEEKEND_EXTRA_HOURS = (2, 4)
+
+
+def capacity_series(start_dt, calendar_capacity_map=None, days=PROJECTION_MAX_DAYS,
+                    fallback=HOURS_PER_DAY_FALLBACK):
+    """
+    start_dt の翌日から days 日分の日付と日別キャパシティ（時間）を返す。
+    カレンダーの空き時間がある日はその値、それ以外は fallback。
+
+    Returns:
+        tuple: (dates: list[str 'YYYY-MM-DD'], capacity: np.ndarray, weekend: np.ndarray[bool])
+    """
+    index = pd.date_range(pd.Timestamp(start_dt).normalize() + pd.Timedelta(days=1), periods=days, freq='D')
+    dates = index.strftime('%Y-%m-%d').tolist()
+    capacity = (pd.Series(calendar_capacity_map or {}, dtype=float)
+                .reindex(dates).fillna(fallback).to_numpy(dtype=np.float64))
+    return dates, capacity, np.asarray(index.dayofweek >= 5)
+
+
+def project_remaining(current_hours, capacity):
+    """
+    残り時間を日別キャパシティで消化したときの推移を一括で求める。
+
+    capacity を (シナリオ数, 日数) の2次元で渡すと、what-if シナリオをまとめて計算する。
+    減算は先頭から順に累積する（ufunc.accumulate）ため、1日ずつ引いていく場合と同じ値になる。
+
+    Args:
+        current_hours (float): 現在の残り時間
+        capacity (array-like): 日別キャパシティ。shape (日数,) または (シナリオ数, 日数)
+
+    Returns:
+        tuple: (remaining, days_to_finish)
+            remaining: shape (シナリオ数, 日数) の各日終了時点の残り時間（0 で下げ止まり）
+            days_to_finish: shape (シナリオ数,) の完了までの日数（期間内に終わらなければ日数）
+    """
+    capacity = np.atleast_2d(np.asarray(capacity, dtype=np.float64))
+    n_scenarios, n_days = capacity.shape
+    if current_hours <= 0:
+        return np.zeros(capacity.shape), np.zeros(n_scenarios, dtype=np.int64)
+    start = np.full((n_scenarios, 1), float(current_hours))
+    left = np.subtract.accumulate(np.concatenate([start, capacity], axis=1), axis=1)[:, 1:]
+    done = left <= 0
+    days_to_finish = np.where(done.any(axis=1), done.argmax(axis=1) + 1, n_days)
+    return np.maximum(left, 0), days_to_finish
+
+
+def _ideal_points(start_date, start_hours, dates, remaining):
+    """起点（現在の残り時間）+ 各日の残り時間を [{"date", "remaining_hours"}] に整形する。"""
+    points = [{"date": start_date, "remaining_hours": round(start_hours, 1)}]
+    points.extend({"date": d, "remaining_hours": round(v, 1)} for d, v in zip(dates, remaining))
+    return points
+
+
+@perf.timed('calc_burndown_hours')
+def calc_burndown_hours(master_data, event_master=None, calendar_data=None, history_source=None):
     """
     残り総作業時間（NC＋手作業）のバーンダウンチャート用データを生成。
 
     1. master_data から ID→(NC分+手作業分)/個 のマップを構築
-    2. history_summary.json の details 付きエントリから、
-       各時点の「残り総作業時間」を算出
+    2. 履歴の (スナップショット × 商品) 行列から、details 付きエントリ時点の「残り総作業時間」を算出
     3. 理想線: カレンダーの日別空き時間に基づいて減少する曲線
        （カレンダーデータ未連携時は1日8時間のフォールバック）
 
@@ -693,12 +848,15 @@ def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
         event_master: イベントマスタJSON（オプション）
         calendar_data: カレンダー統合データ（calendar_agent出力、オプション）
             calendar_data['daily_schedule'] に日別空き時間が含まれる
+        history_source: 取得済みの _ensure_history_store() の結果（オプション）
 
     Returns:
         dict: {
             "actual": [{"date": str, "remaining_hours": float}, ...],
             "ideal":  [{"date": str, "remaining_hours": float}, ...],
             "daily_capacity": [{"date": str, "capacity_hours": float}, ...],
+            "what_if": [{"label": str, "extra_weekend_hours": int,
+                         "finish_date": str, "days_saved": int}, ...],
             "current_remaining_hours": float,
             "ideal_finish_date": str,
             "event_date": str,
@@ -710,22 +868,16 @@ def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
         return None
 
     # --- 1. ID → 1個あたりの工程時間（分）マップ（NC/手作業分離） ---
-    time_map = {}       # {item_id: total_min_per_unit}
-    nc_time_map = {}    # {item_id: nc_min_per_unit}
-    manual_time_map = {}  # {item_id: manual_min_per_unit}
-    for item in master_data:
-        item_id = item.get('id', '')
-        if not item_id:
-            continue
-        nc_min, manual_min, total_min = _calc_item_times(item)
-        time_map[item_id] = total_min
-        nc_time_map[item_id] = nc_min
-        manual_time_map[item_id] = manual_min
-
-    # --- 2. 履歴から各時点の残り総作業時間を算出 ---
-    history = _load_history_summary()
-    if not history:
-        # 履歴がなくても現在値だけで理想線は描画可能
+    table = get_process_table(master_data)
+    time_map = table.time_map('total_min')
+    nc_time_map = table.time_map('nc_min')
+    manual_time_map = table.time_map('manual_min')
+
+    # --- 2. 履歴から各時点の残り総作業時間を算出（行列×ベクトルの積） ---
+    daily_hours = _calc_history_remaining_hours(time_map, nc_time_map, manual_time_map,
+                                                history_source=history_source)
+    if not daily_hours:
+        # 履歴（detailsのあるエントリ）がなくても現在値だけで理想線は描画可能
         hours_info = calc_remaining_hours(master_data)
         current_hours = hours_info['total_hours']
         if current_hours <= 0:
@@ -739,77 +891,19 @@ def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
             "remaining_manual_hours": hours_info['total_manual_hours'],
         }]
     else:
-        # details 付きエントリのみ処理
-        daily_hours = {}  # {date_str: {total, nc, manual}}
-        for entry in history:
-            details = entry.get('details')
-            if not details:
-                continue
-
-            ts = entry.get('timestamp') or entry.get('date', '')
-            if not ts:
-                continue
-            try:
-                dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-            except (ValueError, TypeError):
-                try:
-                    dt = datetime.strptime(str(ts)[:10], '%Y-%m-%d')
-                except Exception:
-                    continue
-
-            date_str = dt.strftime('%Y-%m-%d')
-
-            # 残り作業時間 = Σ(max(0, target - count) × 1個あたり時間)
-            total_remaining_min = 0
-            nc_remaining_min = 0
-            manual_remaining_min = 0
-            for item_id, item_data in details.items():
-                target = item_data.get('target', 0)
-                count = item_data.get('count', 0)
-                remaining = max(0, target - count)
-                total_remaining_min += remaining * time_map.get(item_id, 0)
-                nc_remaining_min += remaining * nc_time_map.get(item_id, 0)
-                manual_remaining_min += remaining * manual_time_map.get(item_id, 0)
-
-            remaining_hours = round(total_remaining_min / 60, 1)
-            nc_hours = round(nc_remaining_min / 60, 1)
-            manual_hours = round(manual_remaining_min / 60, 1)
-            # 同一日は最新値で上書き（後のエントリが最新）
-            daily_hours[date_str] = {
-                'total': remaining_hours,
-                'nc': nc_hours,
-                'manual': manual_hours,
-            }
-
-        if not daily_hours:
-            # detailsのある履歴がなくても現在値で表示
-            hours_info = calc_remaining_hours(master_data)
-            current_hours = hours_info['total_hours']
-            if current_hours <= 0:
-                return None
-            today_str = datetime.now().strftime('%Y-%m-%d')
-            actual = [{
-                "date": today_str,
-                "remaining_hours": current_hours,
-                "remaining_nc_hours": hours_info['total_nc_hours'],
-                "remaining_manual_hours": hours_info['total_manual_hours'],
-            }]
-        else:
-            sorted_dates = sorted(daily_hours.keys())
-            actual = [{
-                "date": d,
-                "remaining_hours": daily_hours[d]['total'],
-                "remaining_nc_hours": daily_hours[d]['nc'],
-                "remaining_manual_hours": daily_hours[d]['manual'],
-            } for d in sorted_dates]
+        sorted_dates = sorted(daily_hours.keys())
+        actual = [{
+            "date": d,
+            "remaining_hours": daily_hours[d]['total'],
+            "remaining_nc_hours": daily_hours[d]['nc'],
+            "remaining_manual_hours": daily_hours[d]['manual'],
+        } for d in sorted_dates]
 
     # --- 3. 現在の残り総作業時間（最新の actual ポイント） ---
     current_hours = actual[-1]['remaining_hours']
     start_date_str = actual[-1]['date']
 
     # --- 4. 理想線: カレンダー連動 or 固定8h/日 ---
-    HOURS_PER_DAY_FALLBACK = 8
-
     # カレンダーデータから日別キャパシティマップを構築
     calendar_capacity_map = {}  # {date_str: total_free_hours}
     capacity_source = "fixed"
@@ -827,58 +921,41 @@ def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
     except (ValueError, TypeError):
         start_dt = datetime.now()
 
-    # 理想線 & 日別キャパシティを同時に構築
     # --- NC/手作業の按分比率を算出 ---
     current_nc = actual[-1].get('remaining_nc_hours', 0)
     current_manual = actual[-1].get('remaining_manual_hours', 0)
     nc_ratio = current_nc / current_hours if current_hours > 0 else 0.5
     manual_ratio = current_manual / current_hours if current_hours > 0 else 0.5
 
-    ideal = []
-    ideal_nc = []
-    ideal_manual = []
-    daily_capacity = []
-    remaining = current_hours
-    remaining_nc = current_nc
-    remaining_manual = current_manual
-    d = 0
-    MAX_DAYS = 365  # 無限ループ防止
-
-    # 初期ポイント（現在の残り時間）
-    start_date_fmt = start_dt.strftime('%Y-%m-%d')
-    ideal.append({"date": start_date_fmt, "remaining_hours": round(remaining, 1)})
-    ideal_nc.append({"date": start_date_fmt, "remaining_hours": round(remaining_nc, 1)})
-    ideal_manual.append({"date": start_date_fmt, "remaining_hours": round(remaining_manual, 1)})
-
-    while remaining > 0 and d < MAX_DAYS:
-        d += 1
-        day_dt = start_dt + timedelta(days=d)
-        date_str = day_dt.strftime('%Y-%m-%d')
-
-        # その日のキャパシティを取得（カレンダー優先、なければフォールバック）
-        if date_str in calendar_capacity_map:
-            day_capacity = calendar_capacity_map[date_str]
-        else:
-            day_capacity = HOURS_PER_DAY_FALLBACK
-
-        daily_capacity.append({"date": date_str, "capacity_hours": round(day_capacity, 1)})
+    # 日付 × キャパシティの配列から、全体/NC/手作業の理想線と完了日を一括で求める
+    dates, capacity, weekend = capacity_series(start_dt, calendar_capacity_map)
+    remaining, days_to_finish = project_remaining(current_hours, capacity)
+    days_to_finish = int(days_to_finish[0])
+    remaining_nc, _ = project_remaining(current_nc, capacity * nc_ratio)
+    remaining_manual, _ = project_remaining(current_manual, capacity * manual_ratio)
 
-        # 全体の理想線
-        remaining = max(0, remaining - day_capacity)
-        ideal.append({"date": date_str, "remaining_hours": round(remaining, 1)})
-
-        # NC/手作業を比率で按分して減少
-        nc_decrement = day_capacity * nc_ratio
-        manual_decrement = day_capacity * manual_ratio
-        remaining_nc = max(0, remaining_nc - nc_decrement)
-        remaining_manual = max(0, remaining_manual - manual_decrement)
-        ideal_nc.append({"date": date_str, "remaining_hours": round(remaining_nc, 1)})
-        ideal_manual.append({"date": date_str, "remaining_hours": round(remaining_manual, 1)})
+    start_date_fmt = start_dt.strftime('%Y-%m-%d')
+    dates = dates[:days_to_finish]
+    ideal = _ideal_points(start_date_fmt, current_hours, dates, remaining[0, :days_to_finish].tolist())
+    ideal_nc = _ideal_points(start_date_fmt, current_nc, dates, remaining_nc[0, :days_to_finish].tolist())
+    ideal_manual = _ideal_points(start_date_fmt, current_manual, dates,
+                                 remaining_manual[0, :days_to_finish].tolist())
+    daily_capacity = [{"date": d, "capacity_hours": round(c, 1)}
+                      for d, c in zip(dates, capacity[:days_to_finish].tolist())]
 
-    days_to_finish = d
     finish_dt = start_dt + timedelta(days=days_to_finish)
     ideal_finish_date = finish_dt.strftime('%Y-%m-%d')
 
+    # what-if: 土日に作業時間を追加した場合の完了日（全シナリオを1回で投影）
+    extra = np.array(WHAT_IF_WEEKEND_EXTRA_HOURS, dtype=np.float64)
+    _, scenario_days = project_remaining(current_hours, capacity + np.outer(extra, weekend))
+    what_if = [{
+        "label": f"土日+{int(h)}h",
+        "extra_weekend_hours": h,
+        "finish_date": (start_dt + timedelta(days=int(n))).strftime('%Y-%m-%d'),
+        "days_saved": days_to_finish - int(n),
+    } for h, n in zip(WHAT_IF_WEEKEND_EXTRA_HOURS, scenario_days.tolist())]
+
     # --- 5. イベント情報 ---
     countdown = calc_countdown(event_master=event_master)
     if countdown:
@@ -896,8 +973,7 @@ def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
         target_qty = item.get('target_quantity', 0)
         if target_qty <= 0:
             continue
-        item_id = item.get('id', '')
-        per_unit_min = time_map.get(item_id, 0)
+        per_unit_min = table.unit_times(item)[2] if item.get('id') else 0
         initial_total_min += target_qty * per_unit_min
         price = item.get('price', 0)
         if price > 0:
@@ -933,6 +1009,7 @@ def calc_burndown_hours(master_data, event_master=None, calendar_data=None):
         "ideal_nc": ideal_nc,
         "ideal_manual": ideal_manual,
         "daily_capacity": daily_capacity,
+        "what_if": what_if,
         "current_remaining_hours": current_hours,
         "current_nc_hours": actual[-1].get('remaining_nc_hours', 0),
         "current_manual_hours": actual[-1].get('remaining_manual_hours', 0),
@@ -10,11 +10,16 @@ atlas_integrated_data.json としてGoogle Driveに出力する。
 import os
 import io
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import numpy as np
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 
+from logic import calendar_store, drive_client, master_store
+
 try:
     from google import genai
     from google.genai import types
@@ -35,6 +40,7 @@ CALENDAR_SCOPES = [
 LOOK_AHEAD_DAYS = 90  # 3ヶ月分
 WORK_START_HOUR = 9    # 作業可能時間帯の開始
 WORK_END_HOUR = 22     # 作業可能時間帯の終了
+FETCH_CONCURRENCY = 4  # カレンダー・タスクリストごとのAPI呼び出しの同時実行数
 
 # Drive出力先のフォルダID（atlas-hubと同じフォルダ）
 OUTPUT_FOLDER_ID = "1swLvCAzeFx8N9DhG5jfeUXPvlhCmCK6i"
@@ -44,12 +50,16 @@ OUTPUT_FILENAME = "atlas_integrated_data.json"
 # ================================================================
 # 認証（drive_utils.pyと共通のtoken.jsonを使用）
 # ================================================================
-def _get_credentials():
+def _get_credentials(interactive=True):
     """
     認証情報を取得する（3段階フォールバック）:
     1. token.json が存在すれば読み込み（有効期限切れならリフレッシュ）
     2. credentials.json が存在すればブラウザ認証フロー（InstalledAppFlow）
     3. st.secrets["google_oauth"] から構築（クラウド用）
+
+    Args:
+        interactive (bool): False の場合は 2 のブラウザ認証を行わない
+                            （バックグラウンドスレッドから呼ぶ場合。誰も応答できず待ち続けるため）
     """
     base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
     token_file = os.path.join(base_dir, 'token.json')
@@ -88,7 +98,9 @@ def _get_credentials():
             creds = None
     
     # --- Step 2: credentials.json でブラウザ認証（ローカル） ---
-    if os.path.exists(creds_file):
+    if os.path.exists(creds_file) and not interactive:
+        print("[calendar_agent] 非対話モードのためブラウザ認証をスキップします")
+    elif os.path.exists(creds_file):
         try:
             from google_auth_oauthlib.flow import InstalledAppFlow
             print("[calendar_agent] ブラウザ認証を開始します...")
@@ -135,28 +147,108 @@ def _get_credentials():
         return None
 
 
+# ================================================================
+# API呼び出しの並列化
+# ================================================================
+_services_lock = threading.Lock()
+_services = {}  # {(API名, バージョン): (認証情報のキー, サービス)}
+
+
+def _credentials_key(creds):
+    """
+    同じ認証情報を表すキー。refresh_token が同じなら run() ごとに token.json を読み直しても同じキーになる。
+    refresh_token が無い場合は認証情報のオブジェクト自体（キャッシュが参照を保持するので取り違えない）。
+    """
+    refresh_token = getattr(creds, 'refresh_token', None)
+    if refresh_token:
+        return ('refresh_token', getattr(creds, 'client_id', None), refresh_token)
+    return ('object', creds)
+
+
+def _shared_service(name, version, creds):
+    """
+    API サービスオブジェクトをプロセス全体で共有する（API ごとに1つ、認証情報が変わった時だけ構築し直す）。
+    HTTP は drive_client の接続プール経由で1リクエストごとに接続を貸し出すため、
+    並列のワーカーから同じサービスを使ってよく、run() をまたいで接続も再利用される。
+    """
+    key = _credentials_key(creds)
+    with _services_lock:
+        cached = _services.get((name, version))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    service = drive_client.build_service(creds, name, version)
+    with _services_lock:
+        # 同時に構築した他のワーカーがあれば、先に登録された方を使う
+        cached = _services.get((name, version))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        _services[(name, version)] = (key, service)
+    return service
+
+
+def _fan_out(fn, items, max_workers=FETCH_CONCURRENCY):
+    """
+    items の各要素に fn を最大 max_workers 並列で適用する。
+    1要素の失敗は他に影響させず、入力順に (結果, 例外) のリストで返す。
+    """
+    def call(item):
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, e
+
+    workers = max(1, min(max_workers or 1, len(items)))
+    if workers == 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='calendar_agent') as pool:
+        return list(pool.map(call, items))
+
+
 # ================================================================
 # カレンダーからイベントを取得
 # ================================================================
-def fetch_calendar_events(creds, days=LOOK_AHEAD_DAYS):
+def fetch_calendar_events(creds, days=LOOK_AHEAD_DAYS, service=None, incremental=True, state_path=None,
+                          max_workers=FETCH_CONCURRENCY):
     """
     個人Googleカレンダーの予定を取得する。
-    
+
+    カレンダーごとの syncToken とイベントを data/calendar_sync_state.json に保持し、
+    2回目以降は前回以降の変更分だけを取得する（calendar_store 参照）。
+    カレンダーごとの同期は最大 max_workers 並列で行う（サービスはワーカー間で共有し、接続はプールから貸し出す）。
+
+    Args:
+        creds: 認証情報（service を渡す場合は不要）
+        days (int): 取得期間（本日から）
+        service: Calendar API のサービスオブジェクト（テスト用、省略時は creds から構築）
+        incremental (bool): False の場合は全カレンダーを完全同期し直す
+        state_path (str): 同期状態の保存先（テスト用）
+        max_workers (int): カレンダーごとの同期の同時実行数（1 で逐次）
+
     Returns:
         list[dict]: 各イベント {'summary', 'start', 'end', 'all_day', 'calendar'}
     """
-    service = build('calendar', 'v3', credentials=creds)
+    def get_service():
+        return service or _shared_service('calendar', 'v3', creds)
     
     now = datetime.now(timezone.utc)
-    time_min = now.isoformat()
-    time_max = (now + timedelta(days=days)).isoformat()
+    time_max = now + timedelta(days=days)
     
+    state = calendar_store.load_state(state_path)
+    calendars = {}
     events = []
     
-    # カレンダーリストを取得（個人アカウントのカレンダーのみ）
-    calendar_list = service.calendarList().list().execute()
+    # カレンダーリストを取得（個人アカウントのカレンダーのみ、nextPageToken を最後までたどる）
+    calendar_items = []
+    page_token = None
+    while True:
+        calendar_list = get_service().calendarList().list(pageToken=page_token).execute()
+        calendar_items.extend(calendar_list.get('items', []))
+        page_token = calendar_list.get('nextPageToken')
+        if not page_token:
+            break
     
-    for cal in calendar_list.get('items', []):
+    targets = []
+    for cal in calendar_items:
         cal_id = cal['id']
         cal_summary = cal.get('summary', cal_id)
         
@@ -171,43 +263,37 @@ def fetch_calendar_events(creds, days=LOOK_AHEAD_DAYS):
             print(f"[calendar_agent] スキップ（天気カレンダー）: {cal_summary}")
             continue
         
+        previous = state['calendars'].get(cal_id) if incremental else None
+        targets.append((cal, previous))
+    
+    # カレンダーごとの同期を並列に実行（結果の反映・ログはカレンダーリスト順）
+    results = _fan_out(
+        lambda target: calendar_store.sync_calendar(get_service(), target[0]['id'], target[1], now=now),
+        targets, max_workers=max_workers)
+    
+    for (cal, previous), (synced, error) in zip(targets, results):
+        cal_id = cal['id']
+        cal_summary = cal.get('summary', cal_id)
         access_role = cal.get('accessRole', '')
-        print(f"[calendar_agent] 取得対象: {cal_summary} (role={access_role})")
         
-        try:
-            events_result = service.events().list(
-                calendarId=cal_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime',
-                maxResults=500,
-            ).execute()
-            
-            for event in events_result.get('items', []):
-                start = event.get('start', {})
-                end = event.get('end', {})
-                
-                # 終日イベント or 時間指定イベント
-                if 'date' in start:
-                    all_day = True
-                    start_dt = start['date']
-                    end_dt = end.get('date', start_dt)
-                else:
-                    all_day = False
-                    start_dt = start.get('dateTime', '')
-                    end_dt = end.get('dateTime', '')
-                
-                events.append({
-                    'summary': event.get('summary', '(タイトルなし)'),
-                    'start': start_dt,
-                    'end': end_dt,
-                    'all_day': all_day,
-                    'calendar': cal_summary,
-                })
-        except Exception as e:
-            print(f"[calendar_agent] カレンダー '{cal_summary}' の取得エラー: {e}")
-            continue
+        if error is None:
+            entry, mode = synced
+            print(f"[calendar_agent] 取得対象: {cal_summary} (role={access_role}, {mode}, {len(entry['events'])}件)")
+        else:
+            print(f"[calendar_agent] カレンダー '{cal_summary}' の取得エラー: {error}")
+            if not previous:
+                continue
+            # 前回同期分があればそれを使う（次回は同じ syncToken から再開）
+            entry = previous
+        
+        entry['summary'] = cal_summary
+        calendars[cal_id] = entry
+        for event in calendar_store.events_in_window(entry, now, time_max):
+            events.append(dict(event, calendar=cal_summary))
+    
+    # カレンダーリストから消えたカレンダーの状態は捨てる
+    state['calendars'] = calendars
+    calendar_store.save_state(state, state_path)
     
     print(f"[calendar_agent] 取得イベント数: {len(events)}")
     return events
@@ -216,17 +302,60 @@ def fetch_calendar_events(creds, days=LOOK_AHEAD_DAYS):
 # ================================================================
 # 空き時間を算出
 # ================================================================
+MINUTES_PER_DAY = 24 * 60
+DAY_NAMES = ['月', '火', '水', '木', '金', '土', '日']
+
+
+def _fmt_minute(minute):
+    """日内の分を 'HH:MM' にする（日末は '24:00'）。"""
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _free_block(start, end):
+    return {'start': _fmt_minute(start), 'end': _fmt_minute(end), 'hours': round((end - start) / 60, 1)}
+
+
+def _merge_intervals(starts, ends):
+    """
+    区間 [start, end) の集合を開始順に1回なめて、重なり・接触する区間を結合する。
+
+    Returns:
+        tuple: (starts, ends) 結合後の区間（開始順, 互いに素）の np.ndarray
+    """
+    if len(starts) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    order = np.lexsort((ends, starts))
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # 直前までの最大終了時刻より後に始まる区間が新しいグループの先頭
+    head = np.ones(len(starts), dtype=bool)
+    head[1:] = starts[1:] > reach[:-1]
+    heads = np.flatnonzero(head)
+    return starts[heads], np.maximum.reduceat(ends, heads)
+
+
+def _to_day_minutes(value, day0, tz):
+    """ISO日時を day0（起点日 0:00, tz）からの経過分に変換する（秒は切り捨て）。"""
+    dt = datetime.fromisoformat(value).astimezone(tz)
+    return int((dt.replace(second=0, microsecond=0) - day0).total_seconds() // 60)
+
+
 def calculate_free_slots(events, days=LOOK_AHEAD_DAYS):
     """
     カレンダーの予定を元に、日ごとの空き時間ブロックを算出する。
-    
+
+    全予定を「起点日 0:00 からの経過分」の区間に変換し、開始順に1度だけなめて結合した後、
+    日ごとの作業時間帯 (WORK_START_HOUR ~ WORK_END_HOUR) との差を取る。
+    日をまたぐ予定はそれぞれの日に分割して載せる。予定と重ならない日は
+    同じ空きブロックを複製するだけなので、期間を延ばしても区間処理の量は増えない。
+
     Returns:
         list[dict]: 日ごとの空き時間情報
         [
             {
                 'date': '2026-03-01',
                 'day_of_week': '日',
-                'events': [...],         # その日の予定
+                'events': [...],         # その日の予定（日をまたぐ予定は日ごとの区間）
                 'free_blocks': [...],    # 空きブロック [{'start': '09:00', 'end': '13:00', 'hours': 4}]
                 'total_free_hours': 8.5, # その日の合計空き時間
                 'is_blocked': False,     # 終日予定でブロックされているか
@@ -235,122 +364,98 @@ def calculate_free_slots(events, days=LOOK_AHEAD_DAYS):
     """
     JST = timezone(timedelta(hours=9))
     today = datetime.now(JST).date()
-    
-    day_names = ['月', '火', '水', '木', '金', '土', '日']
-    
-    # 日ごとにイベントを整理
-    daily_data = {}
-    for day_offset in range(days):
-        d = today + timedelta(days=day_offset)
-        date_str = d.isoformat()
-        daily_data[date_str] = {
-            'date': date_str,
-            'day_of_week': day_names[d.weekday()],
-            'events': [],
-            'free_blocks': [],
-            'total_free_hours': 0,
-            'is_blocked': False,
-        }
-    
-    # イベントを日付に振り分け
+    day0 = datetime(today.year, today.month, today.day, tzinfo=JST)
+    horizon = days * MINUTES_PER_DAY
+
+    day_events = {}  # {day_index: [event, ...]}（予定のある日だけ）
+    blocked_diff = np.zeros(days + 1, dtype=np.int64)  # 終日予定の日範囲（差分配列）
+    busy_starts, busy_ends = [], []
+
     for event in events:
         if event['all_day']:
             # 終日イベント: 該当日をブロック
             start_date = event['start']
             end_date = event.get('end', start_date)
             try:
-                sd = datetime.strptime(start_date, '%Y-%m-%d').date()
-                ed = datetime.strptime(end_date, '%Y-%m-%d').date()
-                current = sd
-                while current < ed:
-                    key = current.isoformat()
-                    if key in daily_data:
-                        daily_data[key]['is_blocked'] = True
-                        daily_data[key]['events'].append({
-                            'summary': event['summary'],
-                            'start': '終日',
-                            'end': '終日',
-                        })
-                    current += timedelta(days=1)
+                sd = (datetime.strptime(start_date, '%Y-%m-%d').date() - today).days
+                ed = (datetime.strptime(end_date, '%Y-%m-%d').date() - today).days
             except ValueError:
-                pass
+                continue
+            sd, ed = max(sd, 0), min(ed, days)
+            if sd >= ed:
+                continue
+            blocked_diff[sd] += 1
+            blocked_diff[ed] -= 1
+            for k in range(sd, ed):
+                day_events.setdefault(k, []).append({'summary': event['summary'], 'start': '終日', 'end': '終日'})
         else:
-            # 時間指定イベント
+            # 時間指定イベント（JST）
             try:
-                start_dt = datetime.fromisoformat(event['start'])
-                end_dt = datetime.fromisoformat(event['end'])
-                # JSTに変換
-                start_jst = start_dt.astimezone(JST)
-                end_jst = end_dt.astimezone(JST)
-                
-                key = start_jst.date().isoformat()
-                if key in daily_data:
-                    daily_data[key]['events'].append({
-                        'summary': event['summary'],
-                        'start': start_jst.strftime('%H:%M'),
-                        'end': end_jst.strftime('%H:%M'),
-                    })
+                start = _to_day_minutes(event['start'], day0, JST)
+                end = max(_to_day_minutes(event['end'], day0, JST), start)
             except (ValueError, TypeError):
-                pass
-    
-    # 各日の空き時間を計算
-    for date_str, day_info in daily_data.items():
-        if day_info['is_blocked']:
-            day_info['total_free_hours'] = 0
-            continue
-        
-        # 予定のある時間帯を集約
-        busy_ranges = []
-        for evt in day_info['events']:
-            if evt['start'] == '終日':
                 continue
-            try:
-                sh, sm = map(int, evt['start'].split(':'))
-                eh, em = map(int, evt['end'].split(':'))
-                busy_ranges.append((sh * 60 + sm, eh * 60 + em))
-            except (ValueError, TypeError):
-                pass
-        
-        # ソートしてマージ
-        busy_ranges.sort()
-        merged = []
-        for start, end in busy_ranges:
-            if merged and start <= merged[-1][1]:
-                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
-            else:
-                merged.append((start, end))
-        
-        # 空きブロック算出（WORK_START_HOUR ~ WORK_END_HOUR）
-        work_start = WORK_START_HOUR * 60
-        work_end = WORK_END_HOUR * 60
-        free_blocks = []
+            if end > start:
+                busy_starts.append(start)
+                busy_ends.append(end)
+            # 日をまたぐ予定は日ごとの区間に分割して載せる
+            first = start // MINUTES_PER_DAY
+            last = max(first, (end - 1) // MINUTES_PER_DAY)
+            for k in range(max(first, 0), min(last, days - 1) + 1):
+                offset = k * MINUTES_PER_DAY
+                day_events.setdefault(k, []).append({
+                    'summary': event['summary'],
+                    'start': _fmt_minute(max(start - offset, 0)),
+                    'end': _fmt_minute(min(end - offset, MINUTES_PER_DAY)),
+                })
+
+    blocked = np.cumsum(blocked_diff[:days]) > 0
+
+    # 予定区間を1回のソートで結合し、各日の作業時間帯と重なる区間の範囲を二分探索で求める
+    merged_starts, merged_ends = _merge_intervals(
+        np.clip(np.array(busy_starts, dtype=np.int64), 0, horizon),
+        np.clip(np.array(busy_ends, dtype=np.int64), 0, horizon))
+    day_offsets = np.arange(days, dtype=np.int64) * MINUTES_PER_DAY
+    work_start = WORK_START_HOUR * 60
+    work_end = WORK_END_HOUR * 60
+    lo = np.searchsorted(merged_ends, day_offsets + work_start, side='right')
+    hi = np.searchsorted(merged_starts, day_offsets + work_end, side='left')
+    busy_days = np.flatnonzero((lo < hi) & ~blocked).tolist()
+
+    # 予定と重ならない日の空きブロック（作業時間帯まるごと）
+    full_block = _free_block(work_start, work_end)
+
+    dates = np.arange(np.datetime64(today, 'D'), np.datetime64(today, 'D') + days).astype(str).tolist()
+    first_weekday = today.weekday()
+    result = []
+    for k, date_str in enumerate(dates):
+        is_blocked = bool(blocked[k])
+        result.append({
+            'date': date_str,
+            'day_of_week': DAY_NAMES[(first_weekday + k) % 7],
+            'events': day_events.get(k, []),
+            'free_blocks': [] if is_blocked else [dict(full_block)],
+            'total_free_hours': 0 if is_blocked else full_block['hours'],
+            'is_blocked': is_blocked,
+        })
+
+    # 予定と重なる日だけ、作業時間帯から予定区間を差し引く
+    for k in busy_days:
+        offset = k * MINUTES_PER_DAY
         cursor = work_start
-        
-        for busy_start, busy_end in merged:
-            if busy_start > cursor and busy_start >= work_start:
-                block_start = max(cursor, work_start)
-                block_end = min(busy_start, work_end)
-                if block_end > block_start:
-                    free_blocks.append({
-                        'start': f"{block_start // 60:02d}:{block_start % 60:02d}",
-                        'end': f"{block_end // 60:02d}:{block_end % 60:02d}",
-                        'hours': round((block_end - block_start) / 60, 1),
-                    })
+        free_blocks = []
+        for j in range(lo[k], hi[k]):
+            busy_start = int(merged_starts[j]) - offset
+            busy_end = int(merged_ends[j]) - offset
+            if busy_start > cursor:
+                free_blocks.append(_free_block(cursor, busy_start))
             cursor = max(cursor, busy_end)
-        
-        # 最後の空きブロック
         if cursor < work_end:
-            block_start = max(cursor, work_start)
-            free_blocks.append({
-                'start': f"{block_start // 60:02d}:{block_start % 60:02d}",
-                'end': f"{work_end // 60:02d}:{work_end % 60:02d}",
-                'hours': round((work_end - block_start) / 60, 1),
-            })
-        
-        day_info['free_blocks'] = free_blocks
-        day_info['total_free_hours'] = sum(b['hours'] for b in free_blocks)
-    
-    return list(daily_data.values())
+            free_blocks.append(_free_block(cursor, work_end))
+        result[k]['free_blocks'] = free_blocks
+        result[k]['total_free_hours'] = sum(b['hours'] for b in free_blocks)
+
+    return result
 
 
 # ================================================================
@@ -364,9 +469,12 @@ def integrate_with_production(free_slots, production_master_path=None):
     Returns:
         dict: 統合データ
     """
-    # production_master.jsonの読み込み
+    # 商品マスタの読み込み（同じ場所の列指向ストア production_master.arrow が新しければそちらを使う）
     production_data = []
-    if production_master_path and os.path.exists(production_master_path):
+    store_path = os.path.splitext(production_master_path)[0] + '.arrow' if production_master_path else None
+    if store_path and master_store.is_fresh(store_path, production_master_path):
+        production_data = master_store.load_records(store_path) or []
+    if not production_data and production_master_path and os.path.exists(production_master_path):
         try:
             with open(production_master_path, 'r', encoding='utf-8') as f:
                 production_data = json.load(f)
@@ -464,15 +572,24 @@ def upload_to_drive(creds, data, folder_id=OUTPUT_FOLDER_ID, filename=OUTPUT_FIL
 # ================================================================
 # Google Tasks API 統合
 # ================================================================
-def fetch_google_tasks(creds):
+def fetch_google_tasks(creds, service=None, max_workers=FETCH_CONCURRENCY):
     """
     Google Tasks API から期日付きタスクを取得する。
+    タスクリストごとの取得は最大 max_workers 並列で行う（サービスはワーカー間で共有し、接続はプールから貸し出す）。
+    
+    Args:
+        creds: 認証情報（service を渡す場合は不要）
+        service: Tasks API のサービスオブジェクト（テスト用、省略時は creds から構築）
+        max_workers (int): タスクリストごとの取得の同時実行数（1 で逐次）
     
     Returns:
         list[dict]: 各タスク {'title', 'due', 'notes', 'status', 'task_list'}
     """
+    def get_service():
+        return service or _shared_service('tasks', 'v1', creds)
+    
     try:
-        service = build('tasks', 'v1', credentials=creds)
+        list_service = get_service()
     except Exception as e:
         print(f"[calendar_agent] Tasks API 初期化エラー: {e}")
         return []
@@ -484,22 +601,29 @@ def fetch_google_tasks(creds):
     # 実行時から30日先のタイムスタンプを作成 (Google Tasks API用)
     time_max = (now + timedelta(days=30)).isoformat()
     
+    def fetch_list(tl):
+        return get_service().tasks().list(
+            tasklist=tl['id'],
+            showCompleted=False,
+            showHidden=False,
+            maxResults=100,
+            dueMax=time_max  # 31日先まで取得
+        ).execute()
+    
     try:
         # 全タスクリストを取得
-        tasklists = service.tasklists().list(maxResults=100).execute()
+        tasklists = list_service.tasklists().list(maxResults=100).execute()
+        tasklist_items = tasklists.get('items', [])
+        
+        # タスクリストごとの取得を並列に実行（集計・ログはタスクリスト順）
+        results = _fan_out(fetch_list, tasklist_items, max_workers=max_workers)
         
-        for tl in tasklists.get('items', []):
-            tl_id = tl['id']
+        for tl, (tasks_result, error) in zip(tasklist_items, results):
             tl_title = tl.get('title', '無題リスト')
             
             try:
-                tasks_result = service.tasks().list(
-                    tasklist=tl_id,
-                    showCompleted=False,
-                    showHidden=False,
-                    maxResults=100,
-                    dueMax=time_max  # 31日先まで取得
-                ).execute()
+                if error is not None:
+                    raise error
                 
                 items = tasks_result.get('items', [])
                 print(f"[calendar_agent] =========================================")
@@ -812,9 +936,11 @@ def generate_advisor_comment(free_slots, google_tasks):
 # ================================================================
 # メインエントリーポイント
 # ================================================================
-def run(output_local=True, output_drive=True):
+def run(output_local=True, output_drive=True, interactive=True):
     """
     カレンダーエージェントのメイン実行関数。
+    interactive=False の場合はブラウザ認証を行わず、認証できなければ RuntimeError を送出する
+    （バックグラウンド更新用。エラーは呼び出し側で表示する）。
     
     1. Google Calendar から予定を取得
     2. 空き時間を算出
@@ -829,9 +955,11 @@ def run(output_local=True, output_drive=True):
     print("=" * 50)
     
     # 1. 認証
-    creds = _get_credentials()
+    creds = _get_credentials(interactive=interactive)
     if not creds:
         print("[calendar_agent] ❌ 認証に失敗しました。token.json を確認してください。")
+        if not interactive:
+            raise RuntimeError("Googleカレンダーの認証に失敗しました（token.json を再認証してください）")
         return None
     
     # 2. カレンダーイベント取得
@@ -874,8 +1002,11 @@ def run(output_local=True, output_drive=True):
     if output_local:
         local_path = os.path.join(base_dir, '..', 'data', OUTPUT_FILENAME)
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        with open(local_path, 'w', encoding='utf-8') as f:
+        # 一時ファイル経由で差し替え（読み手が書きかけのファイルを見ないように）
+        tmp_path = f"{local_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(integrated, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, local_path)
         print(f"[calendar_agent] ✅ ローカル出力: {local_path}")
     
     # 8. Drive出力
@@ -0,0 +1,173 @@
+"""
+calendar_scheduler.py - カレンダーエージェントのバックグラウンド更新
+
+app.py は fetch_and_cache_calendar_data()（st.cache_data ttl=3600）をスクリプト実行中に
+同期的に呼んでいたため、キャッシュが切れた直後のページ表示が OAuth リフレッシュ・
+カレンダー/タスク取得・Gemini による助言生成を丸ごと待たされていた。
+
+本モジュールは
+  - デーモンスレッドで calendar_agent.run を REFRESH_INTERVAL_SEC ごとに実行し、
+    data/atlas_integrated_data.json を（run 内で一時ファイル経由で）差し替える
+  - UI は read_snapshot() で最後に書かれたスナップショットとその経過時間だけを読む
+ことで、ページ表示の待ち時間からカレンダー処理を外す。
+
+- スレッドはプロセスにつき1本（start() は何度呼んでもよい）
+- 起動時にスナップショットが十分新しければ、残り時間だけ待ってから更新する
+- 失敗時は RETRY_INTERVAL_SEC 後に再試行し、それまでは前回のスナップショットを返し続ける
+
+※ app.py は importlib.reload しないモジュールなので、スレッドとキャッシュは
+   Streamlit の再実行・セッションをまたいで共有される。
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from logic import calendar_agent
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, calendar_agent.OUTPUT_FILENAME)
+
+REFRESH_INTERVAL_SEC = 3600  # 旧 st.cache_data(ttl=3600) と同じ
+RETRY_INTERVAL_SEC = 300
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+_status = {'running': False, 'last_success': None, 'last_error': None}
+_snapshot_cache = {}  # {path: (mtime_ns, size, data)}
+
+
+def snapshot_age(path=None, now=None):
+    """スナップショットの経過秒数（無ければ None）。"""
+    path = path or SNAPSHOT_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    return max(0.0, (now or time.time()) - mtime)
+
+
+def read_snapshot(path=None):
+    """
+    最後に書かれたスナップショットを返す（ファイルが変わるまでは前回のパース結果を共有）。
+
+    Returns:
+        tuple: (data, age_sec) スナップショットが無い・読めない場合は ({}, None)
+    """
+    path = path or SNAPSHOT_PATH
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}, None
+    with _lock:
+        cached = _snapshot_cache.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        data = cached[2]
+    else:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[calendar_scheduler] WARNING: スナップショット読み込み失敗: {e}")
+            return ({}, None) if not cached else (cached[2], snapshot_age(path))
+        with _lock:
+            _snapshot_cache[path] = (st.st_mtime_ns, st.st_size, data)
+    return data, snapshot_age(path)
+
+
+def snapshot_version(path=None):
+    """
+    read_snapshot() が最後に返したスナップショットの版 (mtime_ns, size)。未読込なら None。
+    ファイルを stat し直さないので、直前に read_snapshot() で得たデータと必ず対応する。
+    """
+    path = path or SNAPSHOT_PATH
+    with _lock:
+        cached = _snapshot_cache.get(path)
+    return cached[:2] if cached else None
+
+
+def status():
+    """更新スレッドの状態 {'running', 'last_success', 'last_error'} のコピー。"""
+    with _lock:
+        return dict(_status)
+
+
+def format_age(age_sec):
+    """経過秒数を UI 表示用の文字列にする。"""
+    if age_sec is None:
+        return "未取得"
+    minutes = int(age_sec // 60)
+    if minutes < 1:
+        return "1分以内"
+    if minutes < 60:
+        return f"{minutes}分前"
+    hours = minutes // 60
+    if hours < 48:
+        return f"{hours}時間前"
+    return f"{hours // 24}日前"
+
+
+def refresh_now():
+    """
+    calendar_agent.run を1回実行する（ワーカースレッドから呼ばれる）。
+
+    Returns:
+        bool: スナップショットを書き出せた場合 True
+    """
+    with _lock:
+        _status['running'] = True
+    try:
+        # ワーカースレッドではブラウザ認証に応答できないため、認証できなければすぐに失敗させる
+        result = calendar_agent.run(output_local=True, output_drive=False, interactive=False)
+        ok = bool(result)
+        error = None if ok else "calendar_agent.run が結果を返しませんでした"
+    except Exception as e:
+        ok, error = False, str(e)
+    with _lock:
+        _status['running'] = False
+        if ok:
+            _status['last_success'] = datetime.now().isoformat(timespec='seconds')
+        _status['last_error'] = error
+    if error:
+        print(f"[calendar_scheduler] ⚠️ 更新失敗: {error}")
+    return ok
+
+
+def _worker(interval, path):
+    forced = False
+    while True:
+        age = snapshot_age(path)
+        if forced or age is None or age >= interval:
+            wait = interval if refresh_now() else RETRY_INTERVAL_SEC
+        else:
+            wait = interval - age
+        forced = _wake.wait(wait)
+        _wake.clear()
+
+
+def start(interval=REFRESH_INTERVAL_SEC):
+    """
+    更新スレッドを起動する（起動済みなら何もしない）。
+
+    Returns:
+        bool: 新たに起動した場合 True
+    """
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return False
+        _thread = threading.Thread(target=_worker, args=(interval, SNAPSHOT_PATH),
+                                   name='calendar_scheduler', daemon=True)
+        _thread.start()
+    print(f"[calendar_scheduler] 更新スレッド起動 (間隔 {interval}秒)")
+    return True
+
+
+def request_refresh():
+    """次の定期実行を待たずに更新させる（スレッド未起動なら起動する）。"""
+    start()
+    _wake.set()
@@ -0,0 +1,327 @@
+"""
+calendar_store.py - Googleカレンダーの差分同期 (syncToken) とローカルイベントストア
+
+fetch_calendar_events は更新のたびに全カレンダーの90日分を events().list で取り直し、
+nextPageToken も見ていなかった（500件を超えると切り捨て）。本モジュールは
+
+- 初回（およびトークン失効時）はページを最後まで辿る完全同期を行い、最終ページの
+  nextSyncToken をカレンダーごとに保存する
+- 2回目以降は syncToken を渡して「前回以降に変更・削除されたイベント」だけを受け取り、
+  ローカルのイベントストアに反映する（status="cancelled" は削除）
+- syncToken が失効した場合 (HTTP 410 Gone) はそのカレンダーのストアを捨てて完全同期し直す
+
+同期状態は data/calendar_sync_state.json に1ファイルで保存する（一時ファイル経由で差し替え）:
+    {
+        "version": 1,
+        "calendars": {
+            "<calendarId>": {
+                "summary": "...",
+                "sync_token": "...",
+                "full_synced_at": "2026-03-01T06:00:00+00:00",
+                "events": {"<eventId>": {"summary", "start", "end", "all_day",
+                                         ["recurrence"], ["recurring_event_id", "original_start"]}}
+            }
+        }
+    }
+
+※ syncToken は timeMin / timeMax / orderBy と併用できないため、完全同期は timeMin のみ
+   （終了が現在以降の予定）で取得し、表示期間での絞り込みと並べ替えは読み出し側で行う。
+   完全同期の起点は時間とともに古くなるので、FULL_RESYNC_DAYS ごとに完全同期し直す。
+
+※ 繰り返し予定は singleEvents を使わずに元の予定（recurrence 付き）のまま保存し、
+   読み出し時に表示期間の中だけ展開する。timeMax を付けられない同期で singleEvents=True にすると、
+   終了日の無い繰り返し予定が際限なく展開されてしまうため。
+   個別に変更・削除された回は recurring_event_id / original_start 付きの予定として保存し、
+   展開した回のうち同じ元の開始日時のものを置き換える（削除された回は "cancelled": True）。
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+from dateutil.rrule import rrulestr
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+SYNC_STATE_PATH = os.path.join(DATA_DIR, 'calendar_sync_state.json')
+
+STATE_VERSION = 2  # 2: 繰り返し予定を展開せずに保存
+
+# 完全同期の1ページあたりの件数（API の上限）
+PAGE_SIZE = 2500
+
+# 完全同期をやり直す間隔（完全同期の timeMin が古くなりすぎないように）
+FULL_RESYNC_DAYS = 7
+
+JST = timezone(timedelta(hours=9))
+
+_lock = threading.RLock()
+
+
+# =====================================================
+# 状態ファイル
+# =====================================================
+
+def load_state(path=None):
+    """同期状態を読み込む（無い・壊れている・版が違う場合は空の状態）。"""
+    path = path or SYNC_STATE_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if isinstance(state, dict) and state.get('version') == STATE_VERSION:
+            state.setdefault('calendars', {})
+            return state
+        print("[calendar_store] 同期状態の形式が異なるため破棄します")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[calendar_store] WARNING: 同期状態の読み込み失敗: {e}")
+    return {'version': STATE_VERSION, 'calendars': {}}
+
+
+def save_state(state, path=None):
+    """同期状態を保存する（一時ファイル経由で差し替え）。"""
+    path = path or SYNC_STATE_PATH
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with _lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"[calendar_store] WARNING: 同期状態の保存失敗: {e}")
+        return False
+
+
+# =====================================================
+# イベントの正規化
+# =====================================================
+
+def _original_start(event):
+    original = event.get('originalStartTime', {}) or {}
+    return original.get('date') or original.get('dateTime', '')
+
+
+def normalize_event(event):
+    """
+    API のイベントを保存形式 {'summary', 'start', 'end', 'all_day'} にする。
+    繰り返し予定は 'recurrence'、個別に変更された回は 'recurring_event_id' / 'original_start' も持つ。
+    """
+    start = event.get('start', {}) or {}
+    end = event.get('end', {}) or {}
+
+    # 終日イベント or 時間指定イベント
+    if 'date' in start:
+        all_day = True
+        start_dt = start['date']
+        end_dt = end.get('date', start_dt)
+    else:
+        all_day = False
+        start_dt = start.get('dateTime', '')
+        end_dt = end.get('dateTime', '')
+
+    normalized = {
+        'summary': event.get('summary', '(タイトルなし)'),
+        'start': start_dt,
+        'end': end_dt,
+        'all_day': all_day,
+    }
+    if event.get('recurrence'):
+        normalized['recurrence'] = list(event['recurrence'])
+    if event.get('recurringEventId'):
+        normalized['recurring_event_id'] = event['recurringEventId']
+        normalized['original_start'] = _original_start(event)
+    return normalized
+
+
+def _apply_change(events, event):
+    """
+    API のイベント1件をストア (events) に反映する。
+    削除された予定は取り除き、繰り返し予定の削除された回は展開時に除くための印を残す。
+    """
+    event_id = event.get('id')
+    if not event_id:
+        return
+    if event.get('status') != 'cancelled':
+        events[event_id] = normalize_event(event)
+    elif event.get('recurringEventId') and _original_start(event):
+        events[event_id] = {
+            'cancelled': True,
+            'recurring_event_id': event['recurringEventId'],
+            'original_start': _original_start(event),
+        }
+    else:
+        events.pop(event_id, None)
+
+
+def _to_datetime(value, all_day):
+    """保存形式の日時を比較用の aware datetime にする（終日は JST の 0:00）。"""
+    if all_day:
+        d = datetime.strptime(value, '%Y-%m-%d')
+        return d.replace(tzinfo=JST)
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.astimezone(JST)
+
+
+def _http_status(error):
+    """googleapiclient の HttpError 等から HTTP ステータスを取り出す（無ければ None）。"""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None) or getattr(error, 'status_code', None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+# =====================================================
+# 同期
+# =====================================================
+
+def _list_all(service, **params):
+    """
+    events().list を nextPageToken が無くなるまで辿る。
+
+    Returns:
+        tuple: (items, next_sync_token)
+    """
+    items = []
+    page_token = None
+    while True:
+        if page_token:
+            params['pageToken'] = page_token
+        result = service.events().list(**params).execute()
+        items.extend(result.get('items', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return items, result.get('nextSyncToken')
+
+
+def _needs_full_sync(entry, now):
+    if not entry or not entry.get('sync_token'):
+        return True
+    try:
+        synced_at = datetime.fromisoformat(entry.get('full_synced_at', ''))
+    except (TypeError, ValueError):
+        return True
+    return now - synced_at >= timedelta(days=FULL_RESYNC_DAYS)
+
+
+def sync_calendar(service, cal_id, entry=None, now=None):
+    """
+    1カレンダー分を同期し、更新後のストアを返す。
+
+    Args:
+        service: Calendar API のサービスオブジェクト
+        cal_id (str): カレンダーID
+        entry (dict): 前回の同期状態（load_state()['calendars'][cal_id]、無ければ None）
+        now (datetime): 現在時刻 UTC（テスト用）
+
+    Returns:
+        tuple: (entry, mode) mode は 'full' | 'incremental'
+    """
+    now = now or datetime.now(timezone.utc)
+
+    if not _needs_full_sync(entry, now):
+        try:
+            changes, sync_token = _list_all(
+                service, calendarId=cal_id, showDeleted=True,
+                maxResults=PAGE_SIZE, syncToken=entry['sync_token'])
+            events = dict(entry.get('events', {}))
+            for event in changes:
+                _apply_change(events, event)
+            return dict(entry, sync_token=sync_token or entry['sync_token'], events=events), 'incremental'
+        except Exception as e:
+            if _http_status(e) != 410:
+                raise
+            print(f"[calendar_store] syncToken 失効 (410)。完全同期し直します: {cal_id}")
+
+    # singleEvents=False でも、繰り返し予定の削除された回は status="cancelled" で返る
+    items, sync_token = _list_all(
+        service, calendarId=cal_id, maxResults=PAGE_SIZE,
+        timeMin=now.isoformat())
+    events = {}
+    for event in items:
+        _apply_change(events, event)
+    return {
+        'sync_token': sync_token,
+        'full_synced_at': now.isoformat(),
+        'events': events,
+    }, 'full'
+
+
+def _expand(event, time_min, time_max, overridden):
+    """
+    繰り返し予定を [time_min, time_max) と重なる回だけ展開する。
+    overridden（個別に変更・削除された回の元の開始日時）に含まれる回は除く。
+
+    Yields:
+        tuple: (start, 保存形式の予定)
+    """
+    all_day = event['all_day']
+    start = _to_datetime(event['start'], all_day)
+    duration = _to_datetime(event['end'], all_day) - start
+    lower, upper = time_min - duration, time_max
+    if all_day:
+        # 終日予定の RRULE（UNTIL=YYYYMMDD 等）は日付だけなので naive な JST で展開する
+        dtstart = start.replace(tzinfo=None)
+        lower = lower.astimezone(JST).replace(tzinfo=None)
+        upper = upper.astimezone(JST).replace(tzinfo=None)
+    else:
+        dtstart = start
+    rules = rrulestr("\n".join(event['recurrence']), dtstart=dtstart, forceset=True)
+    for occurrence in rules.between(lower, upper):
+        occurrence_start = occurrence.replace(tzinfo=JST) if all_day else occurrence
+        if occurrence_start in overridden:
+            continue
+        occurrence_end = occurrence + duration
+        yield occurrence_start, {
+            'summary': event['summary'],
+            'start': occurrence.strftime('%Y-%m-%d') if all_day else occurrence.isoformat(),
+            'end': occurrence_end.strftime('%Y-%m-%d') if all_day else occurrence_end.isoformat(),
+            'all_day': all_day,
+        }
+
+
+def events_in_window(entry, time_min, time_max):
+    """
+    ストアから [time_min, time_max) と重なる予定を開始順に返す
+    （旧 events().list(timeMin, timeMax, orderBy='startTime', singleEvents=True) と同じ絞り込み）。
+    繰り返し予定はこの期間の回だけを展開する。
+    """
+    events = entry.get('events') or {}
+
+    # 個別に変更・削除された回 {元の予定ID: {元の開始日時}}
+    overridden = {}
+    for event in events.values():
+        if event.get('recurring_event_id'):
+            try:
+                original = event['original_start']
+                start = _to_datetime(original, len(original) == 10)
+            except (KeyError, TypeError, ValueError):
+                continue
+            overridden.setdefault(event['recurring_event_id'], set()).add(start)
+
+    selected = []
+    for event_id, event in events.items():
+        if event.get('cancelled'):
+            continue
+        if event.get('recurrence'):
+            try:
+                occurrences = list(_expand(event, time_min, time_max, overridden.get(event_id, ())))
+                selected.extend((start, event_id, occurrence) for start, occurrence in occurrences)
+                continue
+            except Exception as e:
+                # 解釈できない RRULE は単発の予定として扱う
+                print(f"[calendar_store] WARNING: 繰り返し予定を展開できません ({event.get('summary')}): {e}")
+        try:
+            start = _to_datetime(event['start'], event['all_day'])
+            end = _to_datetime(event['end'], event['all_day'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if end > time_min and start < time_max:
+            selected.append((start, event_id, event))
+    selected.sort(key=lambda row: (row[0], row[1]))
+    return [event for _start, _event_id, event in selected]
@@ -0,0 +1,147 @@
+"""
+data_layer.py - Drive の商品マスタ・ログの stale-while-revalidate 読み込み
+
+load_data_from_drive() は st.cache_data(ttl=600) のブロッキング関数だったため、
+TTL が切れた直後のユーザーが認証・2ファイルのダウンロード・パースを待たされていた。
+また「🔄 最新データに更新」ボタンは st.cache_data.clear() でアプリ中の全キャッシュを消していた。
+
+本モジュールは
+  - 最後に正しくパースできたマスタ・ログ（スナップショット）を即座に返し
+  - スナップショットが MAX_AGE_SEC より古ければバックグラウンドスレッドで取得し直し
+  - 新しいデータが正しくパースできた場合だけ、スナップショットを丸ごと差し替える
+（読み手は常に「前の版」か「次の版」のどちらか一方だけを見る）。
+
+スナップショットが1つも無い初回だけは同期で読み込む（返せるデータが無いため）。
+
+※ app.py は importlib.reload しないモジュールなので、スナップショットと更新スレッドは
+   Streamlit の再実行・セッションをまたいで共有される。
+"""
+
+import time
+import threading
+from datetime import datetime
+
+from logic import drive_utils
+
+MAX_AGE_SEC = 600          # 旧 st.cache_data(ttl=600) と同じ
+RETRY_INTERVAL_SEC = 60    # 取得失敗後、次に取得を試みるまでの間隔
+
+_lock = threading.Lock()
+_snapshot = None   # 最後に正しくパースできた版（dict、差し替えのみで中身は変更しない）
+_status = {'refreshing': False, 'last_error': None, 'last_attempt': 0.0}
+_refresh_thread = None
+
+
+def _accept(master_df, log_df, previous):
+    """
+    取得結果をスナップショットとして採用できるか。
+
+    Returns:
+        str or None: 採用できない理由（採用できる場合 None）
+    """
+    if master_df is None:
+        return "商品マスタを取得・パースできませんでした"
+    if log_df is None and previous is not None and previous['log_df'] is not None:
+        # 前の版にはログがあるので、ログ無しの版で上書きしない
+        return "ログを取得・パースできませんでした"
+    return None
+
+
+def _refresh(cloud):
+    """Drive から取得し、正しくパースできた場合だけスナップショットを差し替える。"""
+    global _snapshot
+    error = None
+    try:
+        master_df, log_df, event_sheet_names, excel_bytes = drive_utils.fetch_drive_data(cloud=cloud)
+        with _lock:
+            previous = _snapshot
+        error = _accept(master_df, log_df, previous)
+        if error is None:
+            snapshot = {
+                'master_df': master_df,
+                'log_df': log_df,
+                'event_sheet_names': event_sheet_names,
+                'excel_bytes': excel_bytes,
+                'loaded_at': datetime.now(),
+                'loaded_ts': time.time(),
+                'generation': (previous['generation'] + 1) if previous else 1,
+            }
+            with _lock:
+                _snapshot = snapshot
+            print(f"[data_layer] スナップショットを差し替え (generation={snapshot['generation']})")
+    except Exception as e:
+        error = f"{e}"
+    with _lock:
+        _status['refreshing'] = False
+        _status['last_error'] = error
+    if error:
+        print(f"[data_layer] ⚠️ 取得失敗（前の版を使い続けます）: {error}")
+
+
+def refresh_async(force=False):
+    """
+    バックグラウンドでの取得を開始する（取得中なら何もしない）。
+    スクリプト実行スレッドから呼ぶこと（クラウド判定をここで行うため）。
+
+    Args:
+        force (bool): False の場合、直前の失敗から RETRY_INTERVAL_SEC 以内なら開始しない
+
+    Returns:
+        bool: 取得を開始した場合 True
+    """
+    global _refresh_thread
+    cloud = drive_utils._is_cloud()
+    with _lock:
+        if _status['refreshing']:
+            return False
+        if not force and _status['last_error'] and time.time() - _status['last_attempt'] < RETRY_INTERVAL_SEC:
+            return False
+        _status['refreshing'] = True
+        _status['last_attempt'] = time.time()
+        _refresh_thread = threading.Thread(target=_refresh, args=(cloud,), name='data_layer', daemon=True)
+        _refresh_thread.start()
+    return True
+
+
+def get_snapshot(max_age=MAX_AGE_SEC):
+    """
+    最後に正しくパースできたマスタ・ログを返す。古ければバックグラウンドでの取得を開始する。
+    スナップショットが無い場合だけ、取得の完了を待つ。
+
+    Returns:
+        dict or None: {
+            'master_df', 'log_df', 'event_sheet_names', 'excel_bytes',
+            'loaded_at' (datetime), 'loaded_ts' (float), 'generation' (int),
+        } 取得できていない場合は None。呼び出し側で変更しないこと（全セッションで共有）。
+    """
+    with _lock:
+        snapshot = _snapshot
+    if snapshot is None:
+        refresh_async()
+        thread = _refresh_thread
+        if thread is not None:
+            thread.join()
+        with _lock:
+            return _snapshot
+    if time.time() - snapshot['loaded_ts'] >= max_age:
+        refresh_async()
+    return snapshot
+
+
+def status():
+    """
+    UI 表示用の鮮度情報。
+
+    Returns:
+        dict: {'age_sec', 'loaded_at', 'generation', 'refreshing', 'last_error'}
+    """
+    with _lock:
+        snapshot = _snapshot
+        state = dict(_status)
+    return {
+        'age_sec': (time.time() - snapshot['loaded_ts']) if snapshot else None,
+        'loaded_at': snapshot['loaded_at'] if snapshot else None,
+        'generation': snapshot['generation'] if snapshot else 0,
+        'refreshing': state['refreshing'],
+        'last_error': state['last_error'],
+    }
@@ -0,0 +1,83 @@
+"""
+data_products.py - ページ単位で必要なデータだけを遅延算出する「データ製品」レジストリ
+
+app.py は選択中のページに関係なく、再実行のたびにトップレベルで
+calculate_production_events / read_confirmed_sheet / calculate_inventory を実行していた。
+
+本モジュールでは
+  - app.py が再実行ごとに「製品名 → (入力バージョン関数, 算出関数)」を register し
+  - 各ページは PAGE_PRODUCTS で必要な製品を宣言して、require() / get() で初めて算出させる
+  - 算出結果は製品名ごとに入力バージョンでメモ化し、同じ入力なら再実行・セッションをまたいで共有する
+ことで、在庫や生産イベントを使わないページ（軍師Zeus・Inspector 等）の表示をそれらの計算から切り離す。
+
+算出結果は共有されるため、呼び出し側で変更しないこと。
+
+※ app.py は importlib.reload しないモジュールなので、メモは Streamlit の再実行をまたいで保持される。
+"""
+
+import threading
+
+_lock = threading.Lock()
+_memo = {}          # {name: (version, value)}
+_compute_locks = {}  # {name: threading.Lock} 同じ製品を複数セッションで同時に算出しない
+
+
+def _compute_lock(name):
+    with _lock:
+        return _compute_locks.setdefault(name, threading.Lock())
+
+
+class ProductRegistry:
+    """
+    1回のスクリプト実行分の製品定義（register() で追加）。算出結果のメモはモジュール全体で共有する。
+    """
+
+    def __init__(self):
+        self._providers = {}
+
+    def register(self, name, version, compute):
+        """
+        製品を登録する。
+
+        Args:
+            name (str): 製品名
+            version (callable): 入力のバージョン（ハッシュ可能な値）を返す関数。None を返す場合はメモ化しない
+            compute (callable): 製品を算出する関数
+        """
+        self._providers[name] = (version, compute)
+
+    def get(self, name):
+        """製品を返す（入力バージョンが前回と同じならメモを返し、違えば算出する）。"""
+        version_fn, compute = self._providers[name]
+        version = version_fn()
+        if version is None:
+            return compute()
+        with _lock:
+            cached = _memo.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with _compute_lock(name):
+            # 待っている間に他のセッションが同じ版を算出していればそれを使う
+            with _lock:
+                cached = _memo.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            value = compute()
+            with _lock:
+                _memo[name] = (version, value)
+        print(f"[data_products] {name} を算出 (version={version})")
+        return value
+
+    def peek(self, name):
+        """算出済みで入力バージョンが一致するメモがあれば返す（算出はしない）。無ければ None。"""
+        version_fn, _compute = self._providers[name]
+        version = version_fn()
+        with _lock:
+            cached = _memo.get(name)
+        if version is not None and cached is not None and cached[0] == version:
+            return cached[1]
+        return None
+
+    def require(self, names):
+        """ページが宣言した製品をまとめて返す。{name: value}"""
+        return {name: self.get(name) for name in names}
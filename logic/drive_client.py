@@ -0,0 +1,151 @@
+"""
+drive_client.py - プロセス全体で共有する Drive API クライアント
+
+drive_utils.authenticate() は呼ばれるたびに認証情報を読み直し、build('drive', 'v3') で
+ディスカバリ文書のパースと新しい HTTP 接続（TLS ハンドシェイク）を行っていた。
+1回のページ表示で load_data / ensure_local_history / merge_event_targets / upload_to_drive 等から
+何度も呼ばれるため、その都度同じコストを払っていた。
+
+本モジュールは認証元（'local' / 'cloud'）ごとに
+  - 認証情報を1つだけ保持し、有効期限が REFRESH_MARGIN_SEC 以内に迫った時だけ更新する
+  - ディスカバリ文書は1度だけ読み込み、サービスは build_from_document で1度だけ構築する
+  - HTTP は接続を保持した httplib2.Http のプール（_HttpPool）経由で送り、TLS セッションを再利用する
+ことで、2回目以降の authenticate() をほぼ無コストにする。
+
+googleapiclient のサービスが使う httplib2.Http はスレッドセーフでないため、
+プールは1リクエストの間だけ Http を1つ専有させる（サービス自体は全スレッドで共有してよい）。
+Streamlit は再実行ごとに別スレッドでスクリプトを実行するので、スレッドローカルではなくプールにしている。
+
+※ app.py は importlib.reload しないモジュールなので、クライアントは Streamlit の再実行・セッションをまたいで共有される。
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import build_http
+
+API_NAME = 'drive'
+API_VERSION = 'v3'
+REFRESH_MARGIN_SEC = 300   # 有効期限の5分前から更新する（google-auth の自動更新より手前）
+POOL_SIZE = 4              # 保持しておく接続数（calendar_agent.FETCH_CONCURRENCY と同程度）
+
+_lock = threading.Lock()
+_clients = {}          # {source: {'creds': Credentials, 'service': Resource}}
+_discovery = {}        # {(api, version): ディスカバリ文書(str)}
+
+
+class _HttpPool:
+    """
+    httplib2.Http を貸し出すプール（AuthorizedHttp の下位トランスポートとして使う）。
+    1リクエストにつき1つを専有させ、終わったら戻して接続を次のリクエストで再利用する。
+    """
+
+    def __init__(self, max_idle=POOL_SIZE):
+        self._lock = threading.Lock()
+        self._idle = []
+        self._max_idle = max_idle
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        # build_http はタイムアウトとリダイレクト（308 を除く）を googleapiclient の既定に合わせる
+        return build_http()
+
+    def _release(self, http):
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(http)
+                return
+        http.close()
+
+    def request(self, *args, **kwargs):
+        http = self._acquire()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            self._release(http)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+
+def _discovery_document(api=API_NAME, version=API_VERSION):
+    """googleapiclient 同梱のディスカバリ文書を1度だけ読み込む（無い場合は None）。"""
+    key = (api, version)
+    with _lock:
+        if key in _discovery:
+            return _discovery[key]
+    doc = discovery_cache.get_static_doc(api, version)
+    with _lock:
+        return _discovery.setdefault(key, doc)
+
+
+def build_service(creds, api=API_NAME, version=API_VERSION):
+    """
+    接続プール経由の API サービスを構築する（全スレッドで共有してよい）。
+    calendar_agent の Calendar / Tasks API のサービスもこれで構築する。
+    """
+    http = AuthorizedHttp(creds, http=_HttpPool())
+    doc = _discovery_document(api, version)
+    if doc:
+        return build_from_document(doc, http=http)
+    return build(api, version, http=http)
+
+
+def _needs_refresh(creds, now=None):
+    """トークンが無いか、有効期限まで REFRESH_MARGIN_SEC を切っているか。"""
+    if not creds.token:
+        return True
+    if creds.expiry is None:
+        return False
+    # google-auth の expiry は naive な UTC
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now <= timedelta(seconds=REFRESH_MARGIN_SEC)
+
+
+def get_service(source, load_credentials, on_refresh=None):
+    """
+    認証元ごとに共有している Drive サービスを返す。初回（または更新失敗後）だけ load_credentials を呼ぶ。
+
+    Args:
+        source (str): 認証元（'local' / 'cloud'）
+        load_credentials (callable): 認証情報を読み込んで返す関数（失敗時は None）
+        on_refresh (callable): on_refresh(creds) トークン更新後に呼ぶ（token.json への保存など）
+
+    Returns:
+        googleapiclient Resource or None
+    """
+    with _lock:
+        client = _clients.get(source)
+        if client is not None:
+            creds = client['creds']
+            if not _needs_refresh(creds):
+                return client['service']
+            try:
+                creds.refresh(Request())
+                print(f"[drive_client] {source}: アクセストークンを更新")
+                if on_refresh:
+                    on_refresh(creds)
+                return client['service']
+            except Exception as e:
+                print(f"[drive_client] WARNING: {source} のトークン更新に失敗、認証し直します: {e}")
+                _clients.pop(source, None)
+
+    creds = load_credentials()
+    if creds is None:
+        return None
+    service = build_service(creds)
+    with _lock:
+        # 同時に初回認証した他スレッドがあれば、先に登録された方を使う
+        client = _clients.setdefault(source, {'creds': creds, 'service': service})
+    if client['service'] is service:
+        print(f"[drive_client] {source}: Drive サービスを構築")
+    return client['service']
@@ -1,14 +1,18 @@
 import os
 import io
+import json
+import hashlib
 import mimetypes
 import pandas as pd
 import streamlit as st
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 
+from logic import drive_client, perf, upload_queue
+from logic.workbook import get_workbook
+
 SCOPES = [
     'https://www.googleapis.com/auth/drive',
     'https://www.googleapis.com/auth/calendar.readonly',
@@ -57,9 +61,9 @@ def _is_cloud():
         
     return False
 
-def _authenticate_cloud():
+def _load_cloud_credentials():
     """
-    Streamlit Cloud用: st.secrets["google_oauth"] からOAuth2認証を復元する。
+    Streamlit Cloud用: st.secrets["google_oauth"] からOAuth2認証情報を復元する。
     リフレッシュトークンを使って自動的にアクセストークンを再取得する。
     """
     try:
@@ -89,15 +93,25 @@ def _authenticate_cloud():
         # トークンが期限切れの場合は自動リフレッシュ
         if not creds.valid:
             creds.refresh(Request())
-        return build('drive', 'v3', credentials=creds)
+        return creds
     except Exception as e:
         st.error(f"☁️ クラウド認証エラー: {e}")
         print(f"[authenticate_cloud] ERROR: {e}")
         return None
 
 
-def _authenticate_local():
-    """ローカル用: token.json / credentials.json ファイルから認証する。"""
+def _authenticate_cloud():
+    """Streamlit Cloud用: 共有の Drive サービスを返す（初回のみ st.secrets から認証）。"""
+    return drive_client.get_service('cloud', _load_cloud_credentials)
+
+
+def _save_local_token(creds):
+    with open(TOKEN_FILE, 'w') as token:
+        token.write(creds.to_json())
+
+
+def _load_local_credentials():
+    """ローカル用: token.json / credentials.json ファイルから認証情報を読み込む。"""
     creds = None
     if os.path.exists(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
@@ -117,16 +131,27 @@ def _authenticate_local():
                 creds = flow.run_local_server(port=0)
             except:
                 return None
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
+        _save_local_token(creds)
             
-    return build('drive', 'v3', credentials=creds)
+    return creds
 
 
-def authenticate():
+def _authenticate_local():
+    """ローカル用: 共有の Drive サービスを返す（初回のみ token.json から認証、更新したトークンは保存）。"""
+    return drive_client.get_service('local', _load_local_credentials, on_refresh=_save_local_token)
+
+
+@perf.timed('authenticate')
+def authenticate(cloud=None):
     """
     環境に応じて適切な認証方法を選択する。
     確実にローカル環境の設定を優先し、意図しないクラウドモードへの移行を防ぐ。
+    返すサービスは認証元ごとにプロセス全体で共有される（drive_client）。
+
+    Args:
+        cloud (bool): 認証ファイルが無い場合にクラウド認証を使うか。None の場合は _is_cloud() で判定する
+                      （_is_cloud() はスクリプト実行スレッドでしか判定できないため、
+                      バックグラウンドスレッドから呼ぶ場合は呼び出し元で判定して渡す）
     """
     # 1. token.json があればローカル認証
     if os.path.exists(TOKEN_FILE):
@@ -142,7 +167,9 @@ def authenticate():
         return _authenticate_local()
 
     # 3. どちらのファイルもない場合、環境判定してクラウドまたはローカル認証
-    if _is_cloud():
+    if cloud is None:
+        cloud = _is_cloud()
+    if cloud:
         print("[authenticate] クラウド環境と判定 → クラウド認証を実行")
         return _authenticate_cloud()
     else:
@@ -169,6 +196,7 @@ def find_file(service, keyword):
         print(f"[find_file] Error searching for '{keyword}': {e}")
         return None
 
+@perf.timed('download_content')
 def download_content(service, file_id, mime_type):
     """
     Driveファイルをダウンロードする。
@@ -263,23 +291,14 @@ def download_file_content(service, file_id, mime_type):
         return None
 
 
-def update_file_content(service, file_id, stream, mime_type):
+def get_file_metadata(service, file_id, fields='modifiedTime, md5Checksum'):
     """
-    Driveファイルの内容を上書きアップロードする。
-    stream: io.BytesIO (書き込むバイナリデータ)
-    mime_type: アップロードするファイルのMIMEタイプ
-    Returns: updated file metadata dict or None
+    ファイルのメタデータ（既定: modifiedTime / md5Checksum）を取得する。
+    本体をダウンロードせずに更新有無を判定するための軽量API。
+    ※ Google Sheets 等の Workspace ファイルには md5Checksum が存在しない。
+    Returns: dict (失敗時は例外を送出)
     """
-    try:
-        media = MediaIoBaseUpload(stream, mimetype=mime_type, resumable=True)
-        updated_file = service.files().update(
-            fileId=file_id,
-            media_body=media
-        ).execute()
-        return updated_file
-    except Exception as e:
-        st.error(f"アップロードエラー: {e}")
-        return None
+    return service.files().get(fileId=file_id, fields=fields).execute()
 
 
 def get_file_modified_time(service, file_id):
@@ -288,25 +307,157 @@ def get_file_modified_time(service, file_id):
     Returns: modifiedTime string or None
     """
     try:
-        file_meta = service.files().get(
-            fileId=file_id,
-            fields='modifiedTime'
-        ).execute()
+        file_meta = get_file_metadata(service, file_id, fields='modifiedTime')
         return file_meta.get('modifiedTime')
     except Exception as e:
         st.error(f"メタデータ取得エラー: {e}")
         return None
 
 
+# --- Driveダウンロードキャッシュ (data/drive_cache/) ---
+# ファイルID + リビジョン (md5Checksum / modifiedTime) をキーに、
+# ダウンロード済みの本体をディスクへ保存する。リビジョンが変わらない限り
+# 本体の再ダウンロードは行わず、metadata 1回分のAPI呼び出しで済ませる。
+
+DRIVE_CACHE_INDEX = "index.json"
+
+
+def _get_drive_cache_dir():
+    """Driveキャッシュディレクトリのパスを返す。なければ作成。"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    cache_dir = os.path.join(os.path.dirname(base_dir), "data", "drive_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _load_drive_cache_index(cache_dir):
+    path = os.path.join(cache_dir, DRIVE_CACHE_INDEX)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[drive_cache] WARNING: index 読み込み失敗 ({e}) → 空として扱います")
+        return {}
+
+
+def write_atomic(path, data):
+    """一時ファイルに書き出してから os.replace で差し替える（中途半端なファイルを残さない）。"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _revision_key(meta):
+    """メタデータからリビジョンキーを作る。md5 があれば優先（内容が同一なら同一キー）。"""
+    md5 = meta.get('md5Checksum')
+    if md5:
+        return f"md5:{md5}"
+    return f"mtime:{meta.get('modifiedTime', '')}"
+
+
+def _read_cached_blob(cache_dir, entry):
+    blob_path = os.path.join(cache_dir, entry.get('blob', ''))
+    if not entry.get('blob') or not os.path.exists(blob_path):
+        return None
+    with open(blob_path, 'rb') as f:
+        return io.BytesIO(f.read())
+
+
+def download_content_cached(service, file_id, mime_type):
+    """
+    download_content のキャッシュ付き版。
+    1. files().get で md5Checksum / modifiedTime を取得
+    2. index のリビジョンと一致すれば、ローカルに保存済みの本体を返す
+    3. 不一致なら download_content で取得し、本体(sha256名)と index を原子的に更新
+    メタデータ取得・ダウンロードに失敗した場合は、キャッシュがあれば古い本体を返す。
+    Returns: io.BytesIO or None
+    """
+    cache_dir = _get_drive_cache_dir()
+    index = _load_drive_cache_index(cache_dir)
+    entry = index.get(file_id, {})
+
+    try:
+        revision = _revision_key(get_file_metadata(service, file_id))
+    except Exception as e:
+        print(f"[drive_cache] metadata 取得失敗: {e}")
+        cached = _read_cached_blob(cache_dir, entry)
+        if cached is not None:
+            print(f"[drive_cache] オフラインのためキャッシュ ({entry.get('revision')}) を使用")
+            return cached
+        raise
+
+    if entry.get('revision') == revision:
+        cached = _read_cached_blob(cache_dir, entry)
+        if cached is not None:
+            print(f"[drive_cache] HIT file_id={file_id} ({revision})")
+            perf.count('drive_cache.hit')
+            return cached
+
+    print(f"[drive_cache] MISS file_id={file_id} ({revision}) → ダウンロード")
+    perf.count('drive_cache.miss')
+    stream = download_content(service, file_id, mime_type)
+    if stream is None:
+        return None
+
+    try:
+        data = stream.getvalue()
+        blob_name = f"{hashlib.sha256(data).hexdigest()}.bin"
+        blob_path = os.path.join(cache_dir, blob_name)
+        if not os.path.exists(blob_path):
+            write_atomic(blob_path, data)
+
+        old_blob = entry.get('blob')
+        index[file_id] = {
+            'revision': revision,
+            'mime_type': mime_type,
+            'blob': blob_name,
+            'size': len(data),
+            'cached_at': datetime.now().isoformat(),
+        }
+        write_atomic(
+            os.path.join(cache_dir, DRIVE_CACHE_INDEX),
+            json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8')
+        )
+        # 他のファイルIDから参照されていない古い本体は削除
+        if old_blob and old_blob != blob_name and all(e.get('blob') != old_blob for e in index.values()):
+            try:
+                os.remove(os.path.join(cache_dir, old_blob))
+            except OSError:
+                pass
+    except Exception as e:
+        # キャッシュ書き込み失敗はダウンロード結果に影響させない
+        print(f"[drive_cache] WARNING: キャッシュ保存失敗: {e}")
+
+    stream.seek(0)
+    return stream
+
+
 # --- CONFIRMED ログ管理 (ローカルCSV方式) ---
 # Sheets API不要。ローカルCSVファイルに追記する。
 # 単一マシンの工房向け。将来的にCloud同期を追加可能。
 
 import csv
+import struct
+import threading
 from datetime import datetime
 
 CONFIRMED_HEADERS = ["TIMESTAMP", "PROJECT", "PART", "ACTION", "SOURCE_HASHES", "ATLAS_TIMESTAMP"]
 
+# --- 確定済みハッシュ索引 (data/confirmed_hashes.idx) ---
+# SOURCE_HASHES（64桁hexのカンマ連結）を毎回分解せずに済むよう、
+# 先頭 CONFIRMED_DIGEST_BYTES バイトに切り詰めたダイジェストを連結したバイナリで保持する。
+# ヘッダには索引作成時点の CSV サイズを持ち、CSV と一致しなければ CSV から作り直す。
+CONFIRMED_INDEX_FILE = "confirmed_hashes.idx"
+CONFIRMED_DIGEST_BYTES = 8
+_CONFIRMED_INDEX_MAGIC = b"CIDX"
+_CONFIRMED_INDEX_HEADER = struct.Struct("<4sQ")  # magic, CSVサイズ
+
+_confirmed_index_lock = threading.Lock()
+_confirmed_index = {"key": None, "digests": set()}  # key: (索引パス, CSVサイズ)
+
 
 def _get_confirmed_path():
     """CONFIRMEDログファイルのパスを返す。data/ ディレクトリがなければ作成。"""
@@ -316,16 +467,137 @@ def _get_confirmed_path():
     return os.path.join(data_dir, "confirmed_log.csv")
 
 
+def _hash_digest(source_hash):
+    """
+    ソースハッシュ（SHA256 hex）を索引用の短いダイジェストに変換する。
+    hex でない値は SHA256 を取ってから切り詰める。空文字は None。
+    """
+    value = str(source_hash).strip().lower()
+    if not value:
+        return None
+    if len(value) >= CONFIRMED_DIGEST_BYTES * 2:
+        try:
+            return bytes.fromhex(value)[:CONFIRMED_DIGEST_BYTES]
+        except ValueError:
+            pass
+    return hashlib.sha256(value.encode('utf-8')).digest()[:CONFIRMED_DIGEST_BYTES]
+
+
+def _split_digests(source_hashes):
+    """カンマ区切りの SOURCE_HASHES をダイジェストのリストにする。"""
+    if not isinstance(source_hashes, str) or not source_hashes:
+        return []
+    return [d for d in (_hash_digest(h) for h in source_hashes.split(',')) if d]
+
+
+def _get_confirmed_index_path():
+    return os.path.join(os.path.dirname(_get_confirmed_path()), CONFIRMED_INDEX_FILE)
+
+
+def _write_confirmed_index(index_path, digests, csv_size):
+    header = _CONFIRMED_INDEX_HEADER.pack(_CONFIRMED_INDEX_MAGIC, csv_size)
+    write_atomic(index_path, header + b"".join(sorted(digests)))
+
+
+def _rebuild_confirmed_index(csv_path, index_path, csv_size):
+    """CSV の SOURCE_HASHES 列から索引を作り直す。"""
+    digests = set()
+    if csv_size:
+        df = pd.read_csv(csv_path, encoding='utf-8', usecols=lambda c: c == 'SOURCE_HASHES', dtype=str)
+        if 'SOURCE_HASHES' in df.columns:
+            for val in df['SOURCE_HASHES'].dropna():
+                digests.update(_split_digests(val))
+    _write_confirmed_index(index_path, digests, csv_size)
+    print(f"[confirmed_index] 索引を再構築しました ({len(digests)}件)")
+    return digests
+
+
+def _get_confirmed_digests():
+    """
+    確定済みダイジェストの集合を返す。
+    メモリ上の集合が CSV と同期していればそのまま使い、索引ファイルの CSVサイズが
+    CSV と一致すれば索引を読み込み、どちらでもなければ CSV から再構築する。
+    """
+    csv_path = _get_confirmed_path()
+    index_path = _get_confirmed_index_path()
+    csv_size = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+    key = (index_path, csv_size)
+
+    with _confirmed_index_lock:
+        if _confirmed_index["key"] == key:
+            return _confirmed_index["digests"]
+
+        digests = None
+        try:
+            with open(index_path, 'rb') as f:
+                data = f.read()
+            magic, indexed_size = _CONFIRMED_INDEX_HEADER.unpack_from(data)
+            body = data[_CONFIRMED_INDEX_HEADER.size:]
+            if magic == _CONFIRMED_INDEX_MAGIC and indexed_size == csv_size and len(body) % CONFIRMED_DIGEST_BYTES == 0:
+                digests = {body[i:i + CONFIRMED_DIGEST_BYTES] for i in range(0, len(body), CONFIRMED_DIGEST_BYTES)}
+        except (OSError, struct.error):
+            pass
+
+        if digests is None:
+            try:
+                digests = _rebuild_confirmed_index(csv_path, index_path, csv_size)
+            except Exception as e:
+                print(f"[confirmed_index] WARNING: 索引の再構築に失敗: {e}")
+                return set()
+
+        _confirmed_index["key"] = key
+        _confirmed_index["digests"] = digests
+        return digests
+
+
+def _append_confirmed_index(source_hashes, old_csv_size, new_csv_size):
+    """
+    追記した行のハッシュを索引に加える。索引が追記前の CSV と同期していない場合は
+    何もしない（次回の参照時に CSV から再構築される）。
+    """
+    index_path = _get_confirmed_index_path()
+    with _confirmed_index_lock:
+        if _confirmed_index["key"] != (index_path, old_csv_size):
+            return
+        new_digests = [d for d in _split_digests(source_hashes) if d not in _confirmed_index["digests"]]
+        try:
+            with open(index_path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                f.write(b"".join(new_digests))
+                f.seek(0)
+                f.write(_CONFIRMED_INDEX_HEADER.pack(_CONFIRMED_INDEX_MAGIC, new_csv_size))
+        except OSError as e:
+            print(f"[confirmed_index] WARNING: 索引の追記に失敗: {e}")
+            _confirmed_index["key"] = None
+            return
+        _confirmed_index["digests"].update(new_digests)
+        _confirmed_index["key"] = (index_path, new_csv_size)
+
+
+def is_confirmed(event):
+    """
+    生産イベントのソースハッシュが1つでも確定済みなら True（確定済みハッシュ索引で判定）。
+
+    Args:
+        event (dict): calculate_production_events の出力1件
+    """
+    source_hashes = event.get('extendedProps', {}).get('source_hashes', '')
+    digests = _get_confirmed_digests()
+    return any(d in digests for d in _split_digests(source_hashes))
+
+
 def append_to_confirmed_sheet(project, part, action="PRODUCED", source_hashes="", atlas_timestamp=""):
     """
     CONFIRMEDログに1行追記する（ローカルCSV）。
     Append-Only: 既存データは一切変更しない。
+    追記した SOURCE_HASHES は確定済みハッシュ索引にも追加する。
     
     Returns: (success: bool, message: str)
     """
     try:
         filepath = _get_confirmed_path()
         file_exists = os.path.exists(filepath)
+        old_size = os.path.getsize(filepath) if file_exists else 0
         
         timestamp = datetime.now().strftime("%Y/%m/%d %H:%M:%S")
         row = [timestamp, project, part, action, source_hashes, atlas_timestamp]
@@ -335,6 +607,8 @@ def append_to_confirmed_sheet(project, part, action="PRODUCED", source_hashes=""
             if not file_exists:
                 writer.writerow(CONFIRMED_HEADERS)
             writer.writerow(row)
+
+        _append_confirmed_index(source_hashes, old_size, os.path.getsize(filepath))
         
         return True, f"✅ {project}({part}) を確定記録しました [{action}]"
         
@@ -342,6 +616,17 @@ def append_to_confirmed_sheet(project, part, action="PRODUCED", source_hashes=""
         return False, f"確定記録エラー: {e}"
 
 
+def confirmed_sheet_version():
+    """
+    CONFIRMEDログの版（サイズ, 更新時刻）。追記のたびに変わる。ファイルが無い場合は (0, 0)。
+    """
+    try:
+        st_ = os.stat(_get_confirmed_path())
+        return st_.st_size, st_.st_mtime_ns
+    except OSError:
+        return 0, 0
+
+
 def read_confirmed_sheet():
     """
     CONFIRMEDログの全データをDataFrameとして取得。
@@ -362,74 +647,81 @@ def read_confirmed_sheet():
         return pd.DataFrame(columns=CONFIRMED_HEADERS)
 
 
-@st.cache_data(show_spinner=False, ttl=600)
-def load_data_from_drive():
+def fetch_drive_data(cloud=None, notify=None):
     """
-    Load Master and Log data with UI feedback.
-    Applies st.empty() to clear status after loading.
+    Drive から商品マスタ (メニュー.xlsx) とログを取得してパースする。
+    Streamlit の UI に依存しないため、バックグラウンドスレッドからも呼べる。
+
+    Args:
+        cloud (bool): authenticate() に渡すクラウド判定（None の場合はその場で判定）
+        notify (callable): notify(level, message) 進捗・警告の通知先
+                           level は 'info' | 'success' | 'warning' | 'error'（省略時は通知しない）
+
+    Returns:
+        tuple: (master_df, log_df, event_sheet_names, excel_bytes)
     """
-    status_area = st.empty()
-    status_area.info("🔵 Connecting to Google Drive...")
+    notify = notify or (lambda level, message: None)
+    notify('info', "🔵 Connecting to Google Drive...")
     print("[load_data] Step 1: Authenticating...")
     
     try:
-        service = authenticate()
+        service = authenticate(cloud=cloud)
     except Exception as e:
-        status_area.error(f"❌ 認証エラー: {e}")
+        notify('error', f"❌ 認証エラー: {e}")
         return None, None, [], None
 
     if not service:
-        status_area.error("❌ 認証失敗")
+        notify('error', "❌ 認証失敗")
         return None, None, [], None
     print("[load_data] Step 1: OK")
         
-    status_area.info("🔵 Downloading files...")
+    notify('info', "🔵 Downloading files...")
     print("[load_data] Step 2: Downloading by direct file ID...")
 
     # ファイルID直接指定でダウンロード（検索不要）
+    # リビジョンが前回と同じならディスクキャッシュから読み込む
     try:
-        master_stream = download_content(service, MASTER_FILE_ID, MASTER_FILE_MIME)
+        master_stream = download_content_cached(service, MASTER_FILE_ID, MASTER_FILE_MIME)
     except Exception as e:
         master_stream = None
-        st.warning(f"⚠️ Masterダウンロードエラー: {e}")
+        notify('warning', f"⚠️ Masterダウンロードエラー: {e}")
 
     try:
-        log_stream = download_content(service, LOG_FILE_ID, LOG_FILE_MIME)
+        log_stream = download_content_cached(service, LOG_FILE_ID, LOG_FILE_MIME)
     except Exception as e:
         log_stream = None
-        st.warning(f"⚠️ Logダウンロードエラー: {e}")
+        notify('warning', f"⚠️ Logダウンロードエラー: {e}")
     
     if not master_stream:
         print("[load_data] FAIL: master_stream is None")
     if not log_stream:
         print("[load_data] FAIL: log_stream is None")
     
-    status_area.success("✅ Download Complete!")
+    notify('success', "✅ Download Complete!")
     
     # Parse Master (xlsx)
+    # ワークブックはコンテンツハッシュ単位でキャッシュされ、
+    # merge_event_targets / BIダッシュボードでも同じパース結果を共有する
     master_df = None
+    workbook = None
+    excel_bytes = None
     if master_stream:
         try:
-            master_df = pd.read_excel(master_stream, sheet_name="商品マスタ")
+            excel_bytes = master_stream.getvalue()
+            workbook = get_workbook(excel_bytes)
+            master_df = workbook.sheet("商品マスタ")
             print(f"[load_data] Step 5: Master parsed OK ({len(master_df)} rows)")
         except Exception as e:
             print(f"[load_data] FAIL: pd.read_excel error: {e}")
-            st.warning(f"⚠️ Masterパースエラー: {e}")
+            notify('warning', f"⚠️ Masterパースエラー: {e}")
             master_df = None
     
     # イベントシート名一覧を取得
     event_sheet_names = []
-    excel_bytes = None
     EXCLUDE_SHEETS = {'商品マスタ', 'データ構造', 'Sheet2'}
-    if master_stream:
-        try:
-            master_stream.seek(0)
-            excel_bytes = master_stream.read()
-            xls = pd.ExcelFile(io.BytesIO(excel_bytes))
-            event_sheet_names = [s for s in xls.sheet_names if s not in EXCLUDE_SHEETS]
-            print(f"[load_data] Event sheets: {event_sheet_names}")
-        except Exception as e:
-            print(f"[load_data] WARNING: Could not read sheet names: {e}")
+    if workbook:
+        event_sheet_names = [s for s in workbook.sheet_names if s not in EXCLUDE_SHEETS]
+        print(f"[load_data] Event sheets: {event_sheet_names}")
     
     # Parse Log (CSV)
     log_df = None
@@ -441,18 +733,70 @@ def load_data_from_drive():
             print(f"[load_data] FAIL: pd.read_csv error: {e}")
             log_df = None
     
-    # Clear Status
-    status_area.empty()
-    
     return master_df, log_df, event_sheet_names, excel_bytes
 
 
+@st.cache_data(show_spinner=False, ttl=600)
+def load_data_from_drive():
+    """
+    Load Master and Log data with UI feedback.
+    Applies st.empty() to clear status after loading.
+    （アプリ本体は data_layer 経由の stale-while-revalidate 読み込みを使う。スクリプト用）
+    """
+    status_area = st.empty()
+    failed = []
+
+    def notify(level, message):
+        if level == 'warning':
+            st.warning(message)
+            return
+        if level == 'error':
+            failed.append(message)
+        getattr(status_area, level)(message)
+
+    result = fetch_drive_data(notify=notify)
+    
+    # Clear Status（認証エラーは表示したままにする）
+    if not failed:
+        status_area.empty()
+    
+    return result
+
+
+# これ以下のサイズは単純アップロード（1リクエスト）、超える場合は再開可能アップロードで送る
+SIMPLE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+
+
+def _upload_file(local_path, drive_file_id):
+    """
+    ローカルファイルを Drive 上の既存ファイルに上書きアップロードする（upload_queue のワーカーから呼ぶ）。
+    失敗時は例外を送出する（upload_queue がバックオフして再試行する。認証できない場合は再試行しない）。
+    """
+    # 予約時にクラウドでないことを確認済みのため、ワーカースレッドでは判定し直さない
+    service = authenticate(cloud=False)
+    if not service:
+        raise upload_queue.PermanentUploadError("Google Drive認証に失敗しました")
+
+    mime_type, _ = mimetypes.guess_type(local_path)
+    if mime_type is None:
+        mime_type = "application/octet-stream"
+
+    # 送る時点の内容を読む（予約がまとめられた間の書き込みもすべて反映される）。
+    # 書き込みと別スレッドで読むため、書き手は write_atomic 等で丸ごと差し替えること
+    with open(local_path, "rb") as f:
+        data = f.read()
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime_type,
+                              resumable=len(data) > SIMPLE_UPLOAD_MAX_BYTES)
+    return service.files().update(fileId=drive_file_id, media_body=media, fields='id, name').execute()
+
+
 def upload_to_drive(local_path, drive_file_id):
     """
     ローカルファイルをGoogleドライブ上の既存ファイルに上書きアップロードする。
     
     Phase 1 用: スキャンやログ追記の直後に呼び出し、
     Googleドライブ上の同名ファイルを自動更新する。
+    アップロードは upload_queue に予約してすぐに戻る（同じファイルへの連続した書き込みは1回にまとめる）。
 
     Args:
         local_path (str): アップロードするローカルファイルのパス。
@@ -463,6 +807,7 @@ def upload_to_drive(local_path, drive_file_id):
     """
     try:
         # WEB環境（Streamlit Cloud）ではデータの破壊を防ぐためアップロードを完全禁止する
+        # （_is_cloud() はスクリプト実行スレッドでしか判定できないため、予約時に判定する）
         if _is_cloud():
             msg = "WEB環境のためDriveへのアップロード処理をスキップしました (Read-Only)"
             print(f"[upload_to_drive] {msg}")
@@ -471,29 +816,9 @@ def upload_to_drive(local_path, drive_file_id):
         if not os.path.exists(local_path):
             return False, f"❌ ファイルが見つかりません: {local_path}"
 
-        # 認証
-        service = authenticate()
-        if not service:
-            return False, "❌ Google Drive認証に失敗しました"
-
-        # MIMEタイプを自動判定
-        mime_type, _ = mimetypes.guess_type(local_path)
-        if mime_type is None:
-            mime_type = "application/octet-stream"
-
-        # ローカルファイルをバイナリストリームとして読み込み
-        with open(local_path, "rb") as f:
-            stream = io.BytesIO(f.read())
-
-        # Driveへ上書きアップロード
-        result = update_file_content(service, drive_file_id, stream, mime_type)
-
-        if result:
-            file_name = result.get("name", drive_file_id)
-            print(f"[upload_to_drive] ✅ '{local_path}' → Drive '{file_name}' アップロード完了")
-            return True, f"✅ '{os.path.basename(local_path)}' をドライブへアップロードしました"
-        else:
-            return False, "❌ アップロードに失敗しました（update_file_content が None を返しました）"
+        upload_queue.enqueue(local_path, drive_file_id, _upload_file)
+        print(f"[upload_to_drive] '{local_path}' → Drive ({drive_file_id}) のアップロードを予約")
+        return True, f"✅ '{os.path.basename(local_path)}' のドライブ同期を予約しました"
 
     except Exception as e:
         print(f"[upload_to_drive] ERROR: {e}")
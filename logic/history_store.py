@@ -0,0 +1,588 @@
+"""
+history_store.py - 在庫スナップショット履歴ストア (JSON Lines / 追記専用)
+
+history_summary.json（JSON配列）を毎回全件読み込み→1件追加→全体を書き直し→
+Driveへ再アップロードしていた方式を置き換える。
+
+- 1スナップショット = 1行の JSON (data/history_summary.jsonl)。追記のみで既存行は書き換えない
+- 直前のスナップショットと details が同一なら追記しない（再実行ごとの重複を防止）
+- type="initial" の差し替えも「新しい initial 行の追記」で表現し、読み出し時は最後の initial のみ有効
+- 行ごとのタイムスタンプとファイル内オフセットの索引をメモリに保持し、
+  日付範囲・最新N件の読み出しでは該当行だけを JSON パースする
+  （追記分だけを差分で索引に取り込む。app.py が reload しないモジュールなので再実行をまたいで保持）
+
+スナップショットの圧縮形式:
+- キーフレーム: details（全商品IDの count / target）をそのまま持つ行
+- 差分: "encoding": "delta" を持ち、直前の状態から変わったIDだけを "delta"、
+  消えたIDを "removed" に持つ行。KEYFRAME_INTERVAL 行ごと（または差分が大きい場合）に
+  キーフレームを挟むため、任意時点の復元は直前のキーフレームから数行辿るだけで済む
+- 読み出しAPIは常に details を復元（materialize）したエントリを返す
+
+旧形式 (history_summary.json の JSON配列) は初回アクセス時に自動で移行する。
+
+Google Drive 上の history_summary.json (HISTORY_SUMMARY_DRIVE_ID) は check_drive.py 等の
+外部スクリプトが JSON配列として読むため、旧形式のまま export_json_array() で書き出してアップロードする。
+"""
+
+import os
+import re
+import json
+import threading
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+HISTORY_PATH = os.path.join(DATA_DIR, 'history_summary.jsonl')
+LEGACY_HISTORY_PATH = os.path.join(DATA_DIR, 'history_summary.json')
+# Drive へアップロードする旧形式（JSON配列）の書き出し先
+EXPORT_PATH = os.path.join(DATA_DIR, 'history_summary_export.json')
+
+# 差分行をこの件数続けたら次はキーフレームにする
+KEYFRAME_INTERVAL = 20
+
+# 先頭キー "timestamp"（無ければ "date"）等を行をパースせずに取り出す
+_TS_RE = re.compile(r'"(?:timestamp|date)":\s*"([^"]*)"')
+_TYPE_RE = re.compile(r'"type":\s*"([^"]*)"')
+_DELTA_RE = re.compile(r'"encoding":\s*"delta"')
+
+# 索引の1行: (ts, offset, length, type, is_delta, keyframe_pos, pos)
+_TS, _OFFSET, _LENGTH, _TYPE, _IS_DELTA, _KF_POS, _POS = range(7)
+
+_index_cache = {}  # {path: {"ino", "size", "rows": [...]}}
+_matrix_cache = {}  # {path: {"ino", "size", "matrix": SnapshotMatrix}}
+_lock = threading.RLock()
+
+
+# =====================================================
+# シリアライズ
+# =====================================================
+
+def _entry_ts(entry):
+    return entry.get('timestamp') or entry.get('date') or ''
+
+
+def _dumps(record):
+    """timestamp, date, type, encoding を先頭キーにして1行のJSONにする（索引が行頭だけで済むように）。"""
+    ordered = {}
+    for key in ('timestamp', 'date', 'type', 'encoding'):
+        if key in record:
+            ordered[key] = record[key]
+    ordered.update(record)
+    return json.dumps(ordered, ensure_ascii=False) + "\n"
+
+
+def _encode(entry, prev_details, deltas_since_keyframe):
+    """
+    エントリを保存用レコードに変換する。
+    直前の状態があり、変化したIDが全体の半分以下なら差分行にする。
+
+    Returns:
+        tuple: (record, is_delta)
+    """
+    details = entry.get('details')
+    if not prev_details or not details or deltas_since_keyframe >= KEYFRAME_INTERVAL:
+        return entry, False
+    delta = {k: v for k, v in details.items() if prev_details.get(k) != v}
+    removed = [k for k in prev_details if k not in details]
+    if len(delta) + len(removed) > len(details) // 2:
+        return entry, False
+    record = {k: v for k, v in entry.items() if k != 'details'}
+    record['encoding'] = 'delta'
+    record['delta'] = delta
+    if removed:
+        record['removed'] = removed
+    return record, True
+
+
+def _apply(state, record):
+    """レコードを状態 (details) に適用する。state は破壊的に更新される。"""
+    if record.get('encoding') != 'delta':
+        state.clear()
+        state.update(record.get('details') or {})
+    else:
+        for k in record.get('removed', []):
+            state.pop(k, None)
+        state.update(record.get('delta') or {})
+    return state
+
+
+def _materialized(record, state):
+    entry = {k: v for k, v in record.items() if k not in ('encoding', 'delta', 'removed')}
+    entry['details'] = dict(state)
+    return entry
+
+
+def parse_history_bytes(raw):
+    """
+    履歴ファイルの中身（旧: JSON配列 / 新: JSON Lines）をエントリのリストに変換する。
+    Driveから取得したファイルがどちらの形式でも読めるようにするための共通処理。
+    差分行は details を復元した形で返す。
+    """
+    text = raw.decode('utf-8') if isinstance(raw, (bytes, bytearray)) else raw
+    stripped = text.lstrip()
+    if not stripped:
+        return []
+    if stripped.startswith('['):
+        data = json.loads(stripped)
+        return [h for h in data if isinstance(h, dict)]
+    entries = []
+    state = {}
+    for line in text.splitlines():
+        if line.strip():
+            record = json.loads(line)
+            entries.append(_materialized(record, _apply(state, record)))
+    return entries
+
+
+def _dedupe(entries):
+    """連続して details が同一のスナップショットを除く（移行・復元時用）。"""
+    result = []
+    last_details = None
+    for entry in entries:
+        details = entry.get('details')
+        if details and details == last_details and entry.get('type') != 'initial':
+            continue
+        result.append(entry)
+        if details:
+            last_details = details
+    return result
+
+
+def _write_all(entries, path):
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    prev_details = None
+    deltas = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            record, is_delta = _encode(entry, prev_details, deltas)
+            deltas = deltas + 1 if is_delta else 0
+            prev_details = entry.get('details') or {}
+            f.write(_dumps(record))
+    os.replace(tmp_path, path)
+
+
+def restore_from_bytes(raw, path=None):
+    """
+    Drive等から取得した履歴ファイルの中身でローカルのストアを置き換える。
+
+    Returns:
+        int: 書き込んだエントリ数
+    """
+    path = path or HISTORY_PATH
+    entries = _dedupe(parse_history_bytes(raw))
+    with _lock:
+        _write_all(entries, path)
+        _index_cache.pop(path, None)
+        _matrix_cache.pop(path, None)
+    return len(entries)
+
+
+def _ensure_migrated(path):
+    """旧形式 history_summary.json しか無い場合、JSON Lines へ移行する。"""
+    if os.path.exists(path) or path != HISTORY_PATH or not os.path.exists(LEGACY_HISTORY_PATH):
+        return
+    try:
+        with open(LEGACY_HISTORY_PATH, 'rb') as f:
+            count = restore_from_bytes(f.read(), path)
+        print(f"[history_store] 旧形式 history_summary.json を移行しました ({count}件)")
+    except Exception as e:
+        print(f"[history_store] WARNING: 旧形式の移行に失敗: {e}")
+
+
+def exists(path=None):
+    path = path or HISTORY_PATH
+    _ensure_migrated(path)
+    return os.path.exists(path)
+
+
+# =====================================================
+# 索引（タイムスタンプ → ファイル内オフセット）
+# =====================================================
+
+def _scan(path, start_offset, rows):
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        offset = start_offset
+        for line in f:
+            length = len(line)
+            if line.strip():
+                head = line[:256].decode('utf-8', errors='ignore')
+                ts_match = _TS_RE.search(head)
+                type_match = _TYPE_RE.search(head)
+                is_delta = bool(_DELTA_RE.search(head))
+                pos = len(rows)
+                rows.append((
+                    ts_match.group(1) if ts_match else '',
+                    offset,
+                    length,
+                    type_match.group(1) if type_match else '',
+                    is_delta,
+                    rows[-1][_KF_POS] if is_delta and rows else pos,
+                    pos,
+                ))
+            offset += length
+    return offset
+
+
+def _get_index(path):
+    """
+    行索引を返す。ファイルが追記されただけなら増分のみ走査する。
+    Returns: list of (ts, offset, length, type, is_delta, keyframe_pos, pos) ファイル内の並び順
+    """
+    _ensure_migrated(path)
+    if not os.path.exists(path):
+        return []
+    st = os.stat(path)
+    with _lock:
+        cached = _index_cache.get(path)
+        if cached and cached['ino'] == st.st_ino and cached['size'] == st.st_size:
+            return cached['rows']
+        if cached and cached['ino'] == st.st_ino and cached['size'] < st.st_size:
+            rows = list(cached['rows'])
+            size = _scan(path, cached['size'], rows)
+        else:
+            rows = []
+            size = _scan(path, 0, rows)
+        _index_cache[path] = {'ino': st.st_ino, 'size': size, 'rows': rows}
+        return rows
+
+
+def _effective_rows(rows):
+    """最後の initial 以外の initial を除き、タイムスタンプ順（同時刻はファイル順）に並べる。"""
+    last_initial = None
+    for row in rows:
+        if row[_TYPE] == 'initial':
+            last_initial = row[_POS]
+    effective = [row for row in rows
+                 if row[_TS] and (row[_TYPE] != 'initial' or row[_POS] == last_initial)]
+    return sorted(effective, key=lambda r: r[_TS])
+
+
+def _read_record(f, row):
+    f.seek(row[_OFFSET])
+    return json.loads(f.read(row[_LENGTH]).decode('utf-8'))
+
+
+def _load_rows(path, rows, all_rows):
+    """
+    指定行のエントリを details を復元した状態で返す（rows の並び順を維持）。
+    差分行は直前のキーフレームから順に適用して復元する。
+    """
+    if not rows:
+        return []
+    restored = {}
+    state = {}
+    cur = None  # state に適用済みの最後の行位置
+    with open(path, 'rb') as f:
+        for pos in sorted({row[_POS] for row in rows}):
+            kf = all_rows[pos][_KF_POS]
+            if cur is not None and kf <= cur < pos:
+                start = cur + 1
+            else:
+                start = kf
+                state = {}
+            for p in range(start, pos + 1):
+                record = _read_record(f, all_rows[p])
+                _apply(state, record)
+            cur = pos
+            restored[pos] = _materialized(record, state)
+    return [restored[row[_POS]] for row in rows]
+
+
+def in_range(ts, start, end):
+    """タイムスタンプ文字列の日付部分が [start, end] に入るか。"""
+    day = ts[:10]
+    if start and day < str(start)[:10]:
+        return False
+    if end and day > str(end)[:10]:
+        return False
+    return True
+
+
+# =====================================================
+# 読み出しAPI
+# =====================================================
+
+def read_range(start=None, end=None, with_details=False, path=None):
+    """
+    日付範囲 [start, end]（両端含む, 'YYYY-MM-DD' or date）のエントリをタイムスタンプ順で返す。
+    範囲外の行は（差分復元に必要な直前のキーフレーム以降を除き）JSON パースしない。
+
+    Args:
+        start, end: 範囲指定（None は無制限）
+        with_details (bool): True の場合 details が空でないエントリのみ
+    """
+    path = path or HISTORY_PATH
+    all_rows = _get_index(path)
+    rows = [r for r in _effective_rows(all_rows) if in_range(r[_TS], start, end)]
+    entries = _load_rows(path, rows, all_rows)
+    if with_details:
+        entries = [e for e in entries if e.get('details')]
+    return entries
+
+
+def read_at(timestamp, with_details=False, path=None):
+    """
+    指定時刻（ISO文字列。'YYYY-MM-DD' なら当日0時）より前で最新のスナップショットを
+    復元して返す。無ければ None。
+
+    Args:
+        with_details (bool): details が空でないエントリのみ対象（空のエントリは遡って飛ばす）
+    """
+    path = path or HISTORY_PATH
+    rows = [r for r in _effective_rows(_get_index(path)) if r[_TS] < str(timestamp)]
+    found = _read_first_n(path, reversed(rows), 1, with_details)
+    return found[0] if found else None
+
+
+def _read_first_n(path, rows, n, with_details):
+    all_rows = _get_index(path)
+    result = []
+    for row in rows:
+        entry = _load_rows(path, [row], all_rows)[0]
+        if with_details and not entry.get('details'):
+            continue
+        result.append(entry)
+        if len(result) >= n:
+            break
+    return result
+
+
+def read_latest(n=1, with_details=False, path=None):
+    """
+    タイムスタンプが新しい順に n 件を読み、古い順に並べて返す。
+
+    Args:
+        with_details (bool): details が空でないエントリのみ対象
+    """
+    path = path or HISTORY_PATH
+    rows = _effective_rows(_get_index(path))
+    result = _read_first_n(path, reversed(rows), n, with_details)
+    result.reverse()
+    return result
+
+
+def read_earliest(n=1, with_details=False, path=None):
+    """タイムスタンプが古い順に n 件を返す。"""
+    path = path or HISTORY_PATH
+    return _read_first_n(path, _effective_rows(_get_index(path)), n, with_details)
+
+
+def read_initial(path=None):
+    """有効な type="initial" エントリ（最後に追記されたもの）を返す。無ければ None。"""
+    path = path or HISTORY_PATH
+    all_rows = _get_index(path)
+    rows = [r for r in all_rows if r[_TYPE] == 'initial']
+    if not rows:
+        return None
+    return _load_rows(path, rows[-1:], all_rows)[0]
+
+
+def iter_changes(path=None):
+    """
+    全スナップショットをファイル順に辿り、各行で変化した商品IDだけを返すジェネレータ。
+    details 全体を毎回走査せずに集計値を増分更新したい呼び出し元（バーンダウン等）向け。
+
+    Yields:
+        (header, changes, effective)
+            header: details を除いたエントリ（timestamp, type 等）と
+                    has_details（適用後の details が空でないか）
+            changes: {item_id: (old_value or None, new_value or None)}
+            effective: 読み出しAPIの対象となる行か（置き換え済みの initial・時刻なしは False）
+    """
+    path = path or HISTORY_PATH
+    all_rows = _get_index(path)
+    if not all_rows:
+        return
+    effective_pos = {r[_POS] for r in _effective_rows(all_rows)}
+    state = {}
+    with open(path, 'rb') as f:
+        for row in all_rows:
+            record = _read_record(f, row)
+            if record.get('encoding') == 'delta':
+                changes = {k: (state[k], None) for k in record.get('removed', []) if k in state}
+                changes.update({k: (state.get(k), v) for k, v in (record.get('delta') or {}).items()})
+            else:
+                details = record.get('details') or {}
+                changes = {k: (v, None) for k, v in state.items() if k not in details}
+                changes.update({k: (state.get(k), v) for k, v in details.items() if state.get(k) != v})
+            _apply(state, record)
+            header = {k: v for k, v in record.items() if k not in ('encoding', 'delta', 'removed', 'details')}
+            header['has_details'] = bool(state)
+            yield header, changes, row[_POS] in effective_pos
+
+
+def _number(value, key):
+    """details の count / target を数値で取り出す（欠損・数値以外は 0）。"""
+    if not value:
+        return 0
+    v = value.get(key, 0)
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return 0
+    return v
+
+
+class SnapshotMatrix:
+    """
+    details 付きスナップショット × 商品ID の count / target 密行列。
+    バーンダウン・バーンアップの集計を行列×ベクトルの積で行うためのもの。
+
+    Attributes:
+        timestamps (list): 行ごとのタイムスタンプ（タイムスタンプ順、同時刻はファイル順）
+        ids (list): 列ごとの商品ID
+        count, target (np.ndarray): shape (行数, 商品数)。その時点の details に無いIDは 0
+    """
+
+    def __init__(self, timestamps, ids, count, target):
+        self.timestamps = timestamps
+        self.ids = ids
+        self.count = count
+        self.target = target
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def vector(self, values, default=0):
+        """{商品ID: 値} を列の並びのベクトルにする（未登録のIDは default）。"""
+        return np.array([values.get(item_id, default) for item_id in self.ids])
+
+    def since(self, start):
+        """日付が start 以降の行だけの行列を返す（start が None ならそのまま）。"""
+        if not start:
+            return self
+        rows = [i for i, ts in enumerate(self.timestamps) if in_range(ts, start, None)]
+        return SnapshotMatrix([self.timestamps[i] for i in rows], self.ids,
+                              self.count[rows], self.target[rows])
+
+    @classmethod
+    def from_steps(cls, steps):
+        """
+        (timestamp, keep, [(item_id, new_value or None), ...]) の列（ファイル順）から構築する。
+        各ステップの変化を現在の行ベクトルに適用し、keep の行だけを残す。
+        """
+        ids, id_index = [], {}
+        changes = []
+        is_int = True
+        for ts, keep, step in steps:
+            cols = []
+            for item_id, new in step:
+                col = id_index.get(item_id)
+                if col is None:
+                    col = id_index[item_id] = len(ids)
+                    ids.append(item_id)
+                count, target = _number(new, 'count'), _number(new, 'target')
+                is_int = is_int and type(count) is int and type(target) is int
+                cols.append((col, count, target))
+            changes.append((ts, keep, cols))
+
+        dtype = np.int64 if is_int else np.float64
+        cur_count = np.zeros(len(ids), dtype=dtype)
+        cur_target = np.zeros(len(ids), dtype=dtype)
+        kept = []  # [(ts, file_pos, count_row, target_row)]
+        for pos, (ts, keep, cols) in enumerate(changes):
+            for col, count, target in cols:
+                cur_count[col] = count
+                cur_target[col] = target
+            if keep:
+                kept.append((ts, pos, cur_count.copy(), cur_target.copy()))
+        kept.sort(key=lambda k: (k[0], k[1]))
+
+        shape = (len(kept), len(ids))
+        count = np.array([k[2] for k in kept], dtype=dtype).reshape(shape)
+        target = np.array([k[3] for k in kept], dtype=dtype).reshape(shape)
+        return cls([k[0] for k in kept], ids, count, target)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """details を復元済みのエントリ列（parse_history_bytes の出力等）から構築する。"""
+        steps = []
+        state = {}
+        for entry in entries:
+            details = entry.get('details') or {}
+            step = [(k, None) for k in state if k not in details]
+            step.extend((k, v) for k, v in details.items() if state.get(k) != v)
+            state = dict(details)
+            ts = _entry_ts(entry)
+            steps.append((ts, bool(ts and details), step))
+        return cls.from_steps(steps)
+
+
+def read_matrix(start=None, path=None):
+    """
+    有効なスナップショットのうち details が空でないものを SnapshotMatrix で返す。
+    行列はファイルが変わるまで（再実行をまたいで）キャッシュする。
+
+    Args:
+        start: 'YYYY-MM-DD'（この日付以降の行だけを返す。None は全件）
+    """
+    path = path or HISTORY_PATH
+    _ensure_migrated(path)
+    if not os.path.exists(path):
+        return SnapshotMatrix.from_steps([])
+    st = os.stat(path)
+    with _lock:
+        cached = _matrix_cache.get(path)
+        if cached and cached['ino'] == st.st_ino and cached['size'] == st.st_size:
+            return cached['matrix'].since(start)
+
+        steps = []
+        for header, changes, effective in iter_changes(path):
+            ts = header.get('timestamp') or header.get('date') or ''
+            step = [(item_id, new) for item_id, (_old, new) in changes.items()]
+            steps.append((ts, bool(effective and header['has_details'] and ts), step))
+        matrix = SnapshotMatrix.from_steps(steps)
+        _matrix_cache[path] = {'ino': st.st_ino, 'size': st.st_size, 'matrix': matrix}
+    return matrix.since(start)
+
+
+# =====================================================
+# 書き込みAPI
+# =====================================================
+
+def export_json_array(export_path=None, path=None):
+    """
+    ストアの全エントリ（details 復元済み）を旧形式の JSON配列として書き出す（一時ファイル経由で差し替え）。
+
+    Returns:
+        str: 書き出したファイルのパス
+    """
+    export_path = export_path or EXPORT_PATH
+    entries = read_range(path=path)
+    tmp_path = f"{export_path}.tmp"
+    os.makedirs(os.path.dirname(export_path), exist_ok=True)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, export_path)
+    return export_path
+
+
+def append_snapshot(entry, path=None):
+    """
+    スナップショットを1行追記する。直前のエントリと details が同一の場合は追記しない。
+    直前の状態からの変化が小さければ差分行として書き込む。
+
+    Returns:
+        bool: 追記した場合 True（重複スキップ時は False）
+    """
+    path = path or HISTORY_PATH
+    with _lock:
+        all_rows = _get_index(path)
+        last = _load_rows(path, all_rows[-1:], all_rows)[0] if all_rows else None
+        if (last is not None and entry.get('type') != 'initial'
+                and entry.get('details') and last.get('details') == entry.get('details')):
+            print(f"[history_store] details が直前と同一のためスキップ ({_entry_ts(entry)})")
+            return False
+
+        # キーフレーム以降に続いている差分行の数
+        deltas = all_rows[-1][_POS] - all_rows[-1][_KF_POS] if all_rows else 0
+        record, _ = _encode(entry, last.get('details') if last else None, deltas)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(_dumps(record))
+    return True
@@ -1,24 +1,99 @@
 
+import numpy as np
 import pandas as pd
 import re
 import io
+from functools import lru_cache
 # drive_utils imports will be handled within function to avoid circular imports or context issues if necessary,
 # but usually it's better to pass the service or use the module. 
 # Here we will import drive_utils inside the function or at top level if safe.
 from logic import drive_utils
+from logic import perf
 import streamlit as st
 
+# 比較専用キーの正規化テーブル（全角英数→半角小文字）。呼び出しごとに作り直さない
+_NORMALIZE_TABLE = str.maketrans(
+    '０１２３４５６７８９ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ',
+    '0123456789abcdefghijklmnopqrstuvwxyz'
+)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Python 実装の文字列型: .str の正規表現・lower を str / re と同じ挙動にするため
+# （pyarrow 実装だと \s が全角空白に一致しない等、結果が変わる）
+# na_value 引数は pandas 2.3 以降（requirements.txt で pandas>=2.3 を指定）
+_PY_STRING_DTYPE = pd.StringDtype('python', na_value=np.nan)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_str(text):
+    return _WHITESPACE_RE.sub('', text).lower().translate(_NORMALIZE_TABLE)
+
+
 def normalize_text(text):
     if pd.isna(text): return ""
     # 全角半角・空白・大文字小文字を統一して「比較専用のキー」を作る
-    return re.sub(r'\s+', '', str(text)).lower().translate(str.maketrans(
-        '０１２３４５６７８９ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ',
-        '0123456789abcdefghijklmnopqrstuvwxyz'
-    ))
+    return _normalize_str(str(text))
+
+
+def normalize_series(series):
+    """
+    Series 版の normalize_text（series.apply(normalize_text) と同じ結果）。
+    重複の多い列（ログの商品名等）はユニーク値だけを .str で一括正規化して展開する。
+    """
+    if series.empty:
+        return pd.Series('', index=series.index, dtype=str)
+    codes, uniques = pd.factorize(series.astype(_PY_STRING_DTYPE), use_na_sentinel=True)
+    normalized = (
+        pd.Series(uniques, dtype=_PY_STRING_DTYPE)
+        .str.replace(_WHITESPACE_RE, '', regex=True)
+        .str.lower()
+        .str.translate(_NORMALIZE_TABLE)
+        .to_numpy(dtype=object)
+    )
+    # 欠損値 (code = -1) は空文字
+    result = np.append(normalized, '')[codes]
+    return pd.Series(result, index=series.index, dtype=str)
+
+
+INVENTORY_COLUMNS = ['商品名', 'セット価格', '本体', '鞘', 'status_text', 'join_key', 'has_sheath', '確定数', '販売数']
+
+
+def _to_int(value):
+    """int(float(value))。変換できない値は 0。"""
+    try:
+        return int(float(value))
+    except Exception:
+        return 0
+
+
+def _to_int_series(series):
+    """列を _to_int 相当で一括変換する（数値列はベクトル演算、それ以外は値ごと）。"""
+    if pd.api.types.is_numeric_dtype(series):
+        values = pd.to_numeric(series, errors='coerce').astype(float)
+        values = values.where(np.isfinite(values), 0)
+        return values.fillna(0).astype('int64')
+    return series.map(_to_int).astype('int64')
+
+
+def _group_price(master_df, price_col):
+    """join_key ごとの価格（最大値を int 化、失敗時 0）。"""
+    grouped = master_df.groupby('join_key', sort=True)[price_col]
+    if pd.api.types.is_numeric_dtype(master_df[price_col]):
+        return _to_int_series(grouped.max())
+    # 文字列混在の列は従来どおりグループ単位で max を取る（型エラー時は 0）
+    def _safe_max(values):
+        try:
+            return _to_int(values.max())
+        except Exception:
+            return 0
+    return grouped.agg(_safe_max).astype('int64')
+
 
+@perf.timed('calculate_inventory')
 def calculate_inventory(master_df, log_df, confirmed_df=None):
     # === 【最終運用仕様】販売ログ減算・部位表示制御 ===
-    
+    # 各キー列は1度だけ normalize_series で正規化し、集計は groupby / reindex で一括に行う
+
     # 1. カラム特定 (柔軟検索)
     def find_col(df, keywords):
         for col in df.columns:
@@ -35,108 +110,108 @@ def calculate_inventory(master_df, log_df, confirmed_df=None):
         return pd.DataFrame(columns=['商品名', 'セット価格', '本体', '鞘', 'status_text', 'has_sheath'])
 
     # 2. 販売ログの集計 (Sales Count)
-    sales_map = {}
+    sales_counts = pd.Series(dtype='int64')
     if log_df is not None and not log_df.empty:
         # 製品名と工程のカラムを探す
         l_name_col = find_col(log_df, ['project', 'Project', '商品名', 'Job'])
         l_proc_col = find_col(log_df, ['path', 'Path', '工程', 'Process', 'Status']) # 工程情報
-        
+
         if l_name_col and l_proc_col:
             # 正規化キー作成
-            log_df['join_key'] = log_df[l_name_col].fillna("").astype(str).apply(normalize_text)
-            
+            log_df['join_key'] = normalize_series(log_df[l_name_col])
+
             # 販売行を抽出 (キーワード: 販売, 売上, 売れた)
-            def is_sales(val):
-                s = str(val)
-                return any(k in s for k in ['販売', '売上', '売れた'])
-                
-            sales_logs = log_df[log_df[l_proc_col].apply(is_sales)]
-            
+            is_sales = log_df[l_proc_col].map(str).str.contains('販売|売上|売れた', regex=True)
+
             # 商品ごとの販売数をカウント
-            sales_map = sales_logs['join_key'].value_counts().to_dict()
+            sales_counts = log_df.loc[is_sales, 'join_key'].value_counts()
 
     # 3. マスタデータのグルーピング設定
-    master_df['join_key'] = master_df[name_col].astype(str).apply(normalize_text)
-    
+    master_df['join_key'] = normalize_series(master_df[name_col])
+
     # 除外フィルタ: 空行, "合計"
     df_clean = master_df[
-        (master_df['join_key'] != "") & 
+        (master_df['join_key'] != "") &
         (master_df[name_col] != "合計")
     ].copy()
-    
-    result_rows = []
-    
-    for key, group in df_clean.groupby('join_key'):
-        first_row = group.iloc[0]
-        product_name = first_row[name_col]
-        
-        # 価格
-        try: price = int(float(group[price_col].max())) if price_col else 0
-        except: price = 0
-            
-        # マスタ在庫集計 & 鞘フラグ判定
-        body_stock_master = 0
-        sheath_stock_master = 0
-        has_sheath = False
-        
-        for _, row in group.iterrows():
-            try: qty = int(float(row.get(stock_col, 0)))
-            except: qty = 0
-            
-            part_val = str(row.get(part_col, ""))
-            # 鞘判定
-            if "鞘" in part_val or "saya" in part_val.lower() or "sheath" in part_val.lower():
-                sheath_stock_master += qty
-                has_sheath = True
-            else:
-                body_stock_master += qty
-        
-        # 販売分を減算 (Sales count)
-        sales_count = sales_map.get(key, 0)
-        
-        # --- CONFIRMED (導出方式): 確定記録から生産数を加算 ---
-        confirmed_produced = 0
-        confirmed_cancelled = 0
-        if confirmed_df is not None and not confirmed_df.empty:
-            proj_col = 'PROJECT' if 'PROJECT' in confirmed_df.columns else None
-            act_col = 'ACTION' if 'ACTION' in confirmed_df.columns else None
-            if proj_col and act_col:
-                # 正規化して比較
-                matched = confirmed_df[
-                    confirmed_df[proj_col].fillna('').apply(normalize_text) == key
-                ]
-                confirmed_produced = len(matched[matched[act_col] == 'PRODUCED'])
-                confirmed_cancelled = len(matched[matched[act_col] == 'CANCEL'])
-        
-        net_confirmed = confirmed_produced - confirmed_cancelled
-        
-        # 在庫 = マスタ初期値(H列) + 確定生産数 - 販売数
-        remaining_body = max(0, body_stock_master + net_confirmed - sales_count)
-        if has_sheath:
-            remaining_sheath = max(0, sheath_stock_master + net_confirmed - sales_count)
-        else:
-            remaining_sheath = 0
-            
-        # ステータス判定
-        status = "在庫なし"
-        if remaining_body >= 1:
-            status = "在庫あり"
-        
-        result_rows.append({
-            '商品名': product_name,
-            'セット価格': price,
-            '本体': remaining_body,
-            '鞘': remaining_sheath,
-            'status_text': status,
-            'join_key': key,
-            'has_sheath': has_sheath,
-            '確定数': net_confirmed,
-            '販売数': sales_count
-        })
-        
-    result_df = pd.DataFrame(result_rows)
-    if result_df.empty:
-        result_df = pd.DataFrame(columns=['商品名', 'セット価格', '本体', '鞘', 'status_text', 'has_sheath', '確定数', '販売数'])
+
+    if df_clean.empty:
+        return pd.DataFrame(columns=['商品名', 'セット価格', '本体', '鞘', 'status_text', 'has_sheath', '確定数', '販売数'])
+
+    # 商品名はグループ先頭行の値
+    first_rows = df_clean.drop_duplicates('join_key').set_index('join_key')
+    keys = first_rows.index.sort_values()
+    product_names = first_rows[name_col].reindex(keys)
+
+    # 価格
+    if price_col:
+        prices = _group_price(df_clean, price_col).reindex(keys)
+    else:
+        prices = pd.Series(0, index=keys, dtype='int64')
+
+    # マスタ在庫集計 & 鞘フラグ判定（部位ごとに pivot）
+    if stock_col:
+        df_clean['_qty'] = _to_int_series(df_clean[stock_col])
+    else:
+        df_clean['_qty'] = 0
+    if part_col:
+        part_vals = df_clean[part_col].map(str)
+        lowered = part_vals.str.lower()
+        df_clean['_is_sheath'] = (
+            part_vals.str.contains('鞘', regex=False)
+            | lowered.str.contains('saya', regex=False)
+            | lowered.str.contains('sheath', regex=False)
+        )
+    else:
+        df_clean['_is_sheath'] = False
+    stock_pivot = (
+        df_clean.pivot_table(index='join_key', columns='_is_sheath', values='_qty',
+                             aggfunc='sum', fill_value=0)
+        .reindex(index=keys, columns=[False, True], fill_value=0)
+    )
+    body_stock_master = stock_pivot[False].astype('int64')
+    sheath_stock_master = stock_pivot[True].astype('int64')
+    has_sheath = df_clean.groupby('join_key')['_is_sheath'].any().reindex(keys).astype(bool)
+
+    # 販売分を減算 (Sales count)
+    sales_count = sales_counts.reindex(keys, fill_value=0).astype('int64')
+
+    # --- CONFIRMED (導出方式): 確定記録から生産数を加算 ---
+    net_confirmed = pd.Series(0, index=keys, dtype='int64')
+    if confirmed_df is not None and not confirmed_df.empty:
+        proj_col = 'PROJECT' if 'PROJECT' in confirmed_df.columns else None
+        act_col = 'ACTION' if 'ACTION' in confirmed_df.columns else None
+        if proj_col and act_col:
+            # 正規化キー × ACTION の件数表
+            action_counts = (
+                pd.DataFrame({
+                    'join_key': normalize_series(confirmed_df[proj_col]),
+                    'action': confirmed_df[act_col],
+                })
+                .groupby(['join_key', 'action'], dropna=True).size()
+                .unstack(fill_value=0)
+                .reindex(index=keys, columns=['PRODUCED', 'CANCEL'], fill_value=0)
+            )
+            net_confirmed = (action_counts['PRODUCED'] - action_counts['CANCEL']).astype('int64')
+
+    # 在庫 = マスタ初期値(H列) + 確定生産数 - 販売数
+    remaining_body = (body_stock_master + net_confirmed - sales_count).clip(lower=0)
+    remaining_sheath = (sheath_stock_master + net_confirmed - sales_count).clip(lower=0).where(has_sheath, 0)
+
+    # ステータス判定
+    status = pd.Series(np.where(remaining_body >= 1, "在庫あり", "在庫なし"), index=keys)
+
+    result_df = pd.DataFrame({
+        '商品名': product_names,
+        'セット価格': prices,
+        '本体': remaining_body,
+        '鞘': remaining_sheath,
+        'status_text': status,
+        'join_key': keys,
+        'has_sheath': has_sheath,
+        '確定数': net_confirmed,
+        '販売数': sales_count,
+    }, columns=INVENTORY_COLUMNS).reset_index(drop=True)
 
     return result_df
 
@@ -0,0 +1,172 @@
+"""
+kpi_engine.py - BIダッシュボードの全KPIを1回でまとめて算出する
+
+BIダッシュボードは calc_countdown / calc_sales_gap / ... / calc_burndown_hours を
+個別に呼んでいたため、event_master.json を何度も読み直し、クラウド環境では
+履歴ストアを KPI ごとに Drive からダウンロードし直していた。
+
+本モジュールは
+  1. マスタの版・カレンダースナップショットの版・ローカルファイルの更新時刻からなる
+     安価なバージョンキーでまずメモを引き（ハッシュ計算も Drive へのアクセスもしない）
+  2. 外れた場合はマスタ・イベントマスタ・履歴ストア・カレンダーのスナップショットを1度だけ取得し、
+     その入力ハッシュ（＋日付・時刻帯）でメモを引き
+  3. 未計算の場合のみ bi_dashboard の各KPIを同じスナップショットで順に算出する
+（マスタの列展開と工程時間は bi_dashboard / process_times 側で1回だけ行われる）。
+
+※ app.py は importlib.reload しないモジュールなので、結果のキャッシュは
+   Streamlit の再実行をまたいで保持される。bi_dashboard はリロードされても
+   同じモジュールオブジェクトが更新されるため、常に最新の関数が呼ばれる。
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from logic import bi_dashboard, history_store
+from logic.workbook import content_hash
+
+# 保持する結果数（入力が変わった直後に前の結果へ戻るケース程度で十分）
+MAX_CACHED_RESULTS = 4
+
+_cache_lock = threading.Lock()
+_results = OrderedDict()  # {input_hash: dict}
+_by_version = OrderedDict()  # {バージョンキー: dict}
+
+
+def _json_digest(value):
+    """JSON化できる入力のハッシュ（dict のキー順に依存しない）。"""
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _history_signature(history_source):
+    """履歴ストアの状態を表す値（ローカルはファイルのサイズと更新時刻、ダウンロード分は内容のハッシュ）。"""
+    ok, raw = history_source
+    if ok:
+        try:
+            st = os.stat(history_store.HISTORY_PATH)
+            return ('file', st.st_size, st.st_mtime_ns)
+        except OSError:
+            return ('file', None, None)
+    if raw:
+        return ('raw', hashlib.sha256(raw).hexdigest())
+    return ('none',)
+
+
+def _file_signature(path):
+    """ファイルのサイズと更新時刻（無ければ None）。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _version_key(master_version, calendar_version, now):
+    """
+    入力の中身を読まずに作るキー。マスタの版が分からない場合は None（入力ハッシュだけで引く）。
+    クラウドの履歴ストアは Drive を見ないと変化が分からないが、Drive 側の履歴は
+    マスタ更新時に追記されるため、マスタの版と時刻帯の変化で取り直される。
+    """
+    if not master_version:
+        return None
+    return (
+        master_version,
+        calendar_version,
+        _file_signature(os.path.join(bi_dashboard.DATA_DIR, 'event_master.json')),
+        _file_signature(history_store.HISTORY_PATH),
+        now.strftime('%Y-%m-%d %H'),
+    )
+
+
+def _remember(cache, key, result):
+    cache[key] = result
+    cache.move_to_end(key)
+    while len(cache) > MAX_CACHED_RESULTS:
+        cache.popitem(last=False)
+
+
+def _input_hash(master_data, event_master, history_source, calendar_data, excel_bytes, now):
+    parts = [
+        _json_digest(master_data or []),
+        _json_digest(event_master or []),
+        repr(_history_signature(history_source)),
+        _json_digest(calendar_data or {}),
+        content_hash(excel_bytes) if excel_bytes else '',
+        # 残日数は日付、夜間モードは時刻帯で変わる
+        now.strftime('%Y-%m-%d %H'),
+    ]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def compute_kpis(master_data, excel_bytes=None, calendar_data=None, now=None,
+                 master_version=None, calendar_version=None):
+    """
+    BIダッシュボードの全KPIを算出する（入力が前回と同じならキャッシュを返す）。
+
+    Args:
+        master_data (list): 商品マスタ
+        excel_bytes (bytes): メニュー.xlsx のバイナリ（バーンアップの起点日算出用）
+        calendar_data (dict): calendar_agent の統合データ（バーンダウンの理想線用）
+        now (datetime): 現在時刻（テスト用、省略時は datetime.now()）
+        master_version (str): master_data / excel_bytes の版（refresh_master() の戻り値）
+        calendar_version: calendar_data の版（calendar_scheduler.snapshot_version()）
+
+    Returns:
+        dict: {
+            "countdown", "sales_gap", "remaining_hours", "today_tasks",
+            "material_alerts", "dev_slot", "burnup", "burndown",
+        } 各値は bi_dashboard の同名関数の戻り値と同じ。
+        呼び出し側で変更しないこと（キャッシュと共有される）。
+    """
+    now = now or datetime.now()
+
+    # --- 1. バージョンキーで引く（再実行のほとんどはここで返る） ---
+    version_key = _version_key(master_version, calendar_version, now)
+    if version_key is not None:
+        with _cache_lock:
+            cached = _by_version.get(version_key)
+            if cached is not None:
+                _by_version.move_to_end(version_key)
+                return cached
+
+    # --- 2. スナップショット（ディスク / Drive へのアクセスはここだけ） ---
+    event_master = bi_dashboard._load_event_master()
+    history_source = bi_dashboard._ensure_history_store()
+
+    key = _input_hash(master_data, event_master, history_source, calendar_data, excel_bytes, now)
+    with _cache_lock:
+        cached = _results.get(key)
+        if cached is not None:
+            _results.move_to_end(key)
+            if version_key is not None:
+                _remember(_by_version, version_key, cached)
+            return cached
+
+    # --- 3. 同じスナップショットで全KPIを算出 ---
+    countdown = bi_dashboard.calc_countdown(now=now, event_master=event_master)
+    days_remaining = countdown['days_remaining'] if countdown else 30
+    result = {
+        "countdown": countdown,
+        "sales_gap": bi_dashboard.calc_sales_gap(master_data),
+        "remaining_hours": bi_dashboard.calc_remaining_hours(master_data),
+        "today_tasks": bi_dashboard.calc_today_tasks(master_data, current_hour=now.hour),
+        "material_alerts": bi_dashboard.calc_material_alerts(master_data, days_remaining=days_remaining),
+        "dev_slot": bi_dashboard.calc_dev_slot(master_data, event_master=event_master, now=now),
+        "burnup": bi_dashboard.calc_burnup_data(
+            master_data, event_master=event_master, excel_bytes=excel_bytes,
+            history_source=history_source),
+        "burndown": bi_dashboard.calc_burndown_hours(
+            master_data, event_master=event_master, calendar_data=calendar_data,
+            history_source=history_source),
+    }
+    print(f"[kpi_engine] KPIを算出 ({key[:12]})")
+
+    with _cache_lock:
+        _remember(_results, key, result)
+        if version_key is not None:
+            _remember(_by_version, version_key, result)
+    return result
@@ -2,7 +2,9 @@
 master_loader.py - マスタデータ CSV to JSON 自動変換モジュール
 
 CSVファイル（メニュー.xlsx - 商品マスタ.csv）を読み込み、
-構造化されたJSONファイル（production_master.json）を生成する。
+構造化されたマスタを列指向ストア（production_master.arrow, master_store）に保存する。
+JSONファイル（production_master.json）は外部ツール・互換用のエクスポートとして、
+環境変数 ATLAS_EXPORT_MASTER_JSON=1 の場合（または列指向ストアが使えない環境）に出力する。
 """
 
 import pandas as pd
@@ -10,6 +12,12 @@ import json
 import os
 import glob
 import logging
+from datetime import datetime
+
+from logic.workbook import get_workbook, column_index, content_hash
+from logic import history_store
+from logic import master_store
+from logic import perf
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +26,11 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 CSV_PATH = os.path.join(DATA_DIR, 'メニュー.xlsx - 商品マスタ.csv')
 JSON_PATH = os.path.join(DATA_DIR, 'production_master.json')
-HISTORY_PATH = os.path.join(DATA_DIR, 'history_summary.json')
+# JSON エクスポートを出力するか（既定は出力しない。ATLAS_EXPORT_MASTER_JSON=1 で出力。
+# 列指向ストアが使えない環境では常に出力）
+EXPORT_JSON = os.environ.get('ATLAS_EXPORT_MASTER_JSON', '').lower() in ('1', 'true', 'yes')
+# マスタ更新ステージのメモ（最後に反映したワークブックのコンテンツハッシュ）
+REFRESH_STAMP_PATH = os.path.join(DATA_DIR, 'master_refresh_stamp.json')
 
 
 def get_val(row, col, default=0):
@@ -61,6 +73,7 @@ def find_latest_csv(directory):
     return latest
 
 
+@perf.timed('convert_dataframe_to_json')
 def convert_dataframe_to_json(df, force=False, excel_bytes=None):
     """
     DataFrameを受け取り、構造化されたJSONファイルを生成する。
@@ -130,12 +143,11 @@ def convert_dataframe_to_json(df, force=False, excel_bytes=None):
         master_list = merge_event_targets(master_list, excel_bytes)
         
     # --- 安全装置: データ量チェック ---
-    # 既存のJSONがあり、かつ新しいデータが極端に少ない（例: 10件未満）場合は
+    # 既存のマスタがあり、かつ新しいデータが極端に少ない（例: 10件未満）場合は
     # 誤って上書きしないようにする（テストデータ等による事故防止）
-    if os.path.exists(JSON_PATH) and len(master_list) < 10:
+    if _master_exists() and len(master_list) < 10:
         try:
-            with open(JSON_PATH, 'r', encoding='utf-8') as f:
-                old_data = json.load(f)
+            old_data = load_master_json()
             if len(old_data) > 20:
                 logger.warning(f"⚠️ Data Safety Guard: New data has {len(master_list)} items, but old data had {len(old_data)}. Skipping overwrite.")
                 print(f"⚠️ Data Safety Guard: Skipping overwrite to protect data. (New: {len(master_list)}, Old: {len(old_data)})")
@@ -143,13 +155,11 @@ def convert_dataframe_to_json(df, force=False, excel_bytes=None):
         except Exception:
             pass # 読み込み失敗時は無視して上書き
 
-    # --- JSON書き出し ---
+    # --- マスタ書き出し ---
     # merge_event_targets でも保存しているかもしれないが、
     # convert関数の責務としてここでも保存する (最終的な整合性のため)
     try:
-        os.makedirs(os.path.dirname(JSON_PATH), exist_ok=True)
-        with open(JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(master_list, f, indent=2, ensure_ascii=False)
+        _save_master(master_list)
         msg = f"SUCCESS: production_master.json has been created at {JSON_PATH} ({len(master_list)} items)"
         logger.info(msg)
         print(msg) # コンソールにも強制出力
@@ -164,17 +174,76 @@ def convert_dataframe_to_json(df, force=False, excel_bytes=None):
 # --- Drive連携用インポート ---
 try:
     from logic import drive_utils
-    from logic.drive_utils import upload_to_drive, HISTORY_SUMMARY_DRIVE_ID, EVENT_MASTER_DRIVE_ID
+    from logic.drive_utils import upload_to_drive, write_atomic, HISTORY_SUMMARY_DRIVE_ID, EVENT_MASTER_DRIVE_ID
 except ImportError:
     try:
         import drive_utils
-        from drive_utils import upload_to_drive, HISTORY_SUMMARY_DRIVE_ID, EVENT_MASTER_DRIVE_ID
+        from drive_utils import upload_to_drive, write_atomic, HISTORY_SUMMARY_DRIVE_ID, EVENT_MASTER_DRIVE_ID
     except ImportError:
         drive_utils = None
         upload_to_drive = None
         HISTORY_SUMMARY_DRIVE_ID = None
         EVENT_MASTER_DRIVE_ID = None
 
+        def write_atomic(path, data):
+            # Drive 連携なし（アップロードしない）ため、そのまま書き込む
+            with open(path, 'wb') as f:
+                f.write(data)
+
+
+def _load_refresh_stamp():
+    if not os.path.exists(REFRESH_STAMP_PATH):
+        return {}
+    try:
+        with open(REFRESH_STAMP_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def refresh_master(df, excel_bytes, force=False):
+    """
+    マスタ更新ステージ (convert_dataframe_to_json + merge_event_targets) を
+    ワークブックのコンテンツハッシュでメモ化して実行する。
+
+    前回反映したハッシュと同じ場合は production_master.json を読み込むだけで、
+    JSON / event_master.json / history への書き込みとDriveアップロードは一切行わない。
+    Streamlit は操作のたびにスクリプト全体を再実行するため、その度に
+    マスタを書き直さないようにするための入口。
+
+    Args:
+        df (pd.DataFrame): 商品マスタのDataFrame
+        excel_bytes (bytes): メニュー.xlsx のバイナリデータ
+        force (bool): True の場合はハッシュが同じでも再変換する（手動更新ボタン用）
+
+    Returns:
+        tuple: (master_list, version, refreshed)
+            version は excel_bytes のコンテンツハッシュ（excel_bytes が無い場合は None）
+    """
+    version = content_hash(excel_bytes) if excel_bytes else None
+
+    if not force and version and _master_exists():
+        if _load_refresh_stamp().get('version') == version:
+            master_list = load_master_json()
+            if master_list:
+                print(f"[refresh_master] ワークブック未変更 ({version[:12]}) → 再変換をスキップ")
+                return master_list, version, False
+
+    master_list = convert_dataframe_to_json(df, force=True, excel_bytes=excel_bytes)
+
+    if version and master_list:
+        try:
+            with open(REFRESH_STAMP_PATH, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": version,
+                    "items": len(master_list),
+                    "refreshed_at": datetime.now().isoformat(),
+                }, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"マスタ更新スタンプの保存失敗: {e}")
+
+    return master_list, version, True
+
 
 def sync_from_drive():
     """
@@ -204,8 +273,8 @@ def sync_from_drive():
         
         print(f"File: {file_name} (ID: {file_id})")
         
-        # ダウンロード
-        stream = drive_utils.download_content(service, file_id, mime_type)
+        # ダウンロード（リビジョン未変更ならディスクキャッシュを使用）
+        stream = drive_utils.download_content_cached(service, file_id, mime_type)
         if not stream:
             logger.error("ダウンロード失敗")
             return []
@@ -213,15 +282,15 @@ def sync_from_drive():
         # Excelとして読み込み
         try:
             excel_bytes = stream.getvalue()
-            df = pd.read_excel(stream, sheet_name="商品マスタ")
+            df = get_workbook(excel_bytes).sheet("商品マスタ")
             print(f"Excel Loaded: {len(df)} rows")
         except Exception as e:
             logger.error(f"Excel読み込みエラー: {e}")
             return []
 
         # JSON変換 & 保存 (イベント合算含む)
-        # convert_dataframe_to_json は内部で production_master.json を保存する
-        master_list = convert_dataframe_to_json(df, force=True, excel_bytes=excel_bytes)
+        # ワークブック未変更なら保存済みJSONを返すだけ（書き込み・アップロードなし）
+        master_list, _, _ = refresh_master(df, excel_bytes)
         
         print("--- Google Drive Sync Completed ---")
         return master_list
@@ -276,13 +345,52 @@ def convert_csv_to_json(force=False):
     return convert_dataframe_to_json(df, force=True)
 
 
+def _store_path():
+    """列指向ストアのパス（JSON_PATH と同じ場所・同じ名前で拡張子 .arrow）。"""
+    return os.path.splitext(JSON_PATH)[0] + '.arrow'
+
+
+def _master_exists():
+    return os.path.exists(JSON_PATH) or os.path.exists(_store_path())
+
+
+def _save_master(master_list):
+    """
+    マスタを列指向ストアに保存し、JSON エクスポートも出力する。
+    JSON を先に書くことで、ストアの方が新しい状態（master_store.is_fresh）になる。
+    """
+    os.makedirs(os.path.dirname(JSON_PATH), exist_ok=True)
+    if EXPORT_JSON or not master_store.available():
+        with open(JSON_PATH, 'w', encoding='utf-8') as f:
+            json.dump(master_list, f, ensure_ascii=False)
+    master_store.save(master_list, _store_path())
+
+
+def load_master_columns(columns):
+    """
+    マスタから指定列だけを DataFrame で返す（列名は master_store.FIELDS のドット区切り名。
+    例: ['id', 'price', 'target_quantity', 'process.nc.front_rough_min']）。
+    列指向ストアが無い・古い場合は JSON から同じ形に変換する。
+    """
+    if master_store.is_fresh(_store_path(), JSON_PATH):
+        df = master_store.read_columns(columns, _store_path())
+        if df is not None:
+            return df
+    return master_store.records_to_frame(load_master_json(), columns)
+
+
 def load_master_json():
     """
-    既存のJSONファイルを読み込んで返す。
+    保存済みのマスタを読み込んで返す。
+    列指向ストアが最新ならそこから復元し、無ければ JSON ファイルを読む。
 
     Returns:
         list: マスタデータのリスト。ファイル不在・エラー時は空リスト。
     """
+    if master_store.is_fresh(_store_path(), JSON_PATH):
+        records = master_store.load_records(_store_path())
+        if records is not None:
+            return records
     if not os.path.exists(JSON_PATH):
         return []
     try:
@@ -292,12 +400,23 @@ def load_master_json():
         logger.error(f"JSON読み込み失敗: {e}")
         return []
 
-def ensure_local_history(history_path):
+def _upload_history(context):
+    """
+    履歴を Drive の history_summary.json に同期する。
+    Drive 上のファイルは外部スクリプトが JSON配列として読むため、JSON Lines ではなく旧形式で書き出して送る。
+    """
+    if not upload_to_drive or not HISTORY_SUMMARY_DRIVE_ID:
+        return
+    _ok, _msg = upload_to_drive(history_store.export_json_array(), HISTORY_SUMMARY_DRIVE_ID)
+    logger.info(f"[Drive同期] {context}: {_msg}")
+
+
+def ensure_local_history():
     """
-    ローカルにhistory_summary.jsonが無い場合、Google Driveからダウンロードを試みる。
+    ローカルに履歴ストアが無い場合、Google Driveからダウンロードを試みる。
     クラウド起動時などでローカルファイルが消えている状態で初期化（上書き破壊）されるのを防ぐ。
     """
-    if os.path.exists(history_path):
+    if history_store.exists():
         return
         
     try:
@@ -315,28 +434,23 @@ def ensure_local_history(history_path):
             logger.info("Drive上にも履歴ファイルが存在しません。新規作成になります。")
             return
             
-        data = json.loads(stream.read().decode('utf-8'))
-        
-        # 安全に保存
-        os.makedirs(os.path.dirname(history_path), exist_ok=True)
-        with open(history_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        logger.info("✅ Driveから既存の history_summary.json を復元しました。")
+        # 旧形式(JSON配列)・新形式(JSON Lines)のどちらでも復元できる
+        count = history_store.restore_from_bytes(stream.read())
+        logger.info(f"✅ Driveから既存の履歴を復元しました ({count}件)。")
         print("✅ Restored existing history_summary.json from Drive.")
     except Exception as e:
         logger.error(f"既存履歴の復元に失敗しました: {e}")
 
 
-def _import_initial_from_note(xls, note_text, history_path):
+def _import_initial_from_note(xls, note_text):
     """
     備考テキスト（例: "クリマ2512 AK列"）をパースし、
     指定されたシートの指定列から初期在庫データを読み取り、
-    history_summary.json に type="initial" として記録する。
+    履歴ストアに type="initial" として記録する。
     
     Args:
-        xls: pd.ExcelFile オブジェクト
+        xls: logic.workbook.ParsedWorkbook オブジェクト
         note_text (str): 備考テキスト（例: "クリマ2512 AK列"）
-        history_path (str): history_summary.json のパス
     """
     import re
     
@@ -344,7 +458,7 @@ def _import_initial_from_note(xls, note_text, history_path):
         return
         
     # クラウドなどでローカルファイルがない場合に初期化されるのを防ぐため、Driveから復旧
-    ensure_local_history(history_path)
+    ensure_local_history()
     
     # パース: "クリマ2512 AK列" -> sheet_name="クリマ2512", col_letter="AK"
     # パターン: シート名 + 列名(アルファベット) + "列"
@@ -357,10 +471,7 @@ def _import_initial_from_note(xls, note_text, history_path):
     col_letter = match.group(2).strip().upper()
     
     # 列文字をインデックスに変換 (A=0, B=1, ..., AK=36, AL=37)
-    col_idx = 0
-    for ch in col_letter:
-        col_idx = col_idx * 26 + (ord(ch) - ord('A') + 1)
-    col_idx -= 1  # 0-indexed
+    col_idx = column_index(col_letter)
     
     logger.info(f"備考から初期在庫参照先を特定: シート='{target_sheet}', 列={col_letter}(idx={col_idx})")
     
@@ -369,19 +480,16 @@ def _import_initial_from_note(xls, note_text, history_path):
         return
     
     # 既に initial エントリが正しく存在するか確認
-    if os.path.exists(history_path):
-        try:
-            with open(history_path, 'r', encoding='utf-8') as f:
-                hist = json.load(f)
-            for h in hist:
-                if h.get('type') == 'initial' and h.get('details') and len(h.get('details', {})) > 2:
-                    logger.info("初期在庫は既に正しく登録済み。スキップします。")
-                    return
-        except Exception:
-            pass
+    try:
+        initial = history_store.read_initial()
+        if initial and initial.get('details') and len(initial.get('details', {})) > 2:
+            logger.info("初期在庫は既に正しく登録済み。スキップします。")
+            return
+    except Exception:
+        pass
     
     try:
-        df_raw = pd.read_excel(xls, sheet_name=target_sheet, header=None)
+        df_raw = xls.sheet(target_sheet, header=None)
         
         # ID列を探す (通常 C列=idx 2)
         header_row_idx = -1
@@ -431,8 +539,7 @@ def _import_initial_from_note(xls, note_text, history_path):
             logger.warning(f"初期在庫データが空です（シート '{target_sheet}' {col_letter}列）。")
             return
         
-        # history_summary.json に initial エントリを更新/追加
-        from datetime import datetime
+        # 履歴ストアに initial エントリを追記（最後の initial が有効になる）
         new_entry = {
             "type": "initial",
             "date": "2025-12-14",
@@ -443,25 +550,10 @@ def _import_initial_from_note(xls, note_text, history_path):
             "source_note": note_text
         }
         
-        history_list = []
-        if os.path.exists(history_path):
-            try:
-                with open(history_path, 'r', encoding='utf-8') as f:
-                    history_list = json.load(f)
-            except Exception:
-                history_list = []
-        
-        # 既存の initial を削除して入れ替え
-        history_list = [h for h in history_list if h.get('type') != 'initial']
-        history_list.insert(0, new_entry)
-        
-        with open(history_path, 'w', encoding='utf-8') as f:
-            json.dump(history_list, f, indent=2, ensure_ascii=False)
+        history_store.append_snapshot(new_entry)
         
         # --- Phase 1: Drive同期 ---
-        if upload_to_drive and HISTORY_SUMMARY_DRIVE_ID:
-            _ok, _msg = upload_to_drive(history_path, HISTORY_SUMMARY_DRIVE_ID)
-            logger.info(f"[Drive同期] 初期在庫インポート後: {_msg}")
+        _upload_history("初期在庫インポート後")
         
         logger.info(f"初期在庫インポート完了（備考参照）: {len(initial_details)} 件, 総数 {total_count}")
         print(f"初期在庫インポート完了: {len(initial_details)} 件 (from {target_sheet} {col_letter}列)")
@@ -470,6 +562,7 @@ def _import_initial_from_note(xls, note_text, history_path):
         logger.error(f"初期在庫インポート中にエラー: {e}")
 
 
+@perf.timed('merge_event_targets')
 def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
     """
     【新ロジック】イベントマスタで「アクティブ/表示」となっている全イベントの目標を合算して統合する。
@@ -482,13 +575,12 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
     Returns:
         list: target_quantity(合算値) と event_data(詳細) が追加された master_list
     """
-    import io as _io
-    
     if not excel_bytes:
         return master_list
     
     try:
-        xls = pd.ExcelFile(_io.BytesIO(excel_bytes))
+        # パース結果はコンテンツハッシュ単位で共有 (load_data_from_drive と同一オブジェクト)
+        xls = get_workbook(excel_bytes)
     except Exception as e:
         logger.error(f"Excelバイナリ読み込み失敗: {e}")
         return master_list
@@ -499,7 +591,7 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
 
     if 'イベントマスタ' in xls.sheet_names:
         try:
-            master_sheet = pd.read_excel(xls, sheet_name='イベントマスタ')
+            master_sheet = xls.sheet('イベントマスタ')
             
             # カラム特定
             col_map = {
@@ -556,7 +648,7 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
                         # 備考列から初期在庫を自動インポート
                         note_val = _get_val('note')
                         if note_val:
-                            _import_initial_from_note(xls, note_val, HISTORY_PATH)
+                            _import_initial_from_note(xls, note_val)
                     
                     # Display判定 (監視・広報)
                     # NOTE: 表示フラグONならZeusの監視リストに入れる
@@ -614,8 +706,9 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
                     evt['is_applied'] = existing_applied.get(evt_name, False)
                 
                 try:
-                    with open(event_json_path, 'w', encoding='utf-8') as f:
-                        json.dump(display_events, f, indent=2, ensure_ascii=False)
+                    # アップロードはワーカーが後で読むため、書きかけを読まれないよう丸ごと差し替える
+                    write_atomic(event_json_path,
+                                 json.dumps(display_events, indent=2, ensure_ascii=False).encode('utf-8'))
                     logger.info(f"監視イベントリスト保存完了: {event_json_path}")
                     
                     # --- Drive同期 ---
@@ -642,7 +735,7 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
             continue
 
         try:
-            df_raw = pd.read_excel(xls, sheet_name=sheet, header=None)
+            df_raw = xls.sheet(sheet, header=None)
             
             # データ開始行を探す (ID という文字がある行)
             header_row_idx = -1
@@ -758,42 +851,23 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
 
     logger.info(f"全イベント合算完了: {merge_count} アイテムに目標を設定")
     
-    # --- 履歴の保存 ---
-    ensure_local_history(HISTORY_PATH)
+    # --- 履歴の保存 (追記専用ストア。直前と details が同一なら追記しない) ---
+    ensure_local_history()
     
-    if not os.path.exists(HISTORY_PATH):
-        history_data["type"] = "initial"
-        try:
-            with open(HISTORY_PATH, 'w', encoding='utf-8') as f:
-                json.dump([history_data], f, indent=2, ensure_ascii=False)
-            logger.info(f"履歴初期化: {HISTORY_PATH} を作成しました。")
-            # --- Phase 1: Drive同期 ---
-            if upload_to_drive and HISTORY_SUMMARY_DRIVE_ID:
-                _ok, _msg = upload_to_drive(HISTORY_PATH, HISTORY_SUMMARY_DRIVE_ID)
-                logger.info(f"[Drive同期] 履歴初期化後: {_msg}")
-        except Exception as e:
-            logger.error(f"履歴ファイル作成失敗: {e}")
-    else:
-        try:
-            with open(HISTORY_PATH, 'r', encoding='utf-8') as f:
-                hist_list = json.load(f)
-            
-            hist_list.append(history_data)
-            
-            with open(HISTORY_PATH, 'w', encoding='utf-8') as f:
-                json.dump(hist_list, f, indent=2, ensure_ascii=False)
-            # --- Phase 1: Drive同期 ---
-            if upload_to_drive and HISTORY_SUMMARY_DRIVE_ID:
-                _ok, _msg = upload_to_drive(HISTORY_PATH, HISTORY_SUMMARY_DRIVE_ID)
-                logger.info(f"[Drive同期] 履歴追記後: {_msg}")
-        except Exception as e:
-            logger.error(f"履歴追記失敗: {e}")
+    try:
+        if not history_store.exists():
+            history_data["type"] = "initial"
+            logger.info(f"履歴初期化: {history_store.HISTORY_PATH} を作成します。")
+        appended = history_store.append_snapshot(history_data)
+        # --- Phase 1: Drive同期 (追記があった場合のみ) ---
+        if appended:
+            _upload_history("履歴追記後")
+    except Exception as e:
+        logger.error(f"履歴追記失敗: {e}")
 
-    # --- JSON書き出し ---
+    # --- マスタ書き出し ---
     try:
-        os.makedirs(os.path.dirname(JSON_PATH), exist_ok=True)
-        with open(JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(master_list, f, indent=2, ensure_ascii=False)
+        _save_master(master_list)
         msg = f"SUCCESS: Merged production_master.json saved at {JSON_PATH} ({len(master_list)} items)"
         logger.info(msg)
         print(msg)
@@ -807,7 +881,7 @@ def merge_event_targets(master_list, excel_bytes, _unused_sheet_name=None):
 def import_initial_stock(excel_path=None, sheet_name='クリマ2512'):
     """
     指定されたExcelシートから初期在庫（IDベース）をインポートし、
-    history_summary.json に type="initial" として保存する。
+    履歴ストアに type="initial" として保存する。
 
     Args:
         excel_path (str): メニュー.xlsx のパス。Noneの場合はデフォルトパスを使用。
@@ -895,7 +969,6 @@ def import_initial_stock(excel_path=None, sheet_name='クリマ2512'):
         
         # JSON構造作成
         # 日付固定: 2025-12-14 (クリマ2512最終日)
-        from datetime import datetime
         date_str = "2025-12-14"
         # タイムスタンプもこの日の終わりに設定
         timestamp_str = datetime(2025, 12, 14, 23, 59, 59).isoformat()
@@ -910,25 +983,9 @@ def import_initial_stock(excel_path=None, sheet_name='クリマ2512'):
             "total_target": 0 # 初期在庫データの文脈ではターゲット不明
         }
 
-        # history_summary.json 更新
-        ensure_local_history(HISTORY_PATH)
-        history_list = []
-        if os.path.exists(HISTORY_PATH):
-            try:
-                with open(HISTORY_PATH, 'r', encoding='utf-8') as f:
-                    history_list = json.load(f)
-            except:
-                history_list = []
-        
-        # 既存の type: "initial" を削除して入れ替え
-        history_list = [h for h in history_list if h.get('type') != 'initial']
-        
-        # 先頭に追加（あるいは時系列順？初期在庫なので先頭が自然）
-        history_list.insert(0, new_entry)
-        
-        # 保存
-        with open(HISTORY_PATH, 'w', encoding='utf-8') as f:
-            json.dump(history_list, f, indent=2, ensure_ascii=False)
+        # 履歴ストア更新: initial を追記（読み出し時は最後の initial のみ有効）
+        ensure_local_history()
+        history_store.append_snapshot(new_entry)
             
         msg = f"初期在庫インポート完了: {len(initial_data_details)} 件, 総数 {total_count}, 総額 {total_value}"
         logger.info(msg)
@@ -0,0 +1,268 @@
+"""
+master_store.py - 商品マスタの列指向ローカルストア (Arrow IPC / Feather v2)
+
+production_master.json（indent付きJSON）を読むたびに全体をパースしていたため、
+マスタを列指向のバイナリ (data/production_master.arrow) にも保存し、
+読み出し側はメモリマップした上で必要な列だけを取り出せるようにする。
+
+- ネストした工程時間 (process.nc.front_rough_min 等) はドット区切りの数値列に平坦化する
+- 平坦化できない値（event_data や型の異なる値）は行ごとに "_extra" 列へJSONで保持し、
+  load_records() で元の dict のリストを完全に復元する
+- 非圧縮で書くため、読み出しは memory_map=True でページ単位に遅延読み込みされる
+- pyarrow が無い環境では available() が False になり、呼び出し側は JSON を使う
+
+※ app.py は importlib.reload しないモジュールなので、読み込み済みテーブルのキャッシュは
+   Streamlit の再実行をまたいで保持される。
+"""
+
+import os
+import json
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+STORE_PATH = os.path.join(DATA_DIR, 'production_master.arrow')
+JSON_EXPORT_PATH = os.path.join(DATA_DIR, 'production_master.json')
+
+EXTRA_COLUMN = '_extra'
+
+# (列名, 型) 列名はネストしたキーをドットで連結したもの
+FIELDS = [
+    ('id', 'str'),
+    ('category', 'str'),
+    ('name', 'str'),
+    ('part', 'str'),
+    ('price', 'int'),
+    ('current_stock', 'int'),
+    ('target_quantity', 'int'),
+    ('event_sheet_stock', 'int'),
+    ('remaining', 'int'),
+    ('requirements.yield', 'float'),
+    ('requirements.material_type', 'str'),
+    ('requirements.nc_machine_type', 'str'),
+    ('process.prep.setup_min', 'float'),
+    ('process.prep.unit_min', 'float'),
+    ('process.prep.drying_hr', 'float'),
+    ('process.nc.front_rough_min', 'float'),
+    ('process.nc.front_finish_min', 'float'),
+    ('process.nc.back_rough_min', 'float'),
+    ('process.nc.back_finish_min', 'float'),
+    ('process.assembly.cut_off_min', 'float'),
+    ('process.assembly.bonding_min', 'float'),
+    ('process.assembly.drying_hr', 'float'),
+    ('process.manual.fitting_min', 'float'),
+    ('process.manual.machine_work_min', 'float'),
+    ('process.manual.sanding_min', 'float'),
+    ('process.manual.assembly_min', 'float'),
+]
+
+_PY_TYPES = {'str': str, 'int': int, 'float': float}
+
+_cache_lock = threading.Lock()
+_table_cache = {}  # {path: (mtime_ns, size, pyarrow.Table)}
+
+
+def available():
+    """pyarrow が使えるか。"""
+    return feather is not None
+
+
+def _arrow_type(kind):
+    return {'str': pa.string(), 'int': pa.int64(), 'float': pa.float64()}[kind]
+
+
+def _matches(value, kind):
+    # bool は int のサブクラスなので除外し、JSON と同じ型で戻ることを保証する
+    return type(value) is _PY_TYPES[kind]
+
+
+def _split_item(item):
+    """
+    1商品を (平坦化した値の dict, 残りのネスト dict) に分ける。
+    平坦化した値は FIELDS の型と一致するものだけ。
+    """
+    flat = {}
+    extra = json.loads(json.dumps(item, ensure_ascii=False))  # ディープコピー
+    for column, kind in FIELDS:
+        keys = column.split('.')
+        parent = extra
+        for key in keys[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if isinstance(parent, dict) and keys[-1] in parent and _matches(parent[keys[-1]], kind):
+            flat[column] = parent.pop(keys[-1])
+    return flat, _prune(extra)
+
+
+def _prune(node):
+    """平坦化で空になったネスト dict を取り除く（元から空だった dict も消えるが、to_table の検証で拾う）。"""
+    if not isinstance(node, dict):
+        return node
+    pruned = {}
+    for key, value in node.items():
+        value = _prune(value)
+        if isinstance(value, dict) and not value:
+            continue
+        pruned[key] = value
+    return pruned
+
+
+def _join(flat, extra):
+    """_split_item の逆変換。"""
+    item = {}
+    for column, _kind in FIELDS:
+        value = flat.get(column)
+        if value is None:
+            continue
+        keys = column.split('.')
+        parent = item
+        for key in keys[:-1]:
+            parent = parent.setdefault(key, {})
+        parent[keys[-1]] = value
+    _deep_merge(item, extra or {})
+    return item
+
+
+def _deep_merge(dst, src):
+    for key, value in src.items():
+        if isinstance(value, dict) and isinstance(dst.get(key), dict):
+            _deep_merge(dst[key], value)
+        else:
+            dst[key] = value
+
+
+def to_table(master_list):
+    """
+    マスタのリストを列指向テーブルに変換する。
+    復元結果が元と一致しない商品（元から空の dict を含む等）は、列の値に加えて
+    商品全体を _extra に持つ（_join で全体が上書きされるため完全に復元される）。
+    """
+    columns = {column: [] for column, _kind in FIELDS}
+    extras = []
+    for item in master_list:
+        flat, extra = _split_item(item)
+        if _join(flat, extra) != item:
+            extra = item
+        for column, _kind in FIELDS:
+            columns[column].append(flat.get(column))
+        extras.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+
+    arrays = [pa.array(columns[column], type=_arrow_type(kind)) for column, kind in FIELDS]
+    arrays.append(pa.array(extras, type=pa.string()))
+    names = [column for column, _kind in FIELDS] + [EXTRA_COLUMN]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def save(master_list, path=None):
+    """
+    マスタを列指向ストアに保存する（一時ファイル経由で差し替え）。
+
+    Returns:
+        bool: 保存した場合 True（pyarrow 無し・失敗時は False）
+    """
+    if not available():
+        return False
+    path = path or STORE_PATH
+    try:
+        table = to_table(master_list)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        # 非圧縮: 読み出し時にメモリマップしたまま列を参照できる
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+        with _cache_lock:
+            _table_cache.pop(path, None)
+        return True
+    except Exception as e:
+        print(f"[master_store] WARNING: 保存失敗: {e}")
+        return False
+
+
+def _get_table(path):
+    st = os.stat(path)
+    with _cache_lock:
+        cached = _table_cache.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+    table = feather.read_table(path, memory_map=True)
+    with _cache_lock:
+        _table_cache[path] = (st.st_mtime_ns, st.st_size, table)
+    return table
+
+
+def is_fresh(path=None, json_path=None):
+    """
+    ストアが存在し、JSON エクスポートより古くないか。
+    JSON だけが更新された（手動編集・旧バージョンで保存された）場合は False。
+    """
+    path = path or STORE_PATH
+    if not available() or not os.path.exists(path):
+        return False
+    json_path = json_path or JSON_EXPORT_PATH
+    if os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(path):
+        return False
+    return True
+
+
+def read_columns(columns, path=None):
+    """
+    指定列だけを DataFrame で返す（列名は FIELDS のドット区切り名）。
+
+    Returns:
+        pd.DataFrame or None: ストアが無い・読めない場合 None
+    """
+    path = path or STORE_PATH
+    if not available() or not os.path.exists(path):
+        return None
+    try:
+        return _get_table(path).select(list(columns)).to_pandas()
+    except Exception as e:
+        print(f"[master_store] WARNING: 読み込み失敗: {e}")
+        return None
+
+
+def load_records(path=None):
+    """
+    ストアから元のマスタのリスト（dict のリスト）を復元する。
+
+    Returns:
+        list or None: ストアが無い・読めない場合 None
+    """
+    path = path or STORE_PATH
+    if not available() or not os.path.exists(path):
+        return None
+    try:
+        table = _get_table(path)
+        data = table.to_pydict()
+    except Exception as e:
+        print(f"[master_store] WARNING: 読み込み失敗: {e}")
+        return None
+
+    records = []
+    for i in range(table.num_rows):
+        flat = {column: data[column][i] for column, _kind in FIELDS}
+        extra_raw = data[EXTRA_COLUMN][i]
+        records.append(_join(flat, json.loads(extra_raw) if extra_raw else None))
+    return records
+
+
+def records_to_frame(master_list, columns):
+    """JSON から読んだマスタのリストを read_columns と同じ形の DataFrame にする（フォールバック用）。"""
+    rows = []
+    for item in master_list:
+        row = {}
+        for column in columns:
+            value = item
+            for key in column.split('.'):
+                value = value.get(key) if isinstance(value, dict) else None
+            row[column] = value
+        rows.append(row)
+    return pd.DataFrame(rows, columns=list(columns))
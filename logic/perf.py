@@ -0,0 +1,192 @@
+"""
+perf.py - 処理段階ごとの所要時間・回数の計測
+
+再実行の時間がどこで使われているかが print("[load_data] Step ...") 頼みで見えなかったため、
+軽量なタイマーとカウンターを用意し、結果をローカルのメトリクスファイルに蓄積する。
+
+使い方:
+    @perf.timed('authenticate')          # デコレータ
+    def authenticate(): ...
+
+    with perf.timed('read_excel'):       # コンテキストマネージャ
+        ...
+
+    perf.count('drive_cache.hit')        # カウンター
+
+- 記録は data/perf_metrics.jsonl（ATLAS_PERF_METRICS_PATH で変更可）に1行1件で追記する（{"ts", "stage", "ms", "ok"} / {"ts", "counter", "n"}）
+- 計測のたびにファイルを開かないよう FLUSH_EVERY 件または FLUSH_INTERVAL_SEC 秒ごとにまとめて書き出す
+- 行数が MAX_RECORDS を大きく超えたら直近 MAX_RECORDS 件だけ残して書き直す（ローリング）
+- summary() は再実行・プロセスをまたいだ段階ごとの p50 / p95 を返す（サイドバーの Performance 表示用）
+
+※ app.py は importlib.reload しないモジュールなので、バッファは Streamlit の再実行をまたいで保持される。
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import ContextDecorator
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+# 環境変数で出力先の変更（ATLAS_PERF_METRICS_PATH）・計測の無効化（ATLAS_PERF_DISABLED=1）ができる
+# （テスト・ベンチマークで data/ にメトリクスを書き出さないため）
+METRICS_PATH = os.environ.get('ATLAS_PERF_METRICS_PATH') or os.path.join(DATA_DIR, 'perf_metrics.jsonl')
+ENABLED = os.environ.get('ATLAS_PERF_DISABLED', '').lower() not in ('1', 'true', 'yes')
+
+MAX_RECORDS = 5000
+FLUSH_EVERY = 20
+FLUSH_INTERVAL_SEC = 5.0
+
+_lock = threading.Lock()
+_buffer = []
+_state = {'last_flush': time.time(), 'lines': None}  # lines: ファイルの行数（未確認なら None）
+_summary_cache = {}  # {path: (size, mtime_ns, summary)}
+
+
+class timed(ContextDecorator):
+    """
+    with ブロック / デコレートした関数の所要時間を stage 名で記録する。
+    例外で抜けた場合も ok=False として記録する（例外はそのまま送出）。
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._local = threading.local()
+
+    def __enter__(self):
+        # 同じインスタンスが再帰・複数スレッドで使われても開始時刻が混ざらないようにスタックで持つ
+        stack = getattr(self._local, 'starts', None)
+        if stack is None:
+            stack = self._local.starts = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        started = self._local.starts.pop()
+        _record({
+            'ts': round(time.time(), 3),
+            'stage': self.stage,
+            'ms': round((time.perf_counter() - started) * 1000, 3),
+            'ok': exc_type is None,
+        })
+        return False
+
+
+def count(counter, n=1):
+    """カウンターを n 増やす。"""
+    _record({'ts': round(time.time(), 3), 'counter': counter, 'n': n})
+
+
+def _record(record):
+    if not ENABLED:
+        return
+    with _lock:
+        _buffer.append(record)
+        due = len(_buffer) >= FLUSH_EVERY or time.time() - _state['last_flush'] >= FLUSH_INTERVAL_SEC
+    if due:
+        flush()
+
+
+def _count_lines(path):
+    try:
+        with open(path, 'rb') as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
+
+
+def _trim(path):
+    """直近 MAX_RECORDS 行だけを残して書き直す（一時ファイル経由で差し替え）。"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()[-MAX_RECORDS:]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    return len(lines)
+
+
+def flush():
+    """バッファをメトリクスファイルに書き出す。"""
+    path = METRICS_PATH
+    with _lock:
+        records = list(_buffer)
+        _buffer.clear()
+        _state['last_flush'] = time.time()
+        if not records:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if _state['lines'] is None:
+                _state['lines'] = _count_lines(path)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            _state['lines'] += len(records)
+            # 毎回書き直さないよう、上限の1.2倍を超えた時だけ切り詰める
+            if _state['lines'] > MAX_RECORDS * 1.2:
+                _state['lines'] = _trim(path)
+        except Exception as e:
+            print(f"[perf] WARNING: メトリクス書き出し失敗: {e}")
+
+
+atexit.register(flush)
+
+
+def summary():
+    """
+    メトリクスファイルを段階ごとに集計する（ファイルが変わるまでは前回の集計を返す）。
+
+    Returns:
+        dict: {
+            'stages': [{'stage', 'count', 'p50_ms', 'p95_ms', 'last_ms', 'errors'}, ...]  p95 の大きい順,
+            'counters': {counter: 合計},
+        }
+    """
+    flush()
+    path = METRICS_PATH
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {'stages': [], 'counters': {}}
+    with _lock:
+        cached = _summary_cache.get(path)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+
+    durations = {}
+    errors = {}
+    counters = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'stage' in record:
+                durations.setdefault(record['stage'], []).append(record.get('ms', 0.0))
+                if not record.get('ok', True):
+                    errors[record['stage']] = errors.get(record['stage'], 0) + 1
+            elif 'counter' in record:
+                counters[record['counter']] = counters.get(record['counter'], 0) + record.get('n', 1)
+
+    stages = []
+    for stage, values in durations.items():
+        arr = np.asarray(values, dtype=np.float64)
+        p50, p95 = np.percentile(arr, [50, 95])
+        stages.append({
+            'stage': stage,
+            'count': int(arr.size),
+            'p50_ms': round(float(p50), 1),
+            'p95_ms': round(float(p95), 1),
+            'last_ms': round(float(arr[-1]), 1),
+            'errors': errors.get(stage, 0),
+        })
+    stages.sort(key=lambda s: s['p95_ms'], reverse=True)
+    result = {'stages': stages, 'counters': counters}
+    with _lock:
+        _summary_cache[path] = (st.st_size, st.st_mtime_ns, result)
+    return result
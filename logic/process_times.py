@@ -0,0 +1,236 @@
+"""
+process_times.py - 商品ごとの工程時間テーブル（事前計算）
+
+BIダッシュボードの各KPIと軍師Zeusのプロンプト構築が、それぞれ商品マスタの
+ネストした dict (process.nc.* / process.manual.* 等) を辿って同じNC・手作業時間を
+集計し直していたため、マスタ1版につき1度だけ NumPy 配列の表に展開し、全員で共有する。
+
+列 (すべて1個あたり):
+  - nc_min     : NC合計 (表粗+表仕+裏粗+裏仕)
+  - manual_min : 手作業合計 (準備単体+切断+接着+嵌合+機械+研磨+組立)、乾燥・段取りは除く
+  - total_min  : nc_min + manual_min
+  - drying_hr  : 乾燥時間 (準備+組付)
+  - setup_min  : 段取り時間 (準備)
+
+行はマスタのリスト順。商品IDからは id_index で引く（IDが重複する場合は後勝ち）。
+合計は旧実装と同じ順序で足し込むため、浮動小数点の結果も一致する。
+旧実装と同じく、要素がすべて整数の行は unit_times() / row() も整数で返す（プロンプトで "45分" と表示するため）。
+
+※ app.py は importlib.reload しないモジュールなので、テーブルのキャッシュは
+   Streamlit の再実行をまたいで保持される。
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+COLUMNS = ('nc_min', 'manual_min', 'total_min', 'drying_hr', 'setup_min')
+
+# (工程, キー) 合計に足し込む順序は旧 _calc_item_times と同じ
+NC_KEYS = (
+    ('nc', 'front_rough_min'),
+    ('nc', 'front_finish_min'),
+    ('nc', 'back_rough_min'),
+    ('nc', 'back_finish_min'),
+)
+MANUAL_KEYS = (
+    ('prep', 'unit_min'),
+    ('assembly', 'cut_off_min'),
+    ('assembly', 'bonding_min'),
+    ('manual', 'fitting_min'),
+    ('manual', 'machine_work_min'),
+    ('manual', 'sanding_min'),
+    ('manual', 'assembly_min'),
+)
+DRYING_KEYS = (
+    ('prep', 'drying_hr'),
+    ('assembly', 'drying_hr'),
+)
+SETUP_KEYS = (
+    ('prep', 'setup_min'),
+)
+
+# 保持するテーブル数（最新版 + 直前版程度で十分）
+MAX_CACHED_TABLES = 2
+
+_cache_lock = threading.Lock()
+_by_list = OrderedDict()   # {id(master_list): (master_list, ProcessTimeTable)}
+_by_version = OrderedDict()  # {version: ProcessTimeTable}
+
+
+def _component(item, keys):
+    """工程時間の各要素を keys の順に取り出す（欠損は 0）。"""
+    proc = item.get('process', {}) or {}
+    values = []
+    for stage, key in keys:
+        values.append((proc.get(stage, {}) or {}).get(key, 0))
+    return values
+
+
+def _is_integral(values):
+    """要素がすべて整数か（Python の加算で合計が int のままになるか）。"""
+    return all(isinstance(value, (int, np.integer)) for value in values)
+
+
+def _sum_columns(master_list, keys):
+    """
+    keys の各要素を列ベクトルにして順に足し込む（旧実装の加算順を保つ）。
+
+    Returns:
+        tuple: (合計の列, 行ごとに要素がすべて整数かを表す bool 列)
+    """
+    if not master_list:
+        return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=bool)
+    rows = [_component(item, keys) for item in master_list]
+    matrix = np.array(rows, dtype=np.float64)
+    total = matrix[:, 0].copy()
+    for j in range(1, matrix.shape[1]):
+        total += matrix[:, j]
+    return total, np.array([_is_integral(values) for values in rows], dtype=bool)
+
+
+class ProcessTimeTable:
+    """
+    マスタ1版分の工程時間テーブル。
+
+    Attributes:
+        ids (list): 行ごとの商品ID（文字列、前後空白除去）
+        id_index (dict): {商品ID: 行番号}
+        nc_min, manual_min, total_min, drying_hr, setup_min (np.ndarray): 各列
+    """
+
+    def __init__(self, master_list):
+        master_list = list(master_list or [])
+        self.ids = [str(item.get('id', '') or '').strip() for item in master_list]
+        self.id_index = {item_id: i for i, item_id in enumerate(self.ids) if item_id}
+        self._positions = {id(item): i for i, item in enumerate(master_list)}
+        self._items = master_list  # _positions の id() を有効に保つため参照を保持
+
+        self.nc_min, nc_integral = _sum_columns(master_list, NC_KEYS)
+        self.manual_min, manual_integral = _sum_columns(master_list, MANUAL_KEYS)
+        self.total_min = self.nc_min + self.manual_min
+        self.drying_hr, drying_integral = _sum_columns(master_list, DRYING_KEYS)
+        self.setup_min, setup_integral = _sum_columns(master_list, SETUP_KEYS)
+        self._integral = {
+            'nc_min': nc_integral,
+            'manual_min': manual_integral,
+            'total_min': nc_integral & manual_integral,
+            'drying_hr': drying_integral,
+            'setup_min': setup_integral,
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, item):
+        """商品 dict（マスタのリスト内の同一オブジェクト）の行番号。無ければ None。"""
+        return self._positions.get(id(item))
+
+    def _value(self, column, pos):
+        """1セルの値。要素がすべて整数の行は int、それ以外は float。"""
+        value = getattr(self, column)[pos]
+        return int(value) if self._integral[column][pos] else float(value)
+
+    def unit_times(self, item):
+        """
+        1個あたりの (NC分, 手作業分, 合計分) を返す。
+        このテーブルのマスタに含まれない dict の場合はその場で計算する。
+        """
+        pos = self.position(item)
+        if pos is None:
+            return unit_times(item)
+        return self._value('nc_min', pos), self._value('manual_min', pos), self._value('total_min', pos)
+
+    def row(self, item):
+        """
+        1商品の全列を dict で返す。このテーブルのマスタに含まれない dict の場合はその場で計算する。
+        """
+        pos = self.position(item)
+        if pos is None:
+            return ProcessTimeTable([item]).row(item)
+        return {column: self._value(column, pos) for column in COLUMNS}
+
+    def time_map(self, column):
+        """{商品ID: 列の値} を返す（ID無しの行は除く）。"""
+        values = getattr(self, column).tolist()
+        return {item_id: values[pos] for item_id, pos in self.id_index.items()}
+
+
+def unit_times(item):
+    """
+    テーブルを介さずに1商品の (NC分, 手作業分, 合計分) を計算する。
+    検索ヒット等、マスタ外の dict にも使える。
+    """
+    nc_min = 0
+    for value in _component(item, NC_KEYS):
+        nc_min += value
+    manual_min = 0
+    for value in _component(item, MANUAL_KEYS):
+        manual_min += value
+    return nc_min, manual_min, nc_min + manual_min
+
+
+def register_version(master_list, version, rebuild=False):
+    """
+    マスタのリストにバージョン（ワークブックのコンテンツハッシュ）を紐付け、テーブルを構築する。
+    同じバージョンのマスタを読み直した場合は、既存のテーブルを新しいリストに再利用する。
+    以降 get_process_table(master_list) はこのテーブルを返す。
+
+    Args:
+        master_list (list): refresh_master() の出力
+        version (str): refresh_master() が返したバージョン（None の場合は紐付けない）
+        rebuild (bool): True の場合は同じバージョンでも構築し直す（マスタを再変換した場合）
+
+    Returns:
+        ProcessTimeTable
+    """
+    with _cache_lock:
+        table = _by_version.get(version) if version and not rebuild else None
+        if table is not None and len(table) != len(master_list or []):
+            table = None
+    if table is None:
+        table = ProcessTimeTable(master_list)
+        print(f"[process_times] 工程時間テーブルを構築 ({len(table)}件)")
+    else:
+        # 同一版のマスタでも dict は別オブジェクトなので、行位置だけ付け替える
+        table._positions = {id(item): i for i, item in enumerate(master_list)}
+        table._items = list(master_list)
+    with _cache_lock:
+        if version:
+            _by_version[version] = table
+            _by_version.move_to_end(version)
+            while len(_by_version) > MAX_CACHED_TABLES:
+                _by_version.popitem(last=False)
+        _remember(master_list, table)
+    return table
+
+
+def _remember(master_list, table):
+    _by_list[id(master_list)] = (master_list, table)
+    _by_list.move_to_end(id(master_list))
+    while len(_by_list) > MAX_CACHED_TABLES:
+        _by_list.popitem(last=False)
+
+
+def get_process_table(master_list):
+    """
+    マスタのリストに対応する工程時間テーブルを返す（同じリストなら構築済みのものを共有）。
+
+    Args:
+        master_list (list): load_master_json() の出力
+
+    Returns:
+        ProcessTimeTable
+    """
+    master_list = master_list if master_list is not None else []
+    with _cache_lock:
+        cached = _by_list.get(id(master_list))
+        if cached and cached[0] is master_list and len(cached[1]) == len(master_list):
+            _by_list.move_to_end(id(master_list))
+            return cached[1]
+    table = ProcessTimeTable(master_list)
+    with _cache_lock:
+        _remember(master_list, table)
+    return table
+
@@ -1,7 +1,36 @@
+import os
+import re
+import json
 import hashlib
+import threading
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+from logic import perf
+
+# 面判定キーワード（determine_side と共通）
+FRONT_KEYWORDS = ['face', 'front', 'omote', '表']
+BACK_KEYWORDS = ['back', 'rear', 'ura', '裏', 'base']
+
+# ハッシュ対象の列（TimeStamp + Project + Path + Message の順で連結）
+HASH_COLUMNS = ['TIMESTAMP', 'PROJECT', 'PATH', 'MESSAGE']
+
+# イベント化の対象期間（日数）。これより古い日付の集計はキャッシュから追い出す
+RETENTION_DAYS = 90
+
+# 増分計算の状態（処理済み行のウォーターマーク + (日付, 商品, 部位) ごとの集計）
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS_STATE_PATH = os.path.join(BASE_DIR, 'data', 'production_events_state.json')
+EVENTS_STATE_VERSION = 1
+
+_state_lock = threading.Lock()
+_state_cache = {}  # {path: (mtime_ns, size, state)} 再実行ごとの JSON 読み直しを省く
+
+# Python 実装の文字列型（.str の strip / lower を str と同じ挙動にするため）
+# na_value 引数は pandas 2.3 以降（requirements.txt で pandas>=2.3 を指定）
+_PY_STRING_DTYPE = pd.StringDtype('python', na_value=np.nan)
+
 def hash_row(row):
     """
     行データのユニークなハッシュ値を生成 (SHA256)
@@ -20,26 +49,58 @@ def determine_side(path):
     ファイルパスから加工面(表/裏)を判定する
     """
     path_lower = str(path).lower()
-    if any(kw in path_lower for kw in ['face', 'front', 'omote', '表']):
+    if any(kw in path_lower for kw in FRONT_KEYWORDS):
         return '表'
-    if any(kw in path_lower for kw in ['back', 'rear', 'ura', '裏', 'base']):
+    if any(kw in path_lower for kw in BACK_KEYWORDS):
         return '裏'
     return '不明'
 
-def calculate_production_events(log_df):
+def _as_text(series):
+    """str(value) 相当で文字列化する（NaN は 'nan'、欠損扱いにしない）。"""
+    return pd.Series(series.map(str).to_numpy(dtype=object), index=series.index, dtype=_PY_STRING_DTYPE)
+
+
+def determine_sides(paths):
+    """determine_side の Series 版。str.contains で一括判定する。"""
+    lowered = _as_text(paths).str.lower()
+    is_front = lowered.str.contains('|'.join(map(re.escape, FRONT_KEYWORDS)), regex=True)
+    is_back = lowered.str.contains('|'.join(map(re.escape, BACK_KEYWORDS)), regex=True)
+    return pd.Series(np.where(is_front, '表', np.where(is_back, '裏', '不明')), index=paths.index)
+
+
+def hash_rows(df):
     """
-    ログデータから生産カレンダー用イベントを作成する (共通仕様書 v1.0 準拠)
+    hash_row の一括版。ハッシュ対象列を文字列化・strip して '|' で連結し、
+    SHA256 を1パスで計算する（無い列は空文字扱い）。
     """
-    events = []
-    
-    if log_df is None or log_df.empty:
-        return events
+    parts = []
+    for col in HASH_COLUMNS:
+        if col in df.columns:
+            parts.append(_as_text(df[col]).str.strip())
+        else:
+            parts.append(pd.Series('', index=df.index, dtype=_PY_STRING_DTYPE))
+    joined = parts[0].str.cat(parts[1:], sep='|')
+    return pd.Series(
+        [hashlib.sha256(raw.encode('utf-8')).hexdigest() for raw in joined],
+        index=df.index, dtype=object,
+    )
 
+
+def _cutoff_date_str(now=None):
+    """保持期間の下限日 (YYYY-MM-DD)。この日付以降のグループをイベント化する。"""
+    return ((now or datetime.now()) - timedelta(days=RETENTION_DAYS)).strftime('%Y-%m-%d')
+
+
+def _prepare_log(log_df):
+    """
+    必須列の補完・TIMESTAMP のパース・日付列の付与を行う。
+    TIMESTAMP 列が無い場合は None。
+    """
     df = log_df.copy()
-    
+
     # 必須列の存在確認と補完
     if 'TIMESTAMP' not in df.columns:
-        return events
+        return None
     if 'PROJECT' not in df.columns:
         df['PROJECT'] = 'Unknown'
     if 'PART' not in df.columns:
@@ -47,47 +108,81 @@ def calculate_production_events(log_df):
     if 'PATH' not in df.columns:
         df['PATH'] = ''
 
-    # TIMESTAMP のパースと90日フィルタリング
+    # TIMESTAMP のパース
     df['dt_parsed'] = pd.to_datetime(df['TIMESTAMP'], errors='coerce')
     df = df.dropna(subset=['dt_parsed'])
-    
-    cutoff_date = datetime.now() - timedelta(days=90)
-    df = df[df['dt_parsed'] >= cutoff_date]
-    
-    if df.empty:
-        return events
-
     # 日付文字列 (YYYY-MM-DD) の作成
     df['LOG_DATE'] = df['dt_parsed'].dt.strftime('%Y-%m-%d')
-    
-    # グループ化: 日付 + プロジェクト + パーツ
-    grouped = df.groupby(['LOG_DATE', 'PROJECT', 'PART'])
-
-    for (d_str, proj_name, part_name), group in grouped:
-        # 面判定
-        sides = set()
-        hashes = []
-        
-        for idx, row in group.iterrows():
-            s = determine_side(row['PATH'])
-            sides.add(s)
-            hashes.append(hash_row(row))
-        
+    return df
+
+
+def _aggregate_groups(df, groups=None):
+    """
+    行を (日付, 商品, 部位) ごとに集約し、groups に追記・マージする。
+
+    各グループは {"sides": [初出順の面], "hashes": [行順のハッシュ], "max_ts": Timestamp}。
+    面判定・ハッシュは列単位で一括計算し、グループ番号で安定ソートした配列を
+    切り出して集約する（行ごとの iterrows は行わない）。
+    """
+    groups = {} if groups is None else groups
+    # グループ化: 日付 + プロジェクト + パーツ（キー欠損行は groupby と同様に除外）
+    group_keys = ['LOG_DATE', 'PROJECT', 'PART']
+    df = df.dropna(subset=group_keys)
+    if df.empty:
+        return groups
+    grouped = df.groupby(group_keys, sort=True)
+
+    # 面判定・ハッシュを列単位で一括計算
+    sides_arr = determine_sides(df['PATH']).to_numpy(dtype=object)
+    hashes_arr = hash_rows(df).to_numpy(dtype=object)
+
+    # グループ番号で安定ソートし、各グループの行範囲を求める（グループ内は元の行順）
+    codes = grouped.ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(order)]))
+    sides_arr = sides_arr[order]
+    hashes_arr = hashes_arr[order]
+
+    max_ts = grouped['dt_parsed'].max()
+    for key, start, end, group_max in zip(max_ts.index, starts, ends, max_ts.to_numpy()):
+        group_max = pd.Timestamp(group_max)
+        agg = groups.get(key)
+        if agg is None:
+            groups[key] = agg = {"sides": [], "hashes": [], "max_ts": group_max}
+        elif group_max > agg['max_ts']:
+            agg['max_ts'] = group_max
+        for side in dict.fromkeys(sides_arr[start:end].tolist()):
+            if side not in agg['sides']:
+                agg['sides'].append(side)
+        agg['hashes'].extend(hashes_arr[start:end].tolist())
+    return groups
+
+
+def _build_events(groups, cutoff):
+    """集約済みグループ（日付 >= cutoff）を FullCalendar 用イベントに変換する（キー順）。"""
+    events = []
+    for key in sorted(k for k in groups if k[0] >= cutoff):
+        d_str, proj_name, part_name = key
+        agg = groups[key]
+        # 面判定（行順に set へ追加するのと同じ順序になるよう初出順のリストから作る）
+        sides = set(agg['sides'])
+
         has_front = '表' in sides
         has_back = '裏' in sides
-        
+
         # タイトルとステータスの決定
         disp_title = proj_name
         if part_name:
             disp_title = f"{proj_name} ({part_name})"
-            
+
         status_details = f"Sides: {list(sides)}"
         color = "#28a745" if (has_front and has_back) else "#ffc107" # 緑(高信頼) or 黄(低信頼)
 
         # FullCalendar用イベント形式
-        source_hashes = ",".join(hashes)
-        max_ts = group['dt_parsed'].max()
-        atlas_timestamp = max_ts.strftime('%Y-%m-%d %H:%M:%S')
+        source_hashes = ",".join(agg['hashes'])
+        atlas_timestamp = agg['max_ts'].strftime('%Y-%m-%d %H:%M:%S')
 
         events.append({
             "title": disp_title,
@@ -102,5 +197,152 @@ def calculate_production_events(log_df):
                 "atlas_timestamp": atlas_timestamp
             }
         })
-
     return events
+
+
+def _to_builtin(value):
+    """numpy スカラーを JSON 化できる Python の値に変換する。"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _load_events_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cached = _state_cache.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != EVENTS_STATE_VERSION:
+            return None
+        state['groups'] = {
+            (g['date'], g['project'], g['part']): {
+                "sides": g['sides'],
+                "hashes": g['hashes'],
+                "max_ts": pd.Timestamp(g['max_ts']),
+            }
+            for g in state.get('groups', [])
+        }
+        _state_cache[path] = (st.st_mtime_ns, st.st_size, state)
+        return state
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_events_state(path, state):
+    data = dict(state)
+    data['groups'] = [
+        {
+            "date": key[0],
+            "project": _to_builtin(key[1]),
+            "part": _to_builtin(key[2]),
+            "sides": agg['sides'],
+            "hashes": agg['hashes'],
+            "max_ts": agg['max_ts'].isoformat(),
+        }
+        for key, agg in sorted(state['groups'].items())
+    ]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # json.dump はファイルへ逐次書き出す純Python実装になるため、dumps で一括生成する
+        f.write(json.dumps(data, ensure_ascii=False))
+    os.replace(tmp_path, path)
+    st = os.stat(path)
+    _state_cache[path] = (st.st_mtime_ns, st.st_size, state)
+
+
+def _row_watermark(log_df, row_count):
+    """row_count 行目（最後に処理した行）の TIMESTAMP とハッシュ。"""
+    if row_count <= 0:
+        return None, None
+    last = log_df.iloc[[row_count - 1]]
+    return str(last['TIMESTAMP'].iloc[0]), hash_rows(last).iloc[0]
+
+
+def _calculate_incremental(log_df, state_path):
+    """
+    前回処理した行以降の追記分だけを集計し、保存済みの集計にマージする。
+    ログが追記以外の形で変わっていた（行数減少・最終処理行の不一致・列構成の変化）
+    場合は全件を再集計する。
+    """
+    columns = [str(c) for c in log_df.columns]
+    cutoff = _cutoff_date_str()
+
+    with _state_lock:
+        state = _load_events_state(state_path)
+        start_row = 0
+        groups = {}
+        if state and state.get('columns') == columns and 0 < state.get('row_count', 0) <= len(log_df):
+            _, last_hash = _row_watermark(log_df, state['row_count'])
+            if last_hash == state.get('last_hash'):
+                start_row = state['row_count']
+                groups = state['groups']
+
+        if start_row == len(log_df):
+            # 新規行なし: 追い出す日付も無ければ保存し直さない
+            if all(k[0] >= cutoff for k in groups):
+                return _build_events(groups, cutoff)
+        else:
+            mode = "増分" if start_row else "全件"
+            print(f"[production_logic] {mode}集計: {start_row}行目以降 {len(log_df) - start_row}行")
+            df = _prepare_log(log_df.iloc[start_row:])
+            if df is None:
+                return []
+            # 保持期間外の行は集計しない
+            df = df[df['LOG_DATE'] >= cutoff]
+            _aggregate_groups(df, groups)
+
+        # 保持期間外になった日付の集計を追い出す
+        groups = {k: v for k, v in groups.items() if k[0] >= cutoff}
+
+        last_ts, last_hash = _row_watermark(log_df, len(log_df))
+        try:
+            _save_events_state(state_path, {
+                "version": EVENTS_STATE_VERSION,
+                "columns": columns,
+                "row_count": len(log_df),
+                "last_timestamp": last_ts,
+                "last_hash": last_hash,
+                "groups": groups,
+            })
+        except Exception as e:
+            _state_cache.pop(state_path, None)
+            print(f"[production_logic] WARNING: 集計状態の保存に失敗: {e}")
+
+    return _build_events(groups, cutoff)
+
+
+@perf.timed('calculate_production_events')
+def calculate_production_events(log_df, incremental=False, state_path=None):
+    """
+    ログデータから生産カレンダー用イベントを作成する (共通仕様書 v1.0 準拠)
+
+    直近 RETENTION_DAYS 日（日付単位）のログを (日付, 商品, 部位) ごとにまとめる。
+
+    Args:
+        log_df: Atlas ログ（追記のみで増えていくシート）
+        incremental (bool): True の場合、処理済み行のウォーターマークと集計を
+            EVENTS_STATE_PATH に保存し、次回以降は追記された行だけを処理する
+        state_path: 集計状態の保存先（省略時 EVENTS_STATE_PATH）
+    """
+    if log_df is None or log_df.empty:
+        return []
+
+    if incremental:
+        return _calculate_incremental(log_df, state_path or EVENTS_STATE_PATH)
+
+    df = _prepare_log(log_df)
+    if df is None:
+        return []
+
+    # 90日フィルタリング（日付単位）
+    cutoff = _cutoff_date_str()
+    df = df[df['LOG_DATE'] >= cutoff]
+    if df.empty:
+        return []
+
+    return _build_events(_aggregate_groups(df), cutoff)
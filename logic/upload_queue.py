@@ -0,0 +1,176 @@
+"""
+upload_queue.py - Drive へのアップロードを後回しにしてまとめる書き込みキュー（write-behind）
+
+upload_to_drive() は history_summary / event_master を書き込むたびに同期でアップロードしており、
+merge_event_targets の途中や応募ステータスのチェックボックス操作のたびに画面が待たされていた。
+
+本モジュールは
+  - enqueue() でアップロードを予約してすぐに戻る
+  - 同じファイルIDへの予約は COALESCE_WINDOW_SEC の間まとめ、最後に書かれた内容を1回だけ送る
+  - バックグラウンドのワーカースレッドが期限の来たものから順に送り、失敗時は指数バックオフで再試行する
+アップロードはファイルを送る時点で読むので、まとめられた間の書き込みはすべて反映される。
+
+プロセス終了時は atexit で残りを送り切り（最大 FLUSH_TIMEOUT_SEC 秒）、ワーカーを停止する。
+
+※ app.py は importlib.reload しないモジュールなので、キューとワーカーは Streamlit の再実行・セッションをまたいで共有される。
+"""
+
+import time
+import atexit
+import threading
+from datetime import datetime
+
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+COALESCE_WINDOW_SEC = 3.0   # 同じファイルへの書き込みをまとめる時間
+MAX_ATTEMPTS = 5            # 1回のアップロードの最大試行回数
+FLUSH_TIMEOUT_SEC = 30.0
+
+_cond = threading.Condition()
+_pending = {}   # {file_id: {'path', 'upload', 'due'}}
+_status = {'uploading': None, 'uploaded': 0, 'last_uploaded_at': None, 'last_error': None}
+_worker = None
+_worker_stop = None   # 稼働中のワーカーの停止フラグ（threading.Event）
+
+
+class PermanentUploadError(Exception):
+    """再試行しても成功しない失敗（認証できない等）。upload() が送出すると再試行せずに諦める。"""
+
+
+@retry(
+    retry=retry_if_not_exception_type(PermanentUploadError),
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=wait_exponential(multiplier=1, min=2, max=30),
+    reraise=True
+)
+def _upload_with_retry(upload, local_path, file_id):
+    """リトライ付きアップロード"""
+    return upload(local_path, file_id)
+
+
+def _next_due():
+    """期限の来た予約を1件取り出す（_cond を保持して呼ぶ）。無ければ (None, 次の期限までの秒数)。"""
+    if not _pending:
+        return None, None
+    file_id, entry = min(_pending.items(), key=lambda kv: kv[1]['due'])
+    wait = entry['due'] - time.time()
+    if wait > 0:
+        return None, wait
+    del _pending[file_id]
+    return (file_id, entry), None
+
+
+def _run(stop):
+    while True:
+        with _cond:
+            job, wait = _next_due()
+            while job is None:
+                if stop.is_set():
+                    return
+                _cond.wait(wait)
+                job, wait = _next_due()
+            file_id, entry = job
+            _status['uploading'] = file_id
+        error = None
+        try:
+            _upload_with_retry(entry['upload'], entry['path'], file_id)
+            print(f"[upload_queue] ✅ {entry['path']} → Drive ({file_id})")
+        except Exception as e:
+            error = f"{entry['path']}: {e}"
+            print(f"[upload_queue] ERROR: アップロードを諦めます: {error}")
+        with _cond:
+            _status['uploading'] = None
+            if error:
+                _status['last_error'] = error
+            else:
+                _status['uploaded'] += 1
+                _status['last_uploaded_at'] = datetime.now()
+                _status['last_error'] = None
+            _cond.notify_all()
+
+
+def enqueue(local_path, file_id, upload):
+    """
+    アップロードを予約する（すぐに戻る）。
+    同じ file_id の予約が残っていれば期限はそのままでパスだけ差し替える。
+
+    Args:
+        local_path (str): アップロードするローカルファイル
+        file_id (str): 上書き先の Drive ファイルID
+        upload (callable): upload(local_path, file_id) 実際のアップロード。失敗時は例外を送出すること
+                           （再試行しても無駄な失敗は PermanentUploadError）
+    """
+    global _worker, _worker_stop
+    with _cond:
+        entry = _pending.get(file_id)
+        if entry is None:
+            _pending[file_id] = {'path': local_path, 'upload': upload, 'due': time.time() + COALESCE_WINDOW_SEC}
+        else:
+            entry['path'] = local_path
+            entry['upload'] = upload
+        if _worker is None or not _worker.is_alive():
+            _worker_stop = threading.Event()
+            _worker = threading.Thread(target=_run, args=(_worker_stop,), name='upload_queue', daemon=True)
+            _worker.start()
+        _cond.notify_all()
+
+
+def flush(timeout=FLUSH_TIMEOUT_SEC):
+    """
+    予約済みのアップロードを期限を待たずに送り、完了まで待つ。
+
+    Returns:
+        bool: timeout 以内にすべて送り終えた場合 True
+    """
+    deadline = time.time() + timeout
+    with _cond:
+        for entry in _pending.values():
+            entry['due'] = 0
+        _cond.notify_all()
+        while _pending or _status['uploading']:
+            remaining = deadline - time.time()
+            if remaining <= 0 or _worker is None or not _worker.is_alive():
+                return False
+            _cond.wait(remaining)
+    return True
+
+
+def shutdown(timeout=FLUSH_TIMEOUT_SEC):
+    """
+    ワーカーを停止して終了を待つ（送信中のアップロードは完了させる。予約は残す）。
+
+    Returns:
+        bool: timeout 以内にワーカーが終了した場合 True
+    """
+    global _worker, _worker_stop
+    with _cond:
+        worker, stop = _worker, _worker_stop
+        _worker = _worker_stop = None
+        if stop is not None:
+            stop.set()
+        _cond.notify_all()
+    if worker is None:
+        return True
+    worker.join(timeout)
+    return not worker.is_alive()
+
+
+def _flush_at_exit():
+    flush()
+    shutdown()
+
+
+atexit.register(_flush_at_exit)
+
+
+def status():
+    """
+    UI 表示用の状態。
+
+    Returns:
+        dict: {'pending', 'uploading', 'uploaded', 'last_uploaded_at', 'last_error'}
+    """
+    with _cond:
+        state = dict(_status)
+        state['pending'] = len(_pending) + (1 if _status['uploading'] else 0)
+    return state
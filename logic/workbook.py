@@ -0,0 +1,128 @@
+"""
+workbook.py - メニュー.xlsx のパース結果キャッシュ
+
+同じExcelバイナリを各モジュールがそれぞれ pd.read_excel / pd.ExcelFile で
+開き直していたため、openpyxl のパースが1回のページ表示で何度も走っていた。
+本モジュールはコンテンツハッシュ(sha256)単位で1つの ParsedWorkbook を保持し、
+各シートは初回アクセス時に1度だけセル値を読み出す。
+header / usecols 違いのDataFrameは、読み出し済みのセル値から
+pd.read_excel と同じ TextParser で組み立てるため、結果は read_excel と同一になる。
+
+※ app.py は importlib.reload しないモジュールなので、キャッシュは
+   Streamlit の再実行をまたいで保持される。
+"""
+
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from logic import perf
+
+# 保持するワークブック数（最新版 + 直前版程度で十分）
+MAX_CACHED_WORKBOOKS = 2
+
+_cache = OrderedDict()  # {content_hash: ParsedWorkbook}
+_cache_lock = threading.Lock()
+
+
+def content_hash(excel_bytes):
+    """Excelバイナリのコンテンツハッシュ (sha256 hex) を返す。"""
+    return hashlib.sha256(excel_bytes).hexdigest()
+
+
+def column_index(col_letter):
+    """Excelの列名をゼロ始まりのインデックスに変換する (A=0, C=2, AK=36)。"""
+    idx = 0
+    for ch in col_letter.strip().upper():
+        idx = idx * 26 + (ord(ch) - ord('A') + 1)
+    return idx - 1
+
+
+def _normalize_usecols(usecols):
+    """usecols="C,AK" 形式をインデックスのリストに変換する。それ以外はそのまま。"""
+    if isinstance(usecols, str):
+        return [column_index(c) for c in usecols.split(',') if c.strip()]
+    return usecols
+
+
+class ParsedWorkbook:
+    """
+    1つのExcelバイナリに対するパース結果。
+
+    Attributes:
+        content_hash (str): バイナリの sha256
+        sheet_names (list): シート名一覧（Excel内の並び順）
+    """
+
+    def __init__(self, excel_bytes, digest=None):
+        self.content_hash = digest or content_hash(excel_bytes)
+        self._xls = pd.ExcelFile(io.BytesIO(excel_bytes))
+        self.sheet_names = list(self._xls.sheet_names)
+        self._rows = {}   # {sheet_name: list[list]} セル値（空セルは ''）
+        self._views = {}  # {(sheet_name, header, usecols): DataFrame}
+        self._lock = threading.Lock()
+
+    def _sheet_rows(self, sheet_name):
+        rows = self._rows.get(sheet_name)
+        if rows is None:
+            # 型推論させずにセル値をそのまま取得し、空セルは read_excel 内部と同じ '' に戻す
+            with perf.timed('read_excel'):
+                raw = pd.read_excel(self._xls, sheet_name=sheet_name, header=None, dtype=object)
+            rows = raw.astype(object).where(raw.notna(), '').values.tolist()
+            self._rows[sheet_name] = rows
+            print(f"[workbook] シート '{sheet_name}' をパース ({len(rows)}行)")
+        return rows
+
+    def sheet(self, sheet_name, header=0, usecols=None):
+        """
+        pd.read_excel(..., sheet_name=sheet_name, header=header, usecols=usecols) 相当の
+        DataFrameを返す。呼び出し側での変更がキャッシュに波及しないようコピーを返す。
+
+        Raises:
+            ValueError: シートが存在しない場合
+        """
+        if sheet_name not in self.sheet_names:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+        cols = _normalize_usecols(usecols)
+        key = (sheet_name, header, tuple(cols) if cols is not None else None)
+        with self._lock:
+            df = self._views.get(key)
+            if df is None:
+                rows = self._sheet_rows(sheet_name)
+                if rows:
+                    df = TextParser(rows, header=header, usecols=cols).read()
+                else:
+                    df = pd.DataFrame()
+                self._views[key] = df
+        return df.copy()
+
+
+def get_workbook(excel_bytes):
+    """
+    コンテンツハッシュ単位でキャッシュされた ParsedWorkbook を返す。
+
+    Args:
+        excel_bytes (bytes): メニュー.xlsx のバイナリデータ
+
+    Returns:
+        ParsedWorkbook
+    """
+    digest = content_hash(excel_bytes)
+    with _cache_lock:
+        wb = _cache.get(digest)
+        if wb is not None:
+            _cache.move_to_end(digest)
+            return wb
+
+    wb = ParsedWorkbook(excel_bytes, digest)
+    with _cache_lock:
+        wb = _cache.setdefault(digest, wb)
+        _cache.move_to_end(digest)
+        while len(_cache) > MAX_CACHED_WORKBOOKS:
+            _cache.popitem(last=False)
+    return wb
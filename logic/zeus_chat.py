@@ -19,12 +19,16 @@ except ImportError:
     logging.warning("google-genai library not found. Chat features will be disabled, but search logic is available.")
 import pandas as pd
 
+from logic import history_store, perf
+from logic.inventory import normalize_text
+from logic.master_loader import load_master_json, load_master_columns
+from logic.process_times import get_process_table, unit_times
+
 OUTPUT_VERSION = "2026-02-15 v2 (Detailed Process Times)"
 
 logger = logging.getLogger(__name__)
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
-HISTORY_PATH = os.path.join(DATA_DIR, 'history_summary.json')
 
 def load_event_master():
     """Zeus監視用のイベントマスタを読み込む"""
@@ -44,36 +48,31 @@ def load_history_stats():
     【最終仕様】起点日を type:"initial" から動的取得し、全ログ通算のペースを算出。
     
     仕様:
-      起点 = history_summary.json 内の type:"initial" レコードの date
+      起点 = 履歴ストア内の type:"initial" レコードの date
       ペース = (最新total_current - initial.total_current) / (今日 - 起点日)
     
     Returns:
         dict: {pace, last_count, last_date, is_long_term,
                origin_date, origin_count, origin_details} or None
     """
-    if not os.path.exists(HISTORY_PATH):
+    if not history_store.exists():
         return None
     
     try:
-        with open(HISTORY_PATH, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-            
+        # 直近ペースの算出には最新2件だけあればよい（全履歴は読まない）
+        history = history_store.read_latest(2)
         if not history:
             return None
 
         from datetime import datetime
 
         # ★ 仕様: type="initial" から起点データを動的取得（ハードコード厳禁）
-        initial_entry = None
-        for h in history:
-            if h.get('type') == 'initial':
-                initial_entry = h
-                break
+        initial_entry = history_store.read_initial()
         
         if not initial_entry:
             # initial が無い場合、最古のエントリをフォールバックとする
             logger.warning("type='initial' が見つかりません。最古のエントリを起点とします。")
-            initial_entry = history[0]
+            initial_entry = history_store.read_earliest(1)[0]
 
         # 起点日のパース
         origin_ts = initial_entry.get('timestamp') or initial_entry.get('date')
@@ -87,7 +86,7 @@ def load_history_stats():
         origin_count = initial_entry.get('total_current', 0)
         origin_details = initial_entry.get('details', {})
 
-        # 全エントリに _dt を付与
+        # 最新エントリに _dt を付与
         for h in history:
             ts = h.get('timestamp') or h.get('date')
             if not ts:
@@ -151,54 +150,26 @@ def get_daily_achievements():
         import os
         from datetime import datetime, timedelta
 
-        # history_path check (uses global constant)
-        if not os.path.exists(HISTORY_PATH):
-            return "★本日の成果: （履歴データなし）"
-
-        with open(HISTORY_PATH, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-
-        if not history:
+        if not history_store.exists():
             return "★本日の成果: （履歴データなし）"
 
-        # 日付順にソート
-        parsed_history = []
-        for h in history:
-            ts_str = h.get('timestamp') or h.get('date', '')
-            if not ts_str: continue
-            try:
-                # ISOフォーマット対応 (Z除去)
-                dt = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-                h['_dt'] = dt
-                parsed_history.append(h)
-            except:
-                continue
-        
-        parsed_history.sort(key=lambda x: x['_dt'])
-
-        if not parsed_history:
-            return "★本日の成果: （有効な履歴なし）"
-
         # ★ details が空でないログのみ有効とする（古い形式のエントリをスキップ）
-        valid_history = [h for h in parsed_history if h.get('details') and len(h.get('details', {})) > 0]
-        
-        if len(valid_history) < 2:
-            return "★本日の成果: （比較用の詳細データ不足 - details付きエントリが2件以上必要）"
-
         # ★ 仕様: 最新のログを「現在の状態」とする
-        latest = valid_history[-1]
-        latest_date = latest['_dt'].date()
+        latest_list = history_store.read_latest(1, with_details=True)
+        if not latest_list:
+            return "★本日の成果: （有効な履歴なし）"
+        latest = latest_list[0]
+        latest_date = (latest.get('timestamp') or latest.get('date', ''))[:10]
         
-        # 比較対象（昨日以前の最後のログ）を探す
-        base_entry = None
-        for h in reversed(valid_history[:-1]):
-            if h['_dt'].date() < latest_date:
-                base_entry = h
-                break
+        # 比較対象（昨日以前の details 付きの最後のログ）= 最新日の0時時点の状態を復元
+        base_entry = history_store.read_at(latest_date, with_details=True)
         
         # もし昨日以前のログがなければ、記録上の最初のログを基準にする
         if not base_entry:
-            base_entry = valid_history[0]
+            first_two = history_store.read_earliest(2, with_details=True)
+            if len(first_two) < 2:
+                return "★本日の成果: （比較用の詳細データ不足 - details付きエントリが2件以上必要）"
+            base_entry = first_two[0]
             
         latest_details = latest.get('details', {})
         base_details = base_entry.get('details', {})
@@ -209,17 +180,15 @@ def get_daily_achievements():
         # マスタデータをロードして名前解決
         master_map = {}
         try:
-            master_path = os.path.join(DATA_DIR, 'production_master.json')
-            if os.path.exists(master_path):
-                with open(master_path, 'r', encoding='utf-8') as f:
-                    m_data = json.load(f)
-                    for m in m_data:
-                        mid = str(m.get('id', '')).strip()
-                        if mid:
-                            master_map[mid] = {
-                                'name': m.get('name', mid),
-                                'part': m.get('part', '')
-                            }
+            # 名前解決に必要な列 (id, name, part) だけを読む
+            m_df = load_master_columns(['id', 'name', 'part'])
+            for mid_raw, name, part in m_df.itertuples(index=False, name=None):
+                mid = str(mid_raw if pd.notna(mid_raw) else '').strip()
+                if mid:
+                    master_map[mid] = {
+                        'name': name if pd.notna(name) else mid,
+                        'part': part if pd.notna(part) else ''
+                    }
         except:
             pass
         
@@ -265,6 +234,7 @@ def get_daily_achievements():
         return f"★本日の成果: (計算エラー: {e})"
 
 
+@perf.timed('build_system_prompt')
 def build_system_prompt(master_data: list, inventory_df: pd.DataFrame = None, current_event_name: str = None, all_event_names: list = None, user_message: str = None) -> str:
     """
     マスタデータと在庫状況からシステムプロンプトを構築する。
@@ -289,29 +259,19 @@ def build_system_prompt(master_data: list, inventory_df: pd.DataFrame = None, cu
     total_nc_min = 0
     total_manual_min = 0
     
+    # 1個あたりの工程時間はマスタ1版につき1度だけ計算した表から引く
+    process_table = get_process_table(master_data)
+
     if master_data:
         for item in master_data:
             nc = item.get("process", {}).get("nc", {})
-            nc_unit = (
-                nc.get("front_rough_min", 0)
-                + nc.get("front_finish_min", 0)
-                + nc.get("back_rough_min", 0)
-                + nc.get("back_finish_min", 0)
-            )
             prep = item.get("process", {}).get("prep", {})
             assembly = item.get("process", {}).get("assembly", {})
             manual = item.get("process", {}).get("manual", {})
 
-            manual_unit = (
-                prep.get("unit_min", 0) # setupは無視
-                + assembly.get("cut_off_min", 0)
-                + assembly.get("bonding_min", 0)
-                + manual.get("fitting_min", 0)
-                + manual.get("machine_work_min", 0)
-                + manual.get("sanding_min", 0)
-                + manual.get("assembly_min", 0)
-            )
-            all_unit = nc_unit + manual_unit # 乾燥除く
+            # manual_unit は setup を無視、all_unit は乾燥除く
+            times = process_table.row(item)
+            nc_unit, manual_unit, all_unit = times['nc_min'], times['manual_min'], times['total_min']
 
             reqs = item.get("requirements", {})
             
@@ -357,7 +317,7 @@ def build_system_prompt(master_data: list, inventory_df: pd.DataFrame = None, cu
                 f"(切断:{assembly.get('cut_off_min', 0)} / 接着:{assembly.get('bonding_min', 0)}) / "
                 f"    手加工合計: {manual_unit - (prep.get('unit_min',0)+assembly.get('cut_off_min',0)+assembly.get('bonding_min',0))} "
                 f"(準備:{prep.get('unit_min', 0)} / 嵌合:{manual.get('fitting_min', 0)} / 機械:{manual.get('machine_work_min', 0)} / 研磨:{manual.get('sanding_min', 0)} / 組立:{manual.get('assembly_min', 0)}) \n"
-                f"  ⏱ 全工程合計(乾燥除く): {all_unit}分"
+                f"  ⏱ 全工程合計(乾燥除く): {all_unit}分 / 乾燥: {times['drying_hr']}時間 / 段取り(ロット毎): {times['setup_min']}分"
             )
             product_lines.append(line)
 
@@ -403,17 +363,7 @@ def build_system_prompt(master_data: list, inventory_df: pd.DataFrame = None, cu
             man_ts = 0
             
             if master_item:
-                # Calculate times
-                proc = master_item.get('process', {})
-                n = proc.get('nc', {})
-                nc_ts = (n.get('front_rough_min', 0) + n.get('front_finish_min', 0) + 
-                         n.get('back_rough_min', 0) + n.get('back_finish_min', 0))
-                
-                p = proc.get('prep', {})
-                a = proc.get('assembly', {})
-                m = proc.get('manual', {})
-                man_ts = (p.get('unit_min', 0) + a.get('cut_off_min', 0) + a.get('bonding_min', 0) +
-                          m.get('fitting_min', 0) + m.get('machine_work_min', 0) + m.get('sanding_min', 0) + m.get('assembly_min', 0))
+                nc_ts, man_ts, _ = process_table.unit_times(master_item)
 
             body = row.get("本体", 0)
             sheath = row.get("鞘", 0)
@@ -534,7 +484,7 @@ def build_system_prompt(master_data: list, inventory_df: pd.DataFrame = None, cu
     if user_message:
         found_items = search_products_by_query(master_data, user_message)
         if found_items:
-            search_context = build_search_context(found_items)
+            search_context = build_search_context(found_items, process_table)
             print(f"--- [Zeus Search] Found {len(found_items)} items for query ---")
 
     # --- 本日の成果 ---
@@ -697,8 +647,8 @@ def search_products_by_query(master_data, query):
     if not query or not master_data:
         return []
     
-    # クエリの前処理 (スペース除去、全角半角統一)
-    normalized_query = query.lower().replace("　", " ").replace(" ", "")
+    # クエリの前処理 (空白除去、全角半角・大文字小文字統一。在庫の join_key と同じ正規化)
+    normalized_query = normalize_text(query)
     
     hits = []
     
@@ -709,14 +659,10 @@ def search_products_by_query(master_data, query):
         return []
     
     for item in master_data:
-        # マスタ側のデータも正規化
-        raw_name = item.get('name', '')
-        raw_part = item.get('part', '')
-        raw_cat = item.get('category', '')
-        
-        norm_name = raw_name.lower().replace("　", "").replace(" ", "")
-        norm_part = raw_part.lower().replace("　", "").replace(" ", "")
-        norm_cat = raw_cat.lower().replace("　", "").replace(" ", "")
+        # マスタ側のデータも正規化（normalize_text はメモ化されているので毎回のクエリでも安価）
+        norm_name = normalize_text(item.get('name', ''))
+        norm_part = normalize_text(item.get('part', ''))
+        norm_cat = normalize_text(item.get('category', ''))
         
         is_hit = False
         
@@ -743,11 +689,12 @@ def search_products_by_query(master_data, query):
 
     return hits
 
-def build_search_context(items):
+def build_search_context(items, process_table=None):
     """
     検索ヒット商品群から、Zeus用のコンテキストテキストを生成する。
     合算値と内訳を見やすく整形する。
-    また、各商品の加工時間（NC、手作業）も計算して付与する。
+    また、各商品の加工時間（NC、手作業）も付与する。
+    process_table（マスタの工程時間テーブル）が渡された場合はそこから引く。
     """
     if not items:
         return ""
@@ -766,29 +713,11 @@ def build_search_context(items):
     context += "  - 内訳(詳細スペック含む):\n"
     
     for item in items:
-        # 工数計算
-        proc = item.get('process', {})
-        nc = proc.get('nc', {})
-        prep = proc.get('prep', {})
-        assembly = proc.get('assembly', {})
-        manual = proc.get('manual', {})
-
-        nc_total = (
-            nc.get('front_rough_min', 0) + 
-            nc.get('front_finish_min', 0) + 
-            nc.get('back_rough_min', 0) + 
-            nc.get('back_finish_min', 0)
-        )
-        
-        manual_total = (
-            prep.get('unit_min', 0) + 
-            assembly.get('cut_off_min', 0) + 
-            assembly.get('bonding_min', 0) + 
-            manual.get('fitting_min', 0) + 
-            manual.get('machine_work_min', 0) + 
-            manual.get('sanding_min', 0) + 
-            manual.get('assembly_min', 0)
-        )
+        # 工数
+        if process_table is not None:
+            nc_total, manual_total, _ = process_table.unit_times(item)
+        else:
+            nc_total, manual_total, _ = unit_times(item)
 
         context += (
             f"    ・{item.get('name')} ({item.get('part')}): "
@@ -879,9 +808,6 @@ class InitialStockAnalyzer:
     初期在庫データを分析し、戦略的工数計算を行うクラス。
     """
     def __init__(self):
-        self.history_path = HISTORY_PATH
-        # master_loader.py と同じパス構成を想定
-        self.master_path = os.path.join(DATA_DIR, 'production_master.json')
         self.initial_data = None
         self.master_data = None
         self.analysis_results = []
@@ -889,23 +815,14 @@ class InitialStockAnalyzer:
 
     def load_data(self):
         """データ読み込み"""
-        # 1. Master Data
-        if os.path.exists(self.master_path):
-            with open(self.master_path, 'r', encoding='utf-8') as f:
-                self.master_data = json.load(f)
-        else:
+        # 1. Master Data（列指向ストア → JSON の順に読む）
+        self.master_data = load_master_json()
+        if not self.master_data:
             logger.error("Master data not found.")
             return False
 
-        # 2. Initial History
-        if os.path.exists(self.history_path):
-            with open(self.history_path, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-                # type="initial" を探す
-                for h in history:
-                    if h.get('type') == 'initial':
-                        self.initial_data = h
-                        break
+        # 2. Initial History（type="initial" は履歴ストアの最後の initial が有効）
+        self.initial_data = history_store.read_initial()
         
         if not self.initial_data:
             logger.error("Initial stock data not found in history.")
@@ -926,6 +843,7 @@ class InitialStockAnalyzer:
         total_shortage_count = 0
         total_nc_min = 0
         total_manual_min = 0
+        process_table = get_process_table(self.master_data)
 
         for item in self.master_data:
             item_id = str(item.get('id', '')).strip()
@@ -953,30 +871,9 @@ class InitialStockAnalyzer:
             proc_manual = item.get('process', {}).get('manual', {})
 
             if shortage > 0:
-                # NC時間 (粗+仕上 * 表裏)
-                nc_unit = (
-                    proc_nc.get('front_rough_min', 0) + 
-                    proc_nc.get('front_finish_min', 0) + 
-                    proc_nc.get('back_rough_min', 0) + 
-                    proc_nc.get('back_finish_min', 0)
-                )
+                # NC時間 (粗+仕上 * 表裏) / 手作業時間 (準備+組付+手加工、乾燥・段取りは除く)
+                nc_unit, manual_unit, _ = process_table.unit_times(item)
                 nc_time = shortage * nc_unit
-                
-                # 手作業時間 (準備+組付+手加工)
-                # ※乾燥時間は除く
-                
-                # Setupはロット単位だが、ここでは簡易的に個数比例とするか、無視するか。
-                # 「NC時間と手作業時間の合計」なので、直感的には個数比例部分を積算。
-                # unit_min (単体) + ...
-                manual_unit = (
-                    proc_prep.get('unit_min', 0) +
-                    proc_assembly.get('cut_off_min', 0) +
-                    proc_assembly.get('bonding_min', 0) +
-                    proc_manual.get('fitting_min', 0) +
-                    proc_manual.get('machine_work_min', 0) +
-                    proc_manual.get('sanding_min', 0) +
-                    proc_manual.get('assembly_min', 0)
-                )
                 manual_time = shortage * manual_unit
 
             results.append({
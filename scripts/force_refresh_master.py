@@ -64,7 +64,10 @@ def main():
         print("WARNING: SQL bytes are None. Event merging will be skipped.")
 
     # This function now saves to JSON automatically and merges events if bytes provided
-    master_loader.convert_dataframe_to_json(master_df, force=True, excel_bytes=excel_bytes)
+    # force=True: ワークブック未変更でも再変換し、メモ化スタンプも更新する
+    # 下の検証は JSON エクスポートを読むため、既定では無効の JSON 出力をこのスクリプトでは有効にする
+    master_loader.EXPORT_JSON = True
+    master_loader.refresh_master(master_df, excel_bytes, force=True)
     
     # Load and verify
     print("--- 3. Verifying Output ---")
@@ -0,0 +1,17 @@
+"""
+conftest.py - テスト全体の共通設定
+
+計測 (logic.perf) の記録がリポジトリの data/perf_metrics.jsonl に書き出されないよう、
+logic をインポートする前に出力先をテスト用の一時ディレクトリへ向ける。
+"""
+
+import os
+import shutil
+import tempfile
+
+_PERF_DIR = tempfile.mkdtemp(prefix='atlas_perf_')
+os.environ['ATLAS_PERF_METRICS_PATH'] = os.path.join(_PERF_DIR, 'perf_metrics.jsonl')
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_PERF_DIR, ignore_errors=True)
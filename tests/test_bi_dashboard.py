@@ -16,7 +16,10 @@ from logic.bi_dashboard import (
     calc_today_tasks,
     calc_material_alerts,
     calc_dev_slot,
+    calc_burndown_hours,
 )
+from logic import bi_dashboard, history_store
+from logic.process_times import unit_times
 
 # =========================================
 # テストデータ
@@ -222,6 +225,13 @@ class TestCalcTodayTasks:
         assert result['recommended_nc'] is None
         assert result['recommended_manual'] is not None
 
+    def test_integral_times_are_shown_as_int(self):
+        result = calc_today_tasks(MOCK_MASTER_DATA, current_hour=21)
+        manual = result['recommended_manual']
+        assert type(manual['manual_min']) is int
+        assert f"約{manual['manual_min']}分/個" in result['message']
+        assert ".0分" not in result['message']
+
     def test_all_done(self):
         done_data = [dict(d, remaining=0) for d in MOCK_MASTER_DATA]
         result = calc_today_tasks(done_data, current_hour=14)
@@ -275,3 +285,54 @@ class TestCalcDevSlot:
         now = datetime(2026, 2, 23)
         result = calc_dev_slot(low_progress_data, event_master=MOCK_EVENT_MASTER, now=now)
         assert result['is_ok'] is False
+
+
+class TestCalcBurndownHours:
+    def test_actual_matches_full_resum(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(history_store, 'HISTORY_PATH', str(tmp_path / "history_summary.jsonl"))
+        monkeypatch.setattr(history_store, 'LEGACY_HISTORY_PATH', str(tmp_path / "history_summary.json"))
+        monkeypatch.setattr(bi_dashboard, '_ensure_history_store', lambda: (True, None))
+
+        ids = [item['id'] for item in MOCK_MASTER_DATA]
+        snapshots = []
+        for day in range(1, 6):
+            details = {item_id: {"count": day + i, "target": 10} for i, item_id in enumerate(ids)}
+            snapshots.append({"timestamp": f"2026-03-0{day}T10:00:00", "type": "scan", "details": details})
+            history_store.append_snapshot(snapshots[-1])
+
+        result = calc_burndown_hours(MOCK_MASTER_DATA, event_master=MOCK_EVENT_MASTER)
+
+        times = {item['id']: unit_times(item)[2] for item in MOCK_MASTER_DATA}
+        expected = [round(sum(max(0, d['target'] - d['count']) * times[k]
+                              for k, d in s['details'].items()) / 60, 1) for s in snapshots]
+        assert [p['date'] for p in result['actual']] == [s['timestamp'][:10] for s in snapshots]
+        assert [p['remaining_hours'] for p in result['actual']] == expected
+
+
+class TestProjectRemaining:
+    def test_matches_day_by_day_subtraction(self):
+        capacity = [3.3, 0, 2.7, 8, 8, 1.1]
+        remaining, days = bi_dashboard.project_remaining(12.5, capacity)
+
+        left, expected, n = 12.5, [], 0
+        for cap in capacity:
+            if left <= 0:
+                break
+            left = max(0, left - cap)
+            expected.append(left)
+            n += 1
+        assert remaining[0, :n].tolist() == expected
+        assert days.tolist() == [n]
+
+    def test_batch_scenarios_and_unfinished(self):
+        remaining, days = bi_dashboard.project_remaining(20, [[1, 1, 1], [10, 10, 10]])
+        assert days.tolist() == [3, 2]
+        assert remaining[0].tolist() == [19, 18, 17]
+        assert bi_dashboard.project_remaining(0, [1, 2])[1].tolist() == [0]
+
+    def test_capacity_series_prefers_calendar(self):
+        dates, capacity, weekend = bi_dashboard.capacity_series(
+            datetime(2026, 3, 5), {"2026-03-07": 2.5}, days=3)
+        assert dates == ["2026-03-06", "2026-03-07", "2026-03-08"]
+        assert capacity.tolist() == [8, 2.5, 8]
+        assert weekend.tolist() == [False, True, True]
@@ -0,0 +1,184 @@
+"""
+test_calendar_agent.py - calendar_agent の空き時間算出・並列取得の単体テスト
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import calendar_agent
+from logic.calendar_agent import calculate_free_slots, fetch_google_tasks
+
+JST = timezone(timedelta(hours=9))
+
+
+def _at(day_offset, hour, minute=0):
+    today = datetime.now(JST).date() + timedelta(days=day_offset)
+    return datetime(today.year, today.month, today.day, hour, minute, tzinfo=JST).isoformat()
+
+
+def _timed(summary, start, end):
+    return {'summary': summary, 'start': start, 'end': end, 'all_day': False}
+
+
+class TestCalculateFreeSlots:
+
+    def test_empty_days_get_full_work_window(self):
+        slots = calculate_free_slots([], days=3)
+        assert [s['date'] for s in slots] == [
+            (datetime.now(JST).date() + timedelta(days=k)).isoformat() for k in range(3)]
+        for s in slots:
+            assert s['free_blocks'] == [{'start': '09:00', 'end': '22:00', 'hours': 13.0}]
+            assert s['total_free_hours'] == 13.0
+        # 複製したブロックは日ごとに別オブジェクト
+        assert slots[0]['free_blocks'][0] is not slots[1]['free_blocks'][0]
+
+    def test_overlapping_events_are_merged(self):
+        events = [
+            _timed('A', _at(0, 10), _at(0, 12)),
+            _timed('B', _at(0, 11), _at(0, 13, 30)),
+            _timed('C', _at(0, 20), _at(0, 23)),
+        ]
+        day = calculate_free_slots(events, days=1)[0]
+        assert day['free_blocks'] == [
+            {'start': '09:00', 'end': '10:00', 'hours': 1.0},
+            {'start': '13:30', 'end': '20:00', 'hours': 6.5},
+        ]
+        assert day['total_free_hours'] == 7.5
+
+    def test_event_crossing_midnight_is_split(self):
+        events = [_timed('夜間乾燥', _at(0, 21), _at(1, 10))]
+        today, tomorrow = calculate_free_slots(events, days=2)
+        assert today['events'] == [{'summary': '夜間乾燥', 'start': '21:00', 'end': '24:00'}]
+        assert tomorrow['events'] == [{'summary': '夜間乾燥', 'start': '00:00', 'end': '10:00'}]
+        assert today['free_blocks'][-1]['end'] == '21:00'
+        assert tomorrow['free_blocks'] == [{'start': '10:00', 'end': '22:00', 'hours': 12.0}]
+
+    def test_multi_day_all_day_event_blocks_each_day(self):
+        start = datetime.now(JST).date() + timedelta(days=1)
+        events = [{'summary': '出張', 'start': start.isoformat(),
+                   'end': (start + timedelta(days=2)).isoformat(), 'all_day': True}]
+        slots = calculate_free_slots(events, days=4)
+        assert [s['is_blocked'] for s in slots] == [False, True, True, False]
+        assert slots[1]['free_blocks'] == [] and slots[1]['total_free_hours'] == 0
+        assert slots[2]['events'] == [{'summary': '出張', 'start': '終日', 'end': '終日'}]
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeTasksService:
+    """tasklists().list() / tasks().list() だけを持つ Tasks API の代役（リスト 'broken' は失敗する）。"""
+
+    def __init__(self, lists, delay=0.02):
+        self.lists = lists  # {tasklist_id: [task, ...]}
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def tasklists(self):
+        items = [{'id': tl_id, 'title': f'リスト{tl_id}'} for tl_id in self.lists]
+
+        class _Lists:
+            def list(self, **params):
+                return _Request(lambda: {'items': items})
+        return _Lists()
+
+    def tasks(self):
+        fake = self
+
+        class _Tasks:
+            def list(self, tasklist, **params):
+                def run():
+                    with fake._lock:
+                        fake.active += 1
+                        fake.peak = max(fake.peak, fake.active)
+                    try:
+                        time.sleep(fake.delay)
+                        if tasklist == 'broken':
+                            raise RuntimeError('boom')
+                        return {'items': fake.lists[tasklist]}
+                    finally:
+                        with fake._lock:
+                            fake.active -= 1
+                return _Request(run)
+        return _Tasks()
+
+
+class TestConcurrentFetch:
+
+    def test_fan_out_keeps_order_and_isolates_errors(self):
+        def work(n):
+            if n == 3:
+                raise ValueError(n)
+            return n * 10
+
+        results = calendar_agent._fan_out(work, list(range(6)), max_workers=3)
+        assert [r for r, _ in results] == [0, 10, 20, None, 40, 50]
+        assert isinstance(results[3][1], ValueError)
+
+    def test_tasks_are_fetched_in_parallel_within_limit(self):
+        due = (datetime.now(JST) + timedelta(days=2)).strftime('%Y-%m-%dT00:00:00.000Z')
+        lists = {str(i): [{'title': f'タスク{i}', 'due': due}] for i in range(8)}
+        lists['broken'] = []
+        fake = FakeTasksService(lists)
+
+        tasks = fetch_google_tasks(None, service=fake, max_workers=3)
+
+        assert sorted(t['title'] for t in tasks) == [f'タスク{i}' for i in range(8)]
+        assert 1 < fake.peak <= 3
+
+    def test_service_is_shared_across_workers_and_runs(self):
+        built = []
+
+        class Creds:
+            def __init__(self, refresh_token):
+                self.client_id = 'client'
+                self.refresh_token = refresh_token
+
+        def fake_build(creds, api, version):
+            built.append((api, version, creds.refresh_token))
+            return object()
+
+        with patch.object(calendar_agent, '_services', {}), \
+             patch.object(calendar_agent.drive_client, 'build_service', side_effect=fake_build):
+            # run() ごとに token.json から読み直した別オブジェクトでも、同じ認証情報なら再利用する
+            for _ in range(2):
+                creds = Creds('refresh-1')
+                services = calendar_agent._fan_out(
+                    lambda _: calendar_agent._shared_service('tasks', 'v1', creds),
+                    list(range(8)), max_workers=4)
+                assert len({id(s) for s, _ in services}) == 1
+            assert built == [('tasks', 'v1', 'refresh-1')]
+
+            # 認証情報が変わった場合は構築し直す
+            calendar_agent._shared_service('tasks', 'v1', Creds('refresh-2'))
+            assert built[-1] == ('tasks', 'v1', 'refresh-2')
+
+
+class TestNonInteractiveAuth:
+
+    def test_background_run_fails_fast_without_browser_auth(self):
+        # credentials.json だけがある状態（token.json が無い・無効）
+        exists = lambda path: path.endswith('credentials.json')
+        with patch.object(calendar_agent.os.path, 'exists', side_effect=exists), \
+             patch('google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file',
+                   side_effect=AssertionError('ブラウザ認証は行わない')) as flow, \
+             patch.dict(sys.modules, {'streamlit': None}):
+            assert calendar_agent._get_credentials(interactive=False) is None
+            with pytest.raises(RuntimeError, match='認証'):
+                calendar_agent.run(output_local=False, output_drive=False, interactive=False)
+        flow.assert_not_called()
@@ -0,0 +1,96 @@
+"""
+test_calendar_scheduler.py - カレンダーエージェントのバックグラウンド更新の単体テスト
+"""
+
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import calendar_scheduler
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "atlas_integrated_data.json")
+    with patch.object(calendar_scheduler, 'SNAPSHOT_PATH', path):
+        yield path
+
+
+def _fake_run(path, summary):
+    def run(output_local=True, output_drive=True, interactive=True):
+        data = {'summary': summary}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        return data
+    return run
+
+
+class TestSnapshot:
+
+    def test_missing_snapshot(self, snapshot_path):
+        assert calendar_scheduler.read_snapshot() == ({}, None)
+        assert calendar_scheduler.snapshot_version() is None
+        assert calendar_scheduler.format_age(None) == "未取得"
+
+    def test_refresh_writes_snapshot_and_reader_sees_it(self, snapshot_path):
+        with patch.object(calendar_scheduler.calendar_agent, 'run', _fake_run(snapshot_path, 1)):
+            assert calendar_scheduler.refresh_now()
+
+        data, age = calendar_scheduler.read_snapshot()
+        assert data == {'summary': 1} and 0 <= age < 60
+        # ファイルが変わらない限り同じオブジェクトを返す
+        assert calendar_scheduler.read_snapshot()[0] is data
+        assert calendar_scheduler.status()['last_error'] is None
+        st = os.stat(snapshot_path)
+        assert calendar_scheduler.snapshot_version() == (st.st_mtime_ns, st.st_size)
+
+    def test_failed_refresh_keeps_last_good_snapshot(self, snapshot_path):
+        with patch.object(calendar_scheduler.calendar_agent, 'run', _fake_run(snapshot_path, 1)):
+            calendar_scheduler.refresh_now()
+        with patch.object(calendar_scheduler.calendar_agent, 'run', side_effect=RuntimeError('oauth')):
+            assert not calendar_scheduler.refresh_now()
+
+        assert calendar_scheduler.read_snapshot()[0] == {'summary': 1}
+        assert calendar_scheduler.status()['last_error'] == 'oauth'
+
+    def test_age_is_formatted(self):
+        assert calendar_scheduler.format_age(30) == "1分以内"
+        assert calendar_scheduler.format_age(5 * 60) == "5分前"
+        assert calendar_scheduler.format_age(3 * 3600) == "3時間前"
+        assert calendar_scheduler.format_age(72 * 3600) == "3日前"
+
+
+class TestWorker:
+
+    def test_start_runs_single_thread_that_refreshes_stale_snapshot(self, snapshot_path):
+        calls = []
+
+        def run(output_local=True, output_drive=True, interactive=True):
+            calls.append(time.time())
+            return _fake_run(snapshot_path, len(calls))()
+
+        with patch.object(calendar_scheduler.calendar_agent, 'run', run), \
+             patch.object(calendar_scheduler, '_thread', None):
+            assert calendar_scheduler.start(interval=3600)
+            assert not calendar_scheduler.start(interval=3600)
+            for _ in range(100):
+                if calendar_scheduler.read_snapshot()[1] is not None:
+                    break
+                time.sleep(0.02)
+            assert calendar_scheduler.read_snapshot()[0] == {'summary': 1}
+
+            # スナップショットが新しいうちは、要求が無ければ再実行しない
+            time.sleep(0.1)
+            assert len(calls) == 1
+            calendar_scheduler.request_refresh()
+            for _ in range(100):
+                if len(calls) == 2:
+                    break
+                time.sleep(0.02)
+            assert len(calls) == 2
@@ -0,0 +1,230 @@
+"""
+test_calendar_store.py - Googleカレンダー差分同期 (calendar_store) の単体テスト
+
+Calendar API の代わりにメモリ上の FakeCalendarService を使う。
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import calendar_store
+from logic.calendar_agent import fetch_calendar_events
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeCalendarService:
+    """
+    calendarList().list() / events().list() だけを持つ Calendar API の代役。
+    変更履歴に連番を振り、syncToken はその連番を表す。
+    """
+
+    def __init__(self, calendars, page_size=2):
+        self.calendars = calendars
+        self.page_size = page_size
+        self.store = {cal_id: {} for cal_id in calendars}
+        self.log = []  # [(seq, cal_id, event)]
+        self.expired_tokens = set()
+        self.calls = []
+        self.calendar_list_calls = []
+
+    def put(self, cal_id, event_id, summary, start, end):
+        event = {'id': event_id, 'status': 'confirmed', 'summary': summary,
+                 'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()}}
+        self.store[cal_id][event_id] = event
+        self.log.append((len(self.log) + 1, cal_id, event))
+
+    def delete(self, cal_id, event_id):
+        self.store[cal_id].pop(event_id)
+        self.log.append((len(self.log) + 1, cal_id, {'id': event_id, 'status': 'cancelled'}))
+
+    def calendarList(self):
+        return self
+
+    def list(self, pageToken=None):
+        self.calendar_list_calls.append(pageToken)
+        items = [{'id': cal_id, 'summary': summary} for cal_id, summary in self.calendars.items()]
+        offset = int(pageToken or 0)
+        result = {'items': items[offset:offset + self.page_size]}
+        if offset + self.page_size < len(items):
+            result['nextPageToken'] = str(offset + self.page_size)
+        return _Request(lambda: result)
+
+    def events(self):
+        return _FakeEvents(self)
+
+
+class _FakeEvents:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def list(self, **params):
+        fake = self.fake
+        fake.calls.append(params)
+        cal_id = params['calendarId']
+        token = params.get('syncToken')
+        if token:
+            assert 'timeMin' not in params and 'orderBy' not in params
+            if token in fake.expired_tokens:
+                def gone():
+                    raise HttpError(httplib2.Response({'status': 410}), b'{"error": "fullSyncRequired"}')
+                return _Request(gone)
+            since = int(token)
+            items = {}
+            for seq, log_cal, event in fake.log:
+                if log_cal == cal_id and seq > since:
+                    items[event['id']] = event
+            items = list(items.values())
+        else:
+            items = list(fake.store[cal_id].values())
+
+        offset = int(params.get('pageToken') or 0)
+        page = items[offset:offset + fake.page_size]
+        result = {'items': page}
+        if offset + fake.page_size < len(items):
+            result['nextPageToken'] = str(offset + fake.page_size)
+        else:
+            result['nextSyncToken'] = str(len(fake.log))
+        return _Request(lambda: result)
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "calendar_sync_state.json")
+
+
+@pytest.fixture
+def fake():
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    service = FakeCalendarService({'me@example.com': '個人', 'work': '副業'})
+    for i in range(5):
+        start = now + timedelta(days=i + 1)
+        service.put('me@example.com', f'e{i}', f'予定{i}', start, start + timedelta(hours=1))
+    far = now + timedelta(days=200)
+    service.put('work', 'far', '期間外', far, far + timedelta(hours=1))
+    service.now = now
+    return service
+
+
+class TestFetchCalendarEvents:
+
+    def test_first_sync_pages_through_all_results(self, fake, state_path):
+        events = fetch_calendar_events(None, service=fake, state_path=state_path)
+
+        assert [e['summary'] for e in events] == [f'予定{i}' for i in range(5)]
+        assert all(e['calendar'] == '個人' for e in events)
+        personal_calls = [c for c in fake.calls if c['calendarId'] == 'me@example.com']
+        assert [c.get('pageToken') for c in personal_calls] == [None, '2', '4']
+
+        state = calendar_store.load_state(state_path)
+        assert state['calendars']['me@example.com']['sync_token'] == str(len(fake.log))
+        assert len(state['calendars']['work']['events']) == 1  # 期間外も保持し、読み出しで絞る
+
+    def test_second_sync_fetches_only_changes(self, fake, state_path):
+        fetch_calendar_events(None, service=fake, state_path=state_path)
+        fake.calls.clear()
+
+        start = fake.now + timedelta(days=10)
+        fake.put('me@example.com', 'e1', '予定1(変更)', start, start + timedelta(hours=2))
+        fake.delete('me@example.com', 'e3')
+        events = fetch_calendar_events(None, service=fake, state_path=state_path)
+
+        assert [e['summary'] for e in events] == ['予定0', '予定2', '予定4', '予定1(変更)']
+        call = next(c for c in fake.calls if c['calendarId'] == 'me@example.com')
+        assert call['syncToken'] and call['showDeleted']
+
+    def test_expired_sync_token_falls_back_to_full_sync(self, fake, state_path):
+        fetch_calendar_events(None, service=fake, state_path=state_path)
+        token = calendar_store.load_state(state_path)['calendars']['me@example.com']['sync_token']
+        fake.expired_tokens.add(token)
+        fake.calls.clear()
+
+        events = fetch_calendar_events(None, service=fake, state_path=state_path)
+
+        assert len(events) == 5
+        personal_calls = [c for c in fake.calls if c['calendarId'] == 'me@example.com']
+        assert 'syncToken' in personal_calls[0] and 'timeMin' in personal_calls[1]
+
+    def test_removed_calendar_is_dropped_from_state(self, fake, state_path):
+        fetch_calendar_events(None, service=fake, state_path=state_path)
+        del fake.calendars['work']
+        fetch_calendar_events(None, service=fake, state_path=state_path)
+
+        assert list(calendar_store.load_state(state_path)['calendars']) == ['me@example.com']
+
+    def test_calendar_list_pages_through_all_calendars(self, fake, state_path):
+        fake.calendars['family'] = '家族'
+        fake.store['family'] = {}
+        start = fake.now + timedelta(days=2)
+        fake.put('family', 'f0', '家族の予定', start, start + timedelta(hours=1))
+
+        events = fetch_calendar_events(None, service=fake, state_path=state_path)
+
+        assert fake.calendar_list_calls == [None, '2']
+        assert [e['summary'] for e in events if e['calendar'] == '家族'] == ['家族の予定']
+        assert list(calendar_store.load_state(state_path)['calendars']) == ['me@example.com', 'work', 'family']
+
+
+class TestRecurringEvents:
+
+    def _weekly(self, fake):
+        # 終了日の無い毎週の予定（元の予定のまま返り、API 側では展開されない）
+        start = datetime(2026, 3, 2, 10, 0, tzinfo=calendar_store.JST)
+        fake.store['me@example.com'] = {}
+        fake.log.clear()
+        fake.put('me@example.com', 'weekly', '定例', start, start + timedelta(hours=1))
+        fake.store['me@example.com']['weekly']['recurrence'] = ['RRULE:FREQ=WEEKLY']
+        return start
+
+    def test_recurring_event_is_expanded_only_within_window(self, fake):
+        start = self._weekly(fake)
+        entry, mode = calendar_store.sync_calendar(fake, 'me@example.com', now=start)
+
+        assert mode == 'full' and list(entry['events']) == ['weekly']
+        assert 'singleEvents' not in fake.calls[-1]
+        events = calendar_store.events_in_window(entry, start, start + timedelta(days=28))
+        assert [e['start'] for e in events] == [
+            (start + timedelta(weeks=w)).isoformat() for w in range(4)]
+        assert events[1]['end'] == (start + timedelta(weeks=1, hours=1)).isoformat()
+
+    def test_modified_and_cancelled_instances_replace_occurrences(self, fake):
+        start = self._weekly(fake)
+        entry, _ = calendar_store.sync_calendar(fake, 'me@example.com', now=start)
+
+        second, third = start + timedelta(weeks=1), start + timedelta(weeks=2)
+        fake.put('me@example.com', 'weekly_2', '定例(時間変更)', second + timedelta(hours=3),
+                 second + timedelta(hours=4))
+        fake.store['me@example.com']['weekly_2'].update(
+            recurringEventId='weekly', originalStartTime={'dateTime': second.isoformat()})
+        fake.log.append((len(fake.log) + 1, 'me@example.com',
+                         {'id': 'weekly_3', 'status': 'cancelled', 'recurringEventId': 'weekly',
+                          'originalStartTime': {'dateTime': third.isoformat()}}))
+        entry, mode = calendar_store.sync_calendar(fake, 'me@example.com', entry, now=start)
+
+        assert mode == 'incremental'
+        events = calendar_store.events_in_window(entry, start, start + timedelta(days=28))
+        assert [e['summary'] for e in events] == ['定例', '定例(時間変更)', '定例']
+        assert events[1]['start'] == (second + timedelta(hours=3)).isoformat()
+
+    def test_all_day_recurrence_with_until(self, fake):
+        now = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        entry = {'events': {'daily': {
+            'summary': '棚卸し', 'start': '2026-03-02', 'end': '2026-03-03', 'all_day': True,
+            'recurrence': ['RRULE:FREQ=DAILY;UNTIL=20260304'],
+        }}}
+        events = calendar_store.events_in_window(entry, now, now + timedelta(days=30))
+        assert [e['start'] for e in events] == ['2026-03-02', '2026-03-03', '2026-03-04']
+        assert events[-1]['end'] == '2026-03-05'
@@ -0,0 +1,66 @@
+"""
+test_confirmed_index.py - 確定済みハッシュ索引 (is_confirmed) のテスト
+
+CONFIRMED ログ (CSV) の保存先を一時ディレクトリに差し替え、
+追記時の索引の増分更新と、CSV との不一致時の再構築を検証する。
+"""
+
+import hashlib
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import drive_utils
+
+
+def _h(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _event(*hashes):
+    return {"extendedProps": {"source_hashes": ",".join(hashes)}}
+
+
+@pytest.fixture
+def confirmed_csv(tmp_path):
+    csv_path = str(tmp_path / "confirmed_log.csv")
+    drive_utils._confirmed_index.update(key=None, digests=set())
+    with patch.object(drive_utils, '_get_confirmed_path', return_value=csv_path):
+        yield csv_path
+    drive_utils._confirmed_index.update(key=None, digests=set())
+
+
+class TestConfirmedIndex:
+
+    def test_append_updates_index(self, confirmed_csv):
+        assert not drive_utils.is_confirmed(_event(_h("a")))
+
+        ok, _ = drive_utils.append_to_confirmed_sheet("剣", "本体", source_hashes=f"{_h('a')},{_h('b')}")
+        assert ok
+        assert drive_utils.is_confirmed(_event(_h("x"), _h("b")))
+        assert not drive_utils.is_confirmed(_event(_h("x")))
+        assert not drive_utils.is_confirmed(_event())
+
+        index_path = drive_utils._get_confirmed_index_path()
+        header_size = drive_utils._CONFIRMED_INDEX_HEADER.size
+        assert os.path.getsize(index_path) == header_size + 2 * drive_utils.CONFIRMED_DIGEST_BYTES
+
+    def test_rebuilds_when_csv_changed_outside(self, confirmed_csv):
+        drive_utils.append_to_confirmed_sheet("剣", "本体", source_hashes=_h("a"))
+        assert drive_utils.is_confirmed(_event(_h("a")))
+
+        # 索引を経由せずに CSV へ追記された行も拾う
+        with open(confirmed_csv, 'a', encoding='utf-8') as f:
+            f.write(f"2026/01/01 10:00:00,斧,本体,PRODUCED,{_h('c')},\n")
+        drive_utils._confirmed_index.update(key=None, digests=set())
+
+        assert drive_utils.is_confirmed(_event(_h("c")))
+        assert drive_utils.is_confirmed(_event(_h("a")))
+
+    def test_hash_case_and_spaces_are_normalized(self, confirmed_csv):
+        drive_utils.append_to_confirmed_sheet("剣", "本体", source_hashes=f" {_h('a').upper()} ")
+        assert drive_utils.is_confirmed(_event(_h("a")))
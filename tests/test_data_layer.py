@@ -0,0 +1,95 @@
+"""
+test_data_layer.py - Drive データの stale-while-revalidate 読み込み (data_layer) の単体テスト
+"""
+
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import data_layer
+
+
+@pytest.fixture
+def layer():
+    """モジュール状態を初期化し、Drive 取得を差し替える。fetch.results に返す値を積む。"""
+    calls = []
+    results = []
+    gate = threading.Event()
+    gate.set()
+
+    def fetch(cloud=None, notify=None):
+        gate.wait(5)
+        calls.append(cloud)
+        return results.pop(0)
+
+    fetch.calls, fetch.results, fetch.gate = calls, results, gate
+    with patch.object(data_layer, '_snapshot', None), \
+         patch.object(data_layer, '_status', {'refreshing': False, 'last_error': None, 'last_attempt': 0.0}), \
+         patch.object(data_layer, '_refresh_thread', None), \
+         patch.object(data_layer.drive_utils, '_is_cloud', return_value=False), \
+         patch.object(data_layer.drive_utils, 'fetch_drive_data', side_effect=fetch):
+        yield fetch
+
+
+def _result(tag, log=True):
+    master = pd.DataFrame({'商品名': [tag]})
+    return master, (pd.DataFrame({'project': [tag]}) if log else None), ['イベントA'], tag.encode()
+
+
+def _wait_idle():
+    thread = data_layer._refresh_thread
+    if thread is not None:
+        thread.join(5)
+
+
+class TestStaleWhileRevalidate:
+
+    def test_first_load_blocks_then_serves_cached(self, layer):
+        layer.results.append(_result('v1'))
+
+        snap = data_layer.get_snapshot()
+        assert snap['excel_bytes'] == b'v1' and snap['generation'] == 1
+        assert data_layer.get_snapshot() is snap
+        assert len(layer.calls) == 1
+        assert data_layer.status()['age_sec'] < 5
+
+    def test_stale_snapshot_is_served_while_refreshing(self, layer):
+        layer.results.extend([_result('v1'), _result('v2')])
+        first = data_layer.get_snapshot()
+
+        layer.gate.clear()
+        assert data_layer.get_snapshot(max_age=0) is first
+        assert data_layer.status()['refreshing']
+        assert not data_layer.refresh_async(force=True)  # 取得中は二重に開始しない
+        layer.gate.set()
+        _wait_idle()
+
+        latest = data_layer.get_snapshot()
+        assert latest['excel_bytes'] == b'v2' and latest['generation'] == 2
+
+    def test_failed_parse_keeps_last_good_snapshot(self, layer):
+        layer.results.extend([_result('v1'), (None, None, [], None), _result('v3', log=False)])
+        first = data_layer.get_snapshot()
+
+        assert data_layer.refresh_async(force=True)
+        _wait_idle()
+        assert data_layer.get_snapshot() is first
+        assert data_layer.status()['last_error']
+
+        # ログだけ欠けた版でも、前の版にログがあれば差し替えない
+        assert data_layer.refresh_async(force=True)
+        _wait_idle()
+        assert data_layer.get_snapshot() is first
+
+    def test_failure_without_snapshot_is_rate_limited(self, layer):
+        layer.results.append((None, None, [], None))
+
+        assert data_layer.get_snapshot() is None
+        assert data_layer.get_snapshot() is None
+        assert len(layer.calls) == 1
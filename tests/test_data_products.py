@@ -0,0 +1,74 @@
+"""
+test_data_products.py - ページ単位のデータ製品レジストリ (data_products) の単体テスト
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import data_products
+from logic.data_products import ProductRegistry
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo():
+    with patch.object(data_products, '_memo', {}), patch.object(data_products, '_compute_locks', {}):
+        yield
+
+
+def _registry(state, calls):
+    registry = ProductRegistry()
+
+    def inventory():
+        calls.append('inventory')
+        return ['在庫', state['generation']]
+
+    def events():
+        calls.append('events')
+        return ['イベント']
+
+    registry.register('inventory', lambda: state['generation'], inventory)
+    registry.register('events', lambda: state['generation'], events)
+    registry.register('live', lambda: None, lambda: calls.append('live') or len(calls))
+    return registry
+
+
+class TestProductRegistry:
+
+    def test_only_requested_products_are_computed(self):
+        calls = []
+        page = _registry({'generation': 1}, calls).require(('events',))
+        assert page == {'events': ['イベント']}
+        assert calls == ['events']
+
+    def test_memoized_per_version_across_reruns(self):
+        state, calls = {'generation': 1}, []
+        first = _registry(state, calls).get('inventory')
+        # 再実行ごとにレジストリは作り直されるが、同じ版ならメモを返す
+        assert _registry(state, calls).get('inventory') is first
+        assert calls == ['inventory']
+
+        state['generation'] = 2
+        assert _registry(state, calls).get('inventory') == ['在庫', 2]
+        assert calls == ['inventory', 'inventory']
+
+    def test_peek_does_not_compute(self):
+        state, calls = {'generation': 1}, []
+        registry = _registry(state, calls)
+        assert registry.peek('inventory') is None
+        value = registry.get('inventory')
+        assert registry.peek('inventory') is value
+        state['generation'] = 2
+        assert registry.peek('inventory') is None
+        assert calls == ['inventory']
+
+    def test_none_version_is_not_memoized(self):
+        calls = []
+        registry = _registry({'generation': 1}, calls)
+        registry.get('live')
+        registry.get('live')
+        assert calls == ['live', 'live']
@@ -0,0 +1,103 @@
+"""
+test_drive_cache.py - Driveダウンロードキャッシュ (download_content_cached) のテスト
+
+Drive API はフェイクのサービスオブジェクトで置き換え、
+リビジョン (md5Checksum / modifiedTime) 単位で再ダウンロードが抑止されることを検証する。
+"""
+
+import io
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import drive_utils
+
+
+class _FakeRequest:
+    def __init__(self, result=None, error=None):
+        self._result = result
+        self._error = error
+
+    def execute(self):
+        if self._error:
+            raise self._error
+        return self._result
+
+
+class _FakeFiles:
+    def __init__(self, meta):
+        self.meta = meta
+        self.error = None
+
+    def get(self, fileId, fields):
+        return _FakeRequest(self.meta.get(fileId, {}), self.error)
+
+
+class _FakeService:
+    def __init__(self, meta):
+        self._files = _FakeFiles(meta)
+
+    def files(self):
+        return self._files
+
+
+@pytest.fixture
+def cache_env(tmp_path):
+    contents = {"F1": b"version-1"}
+    calls = []
+
+    def fake_download(service, file_id, mime_type):
+        calls.append(file_id)
+        return io.BytesIO(contents[file_id])
+
+    with patch.object(drive_utils, '_get_drive_cache_dir', return_value=str(tmp_path)), \
+         patch.object(drive_utils, 'download_content', side_effect=fake_download):
+        yield contents, calls
+
+
+class TestDownloadContentCached:
+
+    def test_same_revision_hits_cache(self, cache_env):
+        contents, calls = cache_env
+        service = _FakeService({"F1": {"md5Checksum": "aaa", "modifiedTime": "t1"}})
+
+        first = drive_utils.download_content_cached(service, "F1", "application/octet-stream")
+        second = drive_utils.download_content_cached(service, "F1", "application/octet-stream")
+
+        assert first.read() == b"version-1"
+        assert second.read() == b"version-1"
+        assert calls == ["F1"]
+
+    def test_changed_revision_redownloads(self, cache_env):
+        contents, calls = cache_env
+        meta = {"F1": {"modifiedTime": "t1"}}  # Sheets相当: md5なし
+        service = _FakeService(meta)
+
+        drive_utils.download_content_cached(service, "F1", drive_utils.LOG_FILE_MIME)
+        contents["F1"] = b"version-2"
+        meta["F1"] = {"modifiedTime": "t2"}
+        result = drive_utils.download_content_cached(service, "F1", drive_utils.LOG_FILE_MIME)
+
+        assert result.read() == b"version-2"
+        assert calls == ["F1", "F1"]
+
+    def test_metadata_failure_serves_stale_copy(self, cache_env):
+        contents, calls = cache_env
+        service = _FakeService({"F1": {"md5Checksum": "aaa"}})
+        drive_utils.download_content_cached(service, "F1", "application/octet-stream")
+
+        service.files().error = RuntimeError("offline")
+        result = drive_utils.download_content_cached(service, "F1", "application/octet-stream")
+
+        assert result.read() == b"version-1"
+        assert calls == ["F1"]
+
+    def test_metadata_failure_without_cache_raises(self, cache_env):
+        service = _FakeService({})
+        service.files().error = RuntimeError("offline")
+        with pytest.raises(RuntimeError):
+            drive_utils.download_content_cached(service, "F1", "application/octet-stream")
@@ -0,0 +1,123 @@
+"""
+test_drive_client.py - 共有 Drive クライアント (drive_client) の単体テスト
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import drive_client
+
+
+class FakeCredentials:
+    """refresh() の回数を数える認証情報（expiry は google-auth と同じ naive UTC）。"""
+
+    def __init__(self, expires_in_sec, fail=False):
+        self.token = 'token'
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in_sec)
+        self.fail = fail
+        self.refreshed = 0
+
+    def refresh(self, request):
+        if self.fail:
+            raise RuntimeError('invalid_grant')
+        self.refreshed += 1
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    with patch.object(drive_client, '_clients', {}):
+        yield
+
+
+class TestGetService:
+
+    def test_service_is_built_once_and_shared(self):
+        loads = []
+        creds = FakeCredentials(3600)
+
+        def load():
+            loads.append(1)
+            return creds
+
+        first = drive_client.get_service('local', load)
+        assert drive_client.get_service('local', load) is first
+        assert len(loads) == 1 and creds.refreshed == 0
+        assert hasattr(first, 'files')
+
+    def test_refresh_only_near_expiry(self):
+        creds = FakeCredentials(drive_client.REFRESH_MARGIN_SEC - 10)
+        saved = []
+        service = drive_client.get_service('local', lambda: creds)
+
+        assert drive_client.get_service('local', lambda: None, on_refresh=saved.append) is service
+        assert creds.refreshed == 1 and saved == [creds]
+        # 更新後は有効期限まで余裕があるので再度は更新しない
+        drive_client.get_service('local', lambda: None, on_refresh=saved.append)
+        assert creds.refreshed == 1
+
+    def test_failed_refresh_reloads_credentials(self):
+        stale = FakeCredentials(0, fail=True)
+        fresh = FakeCredentials(3600)
+        first = drive_client.get_service('cloud', lambda: stale)
+
+        second = drive_client.get_service('cloud', lambda: fresh)
+        assert second is not first
+        assert drive_client._clients['cloud']['creds'] is fresh
+
+    def test_load_failure_returns_none(self):
+        assert drive_client.get_service('local', lambda: None) is None
+        assert 'local' not in drive_client._clients
+
+
+class FakeHttp:
+
+    def __init__(self):
+        self.requests = 0
+        self.closed = False
+
+    def request(self, *args, **kwargs):
+        self.requests += 1
+        return {'status': '200'}, b''
+
+    def close(self):
+        self.closed = True
+
+
+class TestHttpPool:
+
+    def test_connection_is_reused(self):
+        created = []
+        with patch.object(drive_client, 'build_http', side_effect=lambda: created.append(FakeHttp()) or created[-1]):
+            pool = drive_client._HttpPool()
+            pool.request('https://example.com')
+            pool.request('https://example.com')
+        assert len(created) == 1 and created[0].requests == 2
+
+    def test_concurrent_requests_use_separate_connections(self):
+        created = []
+        entered = threading.Barrier(2, timeout=5)
+
+        class BlockingHttp(FakeHttp):
+            def request(self, *args, **kwargs):
+                entered.wait()
+                return super().request(*args, **kwargs)
+
+        with patch.object(drive_client, 'build_http', side_effect=lambda: created.append(BlockingHttp()) or created[-1]):
+            pool = drive_client._HttpPool(max_idle=1)
+            threads = [threading.Thread(target=pool.request, args=('https://example.com',)) for _ in range(2)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(5)
+
+        assert len(created) == 2
+        # 保持数を超えた接続は閉じる
+        assert sum(h.closed for h in created) == 1
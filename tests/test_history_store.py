@@ -0,0 +1,188 @@
+"""
+test_history_store.py - history_store（追記専用の履歴ストア）の単体テスト
+"""
+
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import history_store
+
+
+def _scan(ts, counts, target=10):
+    return {
+        "timestamp": ts,
+        "total_target": target * len(counts),
+        "total_current": sum(counts.values()),
+        "type": "scan",
+        "details": {k: {"count": v, "target": target} for k, v in counts.items()},
+    }
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "history_summary.jsonl")
+    with patch.object(history_store, 'HISTORY_PATH', path), \
+         patch.object(history_store, 'LEGACY_HISTORY_PATH', str(tmp_path / "history_summary.json")):
+        yield path
+
+
+class TestAppend:
+
+    def test_identical_details_are_skipped(self, store_path):
+        assert history_store.append_snapshot(_scan("2026-01-01T10:00:00", {"P1": 1}))
+        assert not history_store.append_snapshot(_scan("2026-01-01T11:00:00", {"P1": 1}))
+        assert history_store.append_snapshot(_scan("2026-01-01T12:00:00", {"P1": 2}))
+
+        with open(store_path, encoding='utf-8') as f:
+            assert len(f.readlines()) == 2
+
+    def test_latest_initial_wins(self, store_path):
+        history_store.append_snapshot({"type": "initial", "timestamp": "2025-12-14T23:59:59",
+                                       "details": {"P1": {"count": 1, "target": 0}}})
+        history_store.append_snapshot(_scan("2026-01-01T10:00:00", {"P1": 3}))
+        history_store.append_snapshot({"type": "initial", "timestamp": "2025-12-14T23:59:59",
+                                       "details": {"P1": {"count": 5, "target": 0}}})
+
+        assert history_store.read_initial()["details"]["P1"]["count"] == 5
+        entries = history_store.read_range()
+        assert [e["type"] for e in entries] == ["initial", "scan"]
+
+
+class TestRead:
+
+    @pytest.fixture
+    def populated(self, store_path):
+        history_store.append_snapshot(_scan("2026-01-01T10:00:00", {"P1": 1}))
+        history_store.append_snapshot(_scan("2026-01-02T10:00:00", {"P1": 2}))
+        history_store.append_snapshot({"timestamp": "2026-01-02T12:00:00", "type": "scan", "details": {}})
+        history_store.append_snapshot(_scan("2026-01-03T10:00:00", {"P1": 3}))
+        return store_path
+
+    def test_read_range_by_date(self, populated):
+        entries = history_store.read_range(start="2026-01-02", end="2026-01-02")
+        assert [e["timestamp"] for e in entries] == ["2026-01-02T10:00:00", "2026-01-02T12:00:00"]
+
+        entries = history_store.read_range(start="2026-01-02", with_details=True)
+        assert [e["details"]["P1"]["count"] for e in entries] == [2, 3]
+
+    def test_read_latest(self, populated):
+        latest = history_store.read_latest(2)
+        assert [e["timestamp"] for e in latest] == ["2026-01-02T12:00:00", "2026-01-03T10:00:00"]
+
+        base = history_store.read_at("2026-01-03")
+        assert base["timestamp"] == "2026-01-02T12:00:00"
+        # details が空のエントリは遡って飛ばす
+        base = history_store.read_at("2026-01-03", with_details=True)
+        assert base["timestamp"] == "2026-01-02T10:00:00"
+
+        assert history_store.read_earliest(1)[0]["timestamp"] == "2026-01-01T10:00:00"
+
+    def test_index_picks_up_appends(self, populated):
+        assert len(history_store.read_range()) == 4
+        history_store.append_snapshot(_scan("2026-01-04T10:00:00", {"P1": 4}))
+        assert history_store.read_latest(1)[0]["timestamp"] == "2026-01-04T10:00:00"
+
+
+class TestMigration:
+
+    def test_legacy_json_array_is_migrated(self, store_path, tmp_path):
+        legacy = [
+            {"type": "initial", "timestamp": "2025-12-14T23:59:59", "details": {"P1": {"count": 1, "target": 0}}},
+            _scan("2026-01-01T10:00:00", {"P1": 2}),
+            _scan("2026-01-01T11:00:00", {"P1": 2}),  # 重複
+        ]
+        with open(tmp_path / "history_summary.json", 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+
+        assert history_store.exists()
+        assert len(history_store.read_range()) == 2
+
+    def test_restore_accepts_both_formats(self, store_path):
+        entries = [_scan("2026-01-01T10:00:00", {"P1": 1}), _scan("2026-01-02T10:00:00", {"P1": 2})]
+        assert history_store.restore_from_bytes(json.dumps(entries).encode('utf-8')) == 2
+        jsonl = "\n".join(json.dumps(e) for e in entries).encode('utf-8')
+        assert history_store.restore_from_bytes(jsonl) == 2
+        assert len(history_store.read_range()) == 2
+
+
+class TestDeltaEncoding:
+
+    @pytest.fixture
+    def many(self, store_path):
+        ids = [f"P{i:02d}" for i in range(10)]
+        counts = {k: 0 for k in ids}
+        snapshots = []
+        for day in range(1, 31):
+            counts = dict(counts)
+            counts[ids[day % 10]] += 1
+            snap = _scan(f"2026-01-{day:02d}T10:00:00", counts)
+            history_store.append_snapshot(snap)
+            snapshots.append(snap)
+        return snapshots
+
+    def test_small_changes_are_written_as_deltas(self, many, store_path):
+        with open(store_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert "details" in records[0]
+        assert records[1]["encoding"] == "delta"
+        assert list(records[1]["delta"]) == ["P02"]
+        # KEYFRAME_INTERVAL 行ごとにキーフレームが入る
+        keyframes = [i for i, r in enumerate(records) if r.get("encoding") != "delta"]
+        assert keyframes == [0, history_store.KEYFRAME_INTERVAL + 1]
+
+    def test_reads_materialize_full_details(self, many):
+        entries = history_store.read_range()
+        assert [e["details"] for e in entries] == [s["details"] for s in many]
+        assert all("delta" not in e and "encoding" not in e for e in entries)
+
+        at = history_store.read_at("2026-01-25")
+        assert at["timestamp"] == "2026-01-24T10:00:00"
+        assert at["details"] == many[23]["details"]
+        assert history_store.read_at("2026-01-01") is None
+
+    def test_restore_roundtrip_of_delta_file(self, many, store_path):
+        with open(store_path, 'rb') as f:
+            raw = f.read()
+        assert [e["details"] for e in history_store.parse_history_bytes(raw)] == [s["details"] for s in many]
+
+    def test_export_json_array_for_drive(self, many, tmp_path):
+        # Drive 上の history_summary.json を読む外部スクリプト向けに旧形式（JSON配列）で書き出す
+        path = history_store.export_json_array(str(tmp_path / "export.json"))
+        with open(path, encoding='utf-8') as f:
+            exported = json.load(f)
+        assert isinstance(exported, list)
+        assert [e["details"] for e in exported] == [s["details"] for s in many]
+        with open(path, 'rb') as f:
+            assert history_store.parse_history_bytes(f.read()) == exported
+
+    def test_iter_changes_yields_only_changed_ids(self, many):
+        steps = list(history_store.iter_changes())
+        assert len(steps) == len(many)
+        header, changes, effective = steps[1]
+        assert header["timestamp"] == "2026-01-02T10:00:00" and header["has_details"] and effective
+        assert changes == {"P02": ({"count": 0, "target": 10}, {"count": 1, "target": 10})}
+        # キーフレーム行でも変化したIDだけが返る
+        header, changes, _ = steps[history_store.KEYFRAME_INTERVAL + 1]
+        assert len(changes) == 1
+
+    def test_read_matrix_matches_materialized_details(self, many):
+        matrix = history_store.read_matrix()
+        assert matrix.timestamps == [s["timestamp"] for s in many]
+        for row, snap in enumerate(many):
+            for col, item_id in enumerate(matrix.ids):
+                assert matrix.count[row, col] == snap["details"][item_id]["count"]
+                assert matrix.target[row, col] == snap["details"][item_id]["target"]
+
+        # ファイルが変わるまでは同じ行列を返し、追記で作り直す
+        assert history_store.read_matrix() is matrix
+        assert len(history_store.read_matrix(start="2026-01-25")) == 6
+        history_store.append_snapshot(_scan("2026-01-31T10:00:00", {"P00": 9}))
+        latest = history_store.read_matrix()
+        assert len(latest) == len(many) + 1
+        assert latest.count[-1].tolist() == [9 if k == "P00" else 0 for k in latest.ids]
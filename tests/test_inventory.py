@@ -6,7 +6,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 try:
-    from logic.inventory import calculate_inventory, normalize_text
+    from logic.inventory import calculate_inventory, normalize_text, normalize_series
 except ImportError:
     print("Error: Could not import logic.inventory")
     sys.exit(1)
@@ -64,5 +64,39 @@ def test_duplicates_and_types():
         traceback.print_exc()
         sys.exit(1)
 
+def test_vectorized_inventory_counts():
+    master_df = pd.DataFrame({
+        '商品名': ['剣１', '剣1', 'Dagger', '合計', None],
+        '部位': ['本体', '鞘', '本体', None, '本体'],
+        '在庫数': [2, 1, '3', 9, 4],
+        '単価': [5000, 1000, 3000, 0, 100],
+    })
+    log_df = pd.DataFrame({'project': ['剣1', 'dagger', '剣 1'], 'path': ['販売', '加工', '販売']})
+    confirmed_df = pd.DataFrame({
+        'PROJECT': ['剣　１', 'Dagger', 'Dagger', '剣1'],
+        'ACTION': ['PRODUCED', 'PRODUCED', 'CANCEL', 'PRODUCED'],
+    })
+
+    result = calculate_inventory(master_df, log_df, confirmed_df).set_index('join_key')
+
+    assert list(result.index) == ['dagger', '剣1']
+    sword = result.loc['剣1']
+    assert sword['商品名'] == '剣１'
+    assert sword['セット価格'] == 5000
+    assert (sword['確定数'], sword['販売数']) == (2, 2)
+    assert (sword['本体'], sword['鞘'], bool(sword['has_sheath'])) == (2, 1, True)
+    dagger = result.loc['dagger']
+    assert (dagger['本体'], dagger['鞘'], dagger['確定数']) == (3, 0, 0)
+    assert dagger['status_text'] == '在庫あり'
+
+
+def test_normalize_series_matches_scalar():
+    series = pd.Series(['Ab　c\t１', None, 'Ab　c\t１', 2.5, '剣１', float('nan')], index=[3, 1, 4, 1, 5, 9])
+    result = normalize_series(series)
+    assert result.tolist() == [normalize_text(v) for v in series]
+    assert result.tolist() == ['abc1', '', 'abc1', '2.5', '剣1', '']
+    assert list(result.index) == [3, 1, 4, 1, 5, 9]
+
+
 if __name__ == "__main__":
     test_duplicates_and_types()
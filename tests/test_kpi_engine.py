@@ -0,0 +1,85 @@
+"""
+test_kpi_engine.py - KPIエンジン（全KPIの一括算出とメモ化）の単体テスト
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import bi_dashboard, history_store, kpi_engine
+from test_bi_dashboard import MOCK_EVENT_MASTER, MOCK_MASTER_DATA
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, 'HISTORY_PATH', str(tmp_path / "history_summary.jsonl"))
+    monkeypatch.setattr(history_store, 'LEGACY_HISTORY_PATH', str(tmp_path / "history_summary.json"))
+    monkeypatch.setattr(bi_dashboard, '_load_event_master', lambda: MOCK_EVENT_MASTER)
+    calls = []
+
+    def _ensure():
+        calls.append(1)
+        return True, None
+
+    monkeypatch.setattr(bi_dashboard, '_ensure_history_store', _ensure)
+    kpi_engine._results.clear()
+    kpi_engine._by_version.clear()
+    for day in range(1, 4):
+        details = {item["id"]: {"count": day, "target": 10} for item in MOCK_MASTER_DATA}
+        history_store.append_snapshot({"timestamp": f"2026-03-0{day}T10:00:00", "type": "scan", "details": details})
+    return calls
+
+
+def test_matches_individual_kpis(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    now = datetime(2026, 4, 1, 21, 0)
+
+    kpis = kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now)
+
+    assert kpis["countdown"] == bi_dashboard.calc_countdown(now=now, event_master=MOCK_EVENT_MASTER)
+    assert kpis["sales_gap"] == bi_dashboard.calc_sales_gap(MOCK_MASTER_DATA)
+    assert kpis["remaining_hours"] == bi_dashboard.calc_remaining_hours(MOCK_MASTER_DATA)
+    assert kpis["today_tasks"] == bi_dashboard.calc_today_tasks(MOCK_MASTER_DATA, current_hour=21)
+    assert kpis["material_alerts"] == bi_dashboard.calc_material_alerts(MOCK_MASTER_DATA, days_remaining=34)
+    assert kpis["dev_slot"] == bi_dashboard.calc_dev_slot(MOCK_MASTER_DATA, MOCK_EVENT_MASTER, now=now)
+    assert kpis["burndown"] == bi_dashboard.calc_burndown_hours(MOCK_MASTER_DATA, MOCK_EVENT_MASTER)
+    assert kpis["burnup"] == bi_dashboard.calc_burnup_data(MOCK_MASTER_DATA, MOCK_EVENT_MASTER)
+
+
+def test_memoized_by_input(tmp_path, monkeypatch):
+    calls = _setup(tmp_path, monkeypatch)
+    now = datetime(2026, 4, 1, 10, 0)
+
+    first = kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now)
+    # 履歴ストアの取得はスナップショット時の1回だけ
+    assert len(calls) == 1
+    assert kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now.replace(minute=30)) is first
+
+    # 時刻帯・履歴が変われば再計算する
+    assert kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now.replace(hour=21)) is not first
+    history_store.append_snapshot({"timestamp": "2026-03-04T10:00:00", "type": "scan",
+                                   "details": {"ITEM_A_BDY": {"count": 9, "target": 10}}})
+    assert kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now) is not first
+
+
+
+def test_version_key_skips_snapshot(tmp_path, monkeypatch):
+    calls = _setup(tmp_path, monkeypatch)
+    hashed = []
+    input_hash = kpi_engine._input_hash
+    monkeypatch.setattr(kpi_engine, '_input_hash', lambda *args: hashed.append(1) or input_hash(*args))
+    now = datetime(2026, 4, 1, 10, 0)
+
+    first = kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now, master_version="v1", calendar_version=(1, 10))
+    # 版が同じ再実行は入力のハッシュも履歴ストアの取得（クラウドでは Drive）も行わない
+    assert kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now, master_version="v1", calendar_version=(1, 10)) is first
+    assert len(calls) == len(hashed) == 1
+
+    # カレンダーの版や履歴ストアが変われば取り直す（内容が同じなら入力ハッシュのメモを返す）
+    assert kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now, master_version="v1", calendar_version=(2, 10)) is first
+    assert len(calls) == 2
+    history_store.append_snapshot({"timestamp": "2026-03-04T10:00:00", "type": "scan",
+                                   "details": {"ITEM_A_BDY": {"count": 9, "target": 10}}})
+    assert kpi_engine.compute_kpis(MOCK_MASTER_DATA, now=now, master_version="v1", calendar_version=(2, 10)) is not first
+    assert len(calls) == 3
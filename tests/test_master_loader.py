@@ -108,7 +108,8 @@ class TestConvertCsvToJson:
         json_path = str(temp_data_dir / "production_master.json")
 
         with patch('logic.master_loader.CSV_PATH', sample_csv), \
-             patch('logic.master_loader.JSON_PATH', json_path):
+             patch('logic.master_loader.JSON_PATH', json_path), \
+             patch('logic.master_loader.EXPORT_JSON', True):
             result = convert_csv_to_json(force=True)
 
         # ID=None の行はスキップされるので2件
@@ -118,8 +119,7 @@ class TestConvertCsvToJson:
         assert result[0]['price'] == 50000
         assert result[0]['process']['nc']['front_rough_min'] == 30.0
 
-        # JSONファイルが生成されていること
-        assert os.path.exists(json_path)
+        # JSONエクスポートを有効にした場合は JSONファイルが生成されていること
         with open(json_path, 'r', encoding='utf-8') as f:
             saved = json.load(f)
         assert len(saved) == 2
@@ -225,7 +225,8 @@ class TestConvertDataFrameToJson:
         json_path = str(temp_data_dir / "production_master.json")
         df = pd.DataFrame(SAMPLE_CSV_DATA)
 
-        with patch('logic.master_loader.JSON_PATH', json_path):
+        with patch('logic.master_loader.JSON_PATH', json_path), \
+             patch('logic.master_loader.EXPORT_JSON', True):
             from logic.master_loader import convert_dataframe_to_json
             result = convert_dataframe_to_json(df, force=True)
 
@@ -248,3 +249,78 @@ class TestConvertDataFrameToJson:
         # エラーでもメモリ上のリストは返る仕様
         assert len(result) == 2
 
+
+
+class TestRefreshMaster:
+    """refresh_master: ワークブックのコンテンツハッシュによるメモ化"""
+
+    def _run(self, temp_data_dir, excel_bytes, force=False):
+        json_path = str(temp_data_dir / "production_master.json")
+        stamp_path = str(temp_data_dir / "master_refresh_stamp.json")
+        df = pd.DataFrame(SAMPLE_CSV_DATA)
+        with patch('logic.master_loader.JSON_PATH', json_path), \
+             patch('logic.master_loader.REFRESH_STAMP_PATH', stamp_path), \
+             patch('logic.master_loader.merge_event_targets', side_effect=lambda ml, b: ml) as merge:
+            from logic.master_loader import refresh_master
+            result = refresh_master(df, excel_bytes, force=force)
+        return result, merge.call_count
+
+    def test_unchanged_workbook_skips_refresh(self, temp_data_dir):
+        (list1, v1, refreshed1), calls1 = self._run(temp_data_dir, b"workbook-v1")
+        store_mtime = os.path.getmtime(temp_data_dir / "production_master.arrow")
+
+        (list2, v2, refreshed2), calls2 = self._run(temp_data_dir, b"workbook-v1")
+
+        assert refreshed1 and not refreshed2
+        assert (calls1, calls2) == (1, 0)
+        assert v1 == v2
+        assert list2 == list1
+        assert os.path.getmtime(temp_data_dir / "production_master.arrow") == store_mtime
+
+    def test_changed_workbook_or_force_refreshes(self, temp_data_dir):
+        self._run(temp_data_dir, b"workbook-v1")
+
+        (_, v2, refreshed), calls = self._run(temp_data_dir, b"workbook-v2")
+        assert refreshed and calls == 1
+
+        (_, v3, refreshed), calls = self._run(temp_data_dir, b"workbook-v2", force=True)
+        assert refreshed and calls == 1
+        assert v2 == v3
+
+
+class TestColumnarStore:
+    """列指向ストア (production_master.arrow) への保存と読み出し"""
+
+    def test_store_roundtrip_and_column_read(self, sample_csv, temp_data_dir):
+        json_path = str(temp_data_dir / "production_master.json")
+        with patch('logic.master_loader.CSV_PATH', sample_csv), \
+             patch('logic.master_loader.JSON_PATH', json_path):
+            from logic.master_loader import load_master_columns
+            result = convert_csv_to_json(force=True)
+            result[0]['event_data'] = {'合算内訳': 'テスト2605: 目標3/在庫1'}
+            result[1]['requirements']['yield'] = 'x'  # 型が列と異なる値
+            from logic.master_loader import _save_master
+            _save_master(result)
+
+            assert os.path.exists(temp_data_dir / "production_master.arrow")
+            # JSON エクスポートは既定では出力せず、ストアから読める
+            assert not os.path.exists(json_path)
+            assert load_master_json() == result
+
+            cols = load_master_columns(['id', 'price', 'process.nc.front_rough_min'])
+            assert list(cols.columns) == ['id', 'price', 'process.nc.front_rough_min']
+            assert cols['id'].tolist() == ['P001', 'P002']
+            assert cols['process.nc.front_rough_min'].iloc[0] == 30.0
+
+    def test_newer_json_takes_precedence(self, sample_csv, temp_data_dir):
+        json_path = str(temp_data_dir / "production_master.json")
+        with patch('logic.master_loader.CSV_PATH', sample_csv), \
+             patch('logic.master_loader.JSON_PATH', json_path):
+            convert_csv_to_json(force=True)
+            edited = [{"id": "EDITED"}]
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(edited, f)
+            store_mtime = os.path.getmtime(temp_data_dir / "production_master.arrow")
+            os.utime(json_path, (store_mtime + 10, store_mtime + 10))
+
+            assert load_master_json() == edited
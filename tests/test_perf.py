@@ -0,0 +1,99 @@
+"""
+test_perf.py - 処理段階ごとの計測 (perf) の単体テスト
+"""
+
+import os
+import sys
+import json
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import perf
+
+
+@pytest.fixture
+def metrics(tmp_path):
+    path = str(tmp_path / 'perf_metrics.jsonl')
+    with patch.object(perf, 'METRICS_PATH', path), \
+         patch.object(perf, '_buffer', []), \
+         patch.object(perf, '_state', {'last_flush': 0.0, 'lines': None}), \
+         patch.object(perf, '_summary_cache', {}):
+        yield path
+
+
+def _records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestTimed:
+
+    def test_decorator_and_context_manager(self, metrics):
+        @perf.timed('stage_a')
+        def work(x):
+            return x * 2
+
+        assert work(3) == 6
+        with perf.timed('stage_b'):
+            pass
+        perf.flush()
+
+        records = _records(metrics)
+        assert [r['stage'] for r in records] == ['stage_a', 'stage_b']
+        assert all(r['ok'] and r['ms'] >= 0 for r in records)
+
+    def test_exception_is_recorded_and_reraised(self, metrics):
+        @perf.timed('boom')
+        def fail():
+            raise ValueError('x')
+
+        with pytest.raises(ValueError):
+            fail()
+        perf.flush()
+        assert _records(metrics) == [dict(_records(metrics)[0], stage='boom', ok=False)]
+
+
+class TestSummary:
+
+    def test_percentiles_and_counters(self, metrics):
+        with open(metrics, 'w', encoding='utf-8') as f:
+            for ms in range(1, 101):
+                f.write(json.dumps({'ts': 0, 'stage': 'read_excel', 'ms': float(ms), 'ok': True}) + "\n")
+            f.write(json.dumps({'ts': 0, 'stage': 'authenticate', 'ms': 5.0, 'ok': False}) + "\n")
+        perf.count('drive_cache.hit')
+        perf.count('drive_cache.hit', 2)
+        perf.count('drive_cache.miss')
+
+        result = perf.summary()
+        stages = {s['stage']: s for s in result['stages']}
+        assert stages['read_excel']['count'] == 100
+        assert stages['read_excel']['p50_ms'] == pytest.approx(50.5)
+        assert stages['read_excel']['p95_ms'] == pytest.approx(95.05, abs=0.1)
+        assert stages['authenticate']['errors'] == 1
+        assert result['stages'][0]['stage'] == 'read_excel'  # p95 の大きい順
+        assert result['counters'] == {'drive_cache.hit': 3, 'drive_cache.miss': 1}
+
+    def test_missing_file(self, metrics):
+        assert perf.summary() == {'stages': [], 'counters': {}}
+
+
+def test_rolling_trim(metrics):
+    with patch.object(perf, 'MAX_RECORDS', 10):
+        for i in range(13):
+            perf.count('c', i)
+            perf.flush()
+        records = _records(metrics)
+        assert len(records) <= 12
+        assert records[-1]['n'] == 12
+
+
+def test_disabled_records_nothing(metrics):
+    with patch.object(perf, 'ENABLED', False):
+        perf.count('c')
+        with perf.timed('stage'):
+            pass
+    perf.flush()
+    assert not os.path.exists(metrics)
@@ -4,11 +4,13 @@ import json
 import os
 import sys
 import io
+import tempfile
+from unittest.mock import patch
 
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from logic import master_loader
+from logic import history_store, master_loader
 
 def create_mock_data():
     # 1. Product Master DataFrame
@@ -74,6 +76,19 @@ def create_mock_data():
     return master_df, buffer.read()
 
 def test_phase3_logic():
+    # マスタ（JSON・列指向ストア）・event_master.json・履歴ストアの保存先は
+    # リポジトリの data/ ではなく一時ディレクトリにする
+    with tempfile.TemporaryDirectory() as data_dir:
+        with patch.object(master_loader, 'DATA_DIR', data_dir), \
+             patch.object(master_loader, 'JSON_PATH', os.path.join(data_dir, 'production_master.json')), \
+             patch.object(master_loader, 'EXPORT_JSON', True), \
+             patch.object(history_store, 'HISTORY_PATH', os.path.join(data_dir, 'history_summary.jsonl')), \
+             patch.object(history_store, 'LEGACY_HISTORY_PATH', os.path.join(data_dir, 'history_summary.json')), \
+             patch.object(history_store, 'EXPORT_PATH', os.path.join(data_dir, 'history_summary_export.json')):
+            _run_phase3_logic()
+
+
+def _run_phase3_logic():
     print("--- Starting Phase 3 Logic Test ---")
     master_df, excel_bytes = create_mock_data()
     
@@ -85,7 +100,9 @@ def test_phase3_logic():
     # 1. Convert DataFrame to JSON (With Event Merge)
     print("1. Converting DataFrame to JSON with Excel Bytes...")
     # NOTE: merge_event_targets is now called INSIDE convert_dataframe_to_json
-    master_list = master_loader.convert_dataframe_to_json(master_df, force=True, excel_bytes=excel_bytes)
+    # Drive への同期（本番のファイルIDへのアップロード予約）はテストでは行わない
+    with patch.object(master_loader, 'upload_to_drive', None):
+        master_list = master_loader.convert_dataframe_to_json(master_df, force=True, excel_bytes=excel_bytes)
     
     # Verify initial JSON in memory
     dp_updated = next((item for item in master_list if item['id'] == 'DP-001'), None)
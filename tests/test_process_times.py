@@ -0,0 +1,89 @@
+"""
+test_process_times.py - 工程時間テーブル（process_times）の単体テスト
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import process_times
+from logic.process_times import get_process_table, register_version, unit_times
+
+
+def _item(item_id, nc=(30.0, 15.0, 30.0, 15.0), unit=5.0, drying=(1.0, 0.5), setup=10.0):
+    return {
+        "id": item_id,
+        "process": {
+            "prep": {"setup_min": setup, "unit_min": unit, "drying_hr": drying[0]},
+            "nc": dict(zip(["front_rough_min", "front_finish_min", "back_rough_min", "back_finish_min"], nc)),
+            "assembly": {"cut_off_min": 0.1, "bonding_min": 0.2, "drying_hr": drying[1]},
+            "manual": {"fitting_min": 0.3, "machine_work_min": 1.7, "sanding_min": 20.0, "assembly_min": 5.0},
+        },
+    }
+
+
+def _legacy_times(item):
+    # 旧 bi_dashboard._calc_item_times と同じ加算順
+    proc = item.get('process', {})
+    nc, prep = proc.get('nc', {}), proc.get('prep', {})
+    assembly, manual = proc.get('assembly', {}), proc.get('manual', {})
+    nc_min = (nc.get('front_rough_min', 0) + nc.get('front_finish_min', 0)
+              + nc.get('back_rough_min', 0) + nc.get('back_finish_min', 0))
+    manual_min = (prep.get('unit_min', 0) + assembly.get('cut_off_min', 0) + assembly.get('bonding_min', 0)
+                  + manual.get('fitting_min', 0) + manual.get('machine_work_min', 0)
+                  + manual.get('sanding_min', 0) + manual.get('assembly_min', 0))
+    return nc_min, manual_min, nc_min + manual_min
+
+
+def test_table_matches_per_item_sums():
+    master = [_item("A"), _item("B", nc=(0.1, 0.2, 0.3, 0.4), unit=0.7), {"id": "C", "process": {}}, {"name": "no-id"}]
+    table = get_process_table(master)
+
+    for item in master:
+        assert table.unit_times(item) == _legacy_times(item)
+        assert unit_times(item) == _legacy_times(item)
+    assert table.row(master[0])["drying_hr"] == 1.5
+    assert table.row(master[0])["setup_min"] == 10.0
+    assert table.time_map('nc_min') == {"A": 90.0, "B": _legacy_times(master[1])[0], "C": 0.0}
+    # マスタ外の dict はその場で計算する
+    assert table.unit_times(_item("X", unit=1.0)) == _legacy_times(_item("X", unit=1.0))
+
+
+def test_table_is_shared_per_list_and_version():
+    master = [_item("A"), _item("B")]
+    assert get_process_table(master) is get_process_table(master)
+
+    table = register_version(master, "v1")
+    assert get_process_table(master) is table
+
+    # 同じ版を読み直した別リストでもテーブルを再利用する
+    reloaded = [_item("A"), _item("B")]
+    assert register_version(reloaded, "v1") is table
+    assert get_process_table(reloaded) is table
+    assert table.unit_times(reloaded[1]) == _legacy_times(reloaded[1])
+
+    assert register_version(reloaded, "v1", rebuild=True) is not table
+    process_times._by_version.clear()
+    process_times._by_list.clear()
+
+
+def test_integral_inputs_stay_int():
+    # マスタの工程時間が整数なら旧実装と同じく整数のまま返す（プロンプトで "45分" と表示される）
+    item = _item("I", nc=(30, 15, 0, 0), unit=5, drying=(1, 0), setup=10)
+    item["process"]["assembly"] = {"cut_off_min": 0, "bonding_min": 0, "drying_hr": 0}
+    item["process"]["manual"] = {"fitting_min": 0, "machine_work_min": 0, "sanding_min": 20, "assembly_min": 5}
+    table = get_process_table([item, _item("F")])
+
+    assert unit_times(item) == table.unit_times(item) == (45, 30, 75)
+    assert all(type(v) is int for v in table.unit_times(item))
+    assert all(type(v) is int for v in unit_times(item))
+    row = table.row(item)
+    assert all(type(v) is int for v in row.values())
+    assert f"NC: {row['nc_min']}分" == "NC: 45分"
+    # 小数を含む行は float のまま
+    assert all(type(v) is float for v in table.unit_times(table._items[1]))
+
+    from logic import zeus_chat
+    context = zeus_chat.build_search_context([dict(item, name="剣", part="本体")], table)
+    assert "NC: 45分, 手: 30分" in context
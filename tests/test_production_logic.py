@@ -3,12 +3,16 @@ import unittest
 import pandas as pd
 import sys
 import os
+import json
+import tempfile
 from datetime import datetime, timedelta
 
 # プロジェクトルートをパスに追加
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from logic.production_logic import calculate_production_events, determine_side
+from logic.production_logic import (
+    calculate_production_events, determine_side, determine_sides, hash_row, hash_rows,
+)
 
 class TestProductionLogic(unittest.TestCase):
     
@@ -65,5 +69,59 @@ class TestProductionLogic(unittest.TestCase):
         self.assertEqual(len(events), 1)
         self.assertEqual(events[0]['extendedProps']['project'], 'NewItem')
 
+    def test_vectorized_helpers_match_row_functions(self):
+        df = pd.DataFrame({
+            'TIMESTAMP': ['2026-01-01 10:00:00', ' 2026-01-02 ', None],
+            'PROJECT': ['ItemA', ' ItemB ', 'ItemC'],
+            'PATH': ['ItemA_FACE.nc', 'rear_op.nc', None],
+        })
+        self.assertEqual(determine_sides(df['PATH']).tolist(), [determine_side(p) for p in df['PATH']])
+        self.assertEqual(hash_rows(df).tolist(), [hash_row(row) for _, row in df.iterrows()])
+
+    def test_group_hashes_keep_row_order(self):
+        now = datetime.now()
+        t1 = now.strftime('%Y-%m-%d %H:%M:%S')
+        t0 = (now - timedelta(minutes=5)).strftime('%Y-%m-%d %H:%M:%S')
+        df = pd.DataFrame({
+            'TIMESTAMP': [t1, t0, t1],
+            'PROJECT': ['ItemA', 'ItemB', 'ItemA'],
+            'PART': ['', '', ''],
+            'PATH': ['ItemA_Back.nc', 'ItemB_Face.nc', 'ItemA_Face.nc'],
+        })
+        events = {e['extendedProps']['project']: e for e in calculate_production_events(df)}
+        expected = ",".join(hash_row(df.iloc[i]) for i in (0, 2))
+        self.assertEqual(events['ItemA']['extendedProps']['source_hashes'], expected)
+        self.assertEqual(events['ItemA']['extendedProps']['confidence'], 'high')
+        self.assertEqual(events['ItemA']['extendedProps']['atlas_timestamp'], t1)
+
+    def test_incremental_matches_full(self):
+        now = datetime.now()
+        rows = [{
+            'TIMESTAMP': (now - timedelta(days=i % 3, minutes=i)).strftime('%Y-%m-%d %H:%M:%S'),
+            'PROJECT': f"Item{i % 4}",
+            'PART': '',
+            'PATH': 'x_Face.nc' if i % 2 else 'x_Back.nc',
+        } for i in range(40)]
+        full = pd.DataFrame(rows)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_path = os.path.join(tmp_dir, 'state.json')
+            for n in (10, 10, 25, 40):
+                df = full.iloc[:n].reset_index(drop=True)
+                self.assertEqual(
+                    calculate_production_events(df, incremental=True, state_path=state_path),
+                    calculate_production_events(df),
+                )
+            with open(state_path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['row_count'], 40)
+
+            # 既存行が書き換わっていたら全件を再集計する
+            changed = full.copy()
+            changed.loc[39, 'PATH'] = 'x_Other.nc'
+            self.assertEqual(
+                calculate_production_events(changed, incremental=True, state_path=state_path),
+                calculate_production_events(changed),
+            )
+
 if __name__ == '__main__':
     unittest.main()
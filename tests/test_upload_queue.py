@@ -0,0 +1,116 @@
+"""
+test_upload_queue.py - Drive アップロードの書き込みキュー (upload_queue) の単体テスト
+"""
+
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+from tenacity import wait_none
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import drive_utils, upload_queue
+
+
+@pytest.fixture(autouse=True)
+def fresh_queue():
+    # 他のテストが起動したワーカーが patch した予約を横取りしないよう、前後で停止させる
+    assert upload_queue.shutdown(5)
+    with patch.object(upload_queue, '_pending', {}), \
+         patch.object(upload_queue, '_status', {'uploading': None, 'uploaded': 0,
+                                                'last_uploaded_at': None, 'last_error': None}), \
+         patch.object(upload_queue, 'COALESCE_WINDOW_SEC', 0.2), \
+         patch.object(upload_queue._upload_with_retry.retry, 'wait', wait_none()):
+        yield
+        assert upload_queue.shutdown(5)
+
+
+class TestUploadQueue:
+
+    def test_repeated_writes_are_coalesced(self):
+        calls = []
+        for path in ('a1.json', 'a2.json', 'a3.json'):
+            upload_queue.enqueue(path, 'FILE_A', lambda p, f: calls.append((p, f)))
+        upload_queue.enqueue('b.json', 'FILE_B', lambda p, f: calls.append((p, f)))
+
+        assert upload_queue.flush(5)
+        assert sorted(calls) == [('a3.json', 'FILE_A'), ('b.json', 'FILE_B')]
+        assert upload_queue.status()['uploaded'] == 2
+
+    def test_enqueue_returns_while_upload_is_running(self):
+        gate = threading.Event()
+        started = threading.Event()
+
+        def slow_upload(path, file_id):
+            started.set()
+            gate.wait(5)
+
+        upload_queue.enqueue('a.json', 'FILE_A', slow_upload)
+        upload_queue.flush(0.01)  # 期限を待たずに送らせる
+        assert started.wait(5)
+        # 送信中でも予約はすぐに戻り、同じファイルの次の版として積まれる
+        upload_queue.enqueue('a.json', 'FILE_A', slow_upload)
+        assert upload_queue.status()['pending'] == 2
+        gate.set()
+        assert upload_queue.flush(5)
+
+    def test_transient_failures_are_retried(self):
+        attempts = []
+
+        def flaky(path, file_id):
+            attempts.append(path)
+            if len(attempts) < 3:
+                raise ConnectionError('reset')
+
+        upload_queue.enqueue('a.json', 'FILE_A', flaky)
+        assert upload_queue.flush(5)
+        assert len(attempts) == 3
+        assert upload_queue.status()['last_error'] is None
+
+    def test_gives_up_after_max_attempts(self):
+        attempts = []
+
+        def broken(path, file_id):
+            attempts.append(path)
+            raise ConnectionError('down')
+
+        upload_queue.enqueue('a.json', 'FILE_A', broken)
+        assert upload_queue.flush(5)
+        assert len(attempts) == upload_queue.MAX_ATTEMPTS
+        assert 'down' in upload_queue.status()['last_error']
+
+    def test_permanent_failure_is_not_retried(self):
+        attempts = []
+
+        def unauthenticated(path, file_id):
+            attempts.append(path)
+            raise upload_queue.PermanentUploadError('認証失敗')
+
+        upload_queue.enqueue('a.json', 'FILE_A', unauthenticated)
+        assert upload_queue.flush(5)
+        assert len(attempts) == 1
+        assert '認証失敗' in upload_queue.status()['last_error']
+
+
+class TestUploadToDrive:
+
+    def test_cloud_is_read_only(self, tmp_path):
+        path = tmp_path / 'event_master.json'
+        path.write_text('[]', encoding='utf-8')
+        with patch.object(drive_utils, '_is_cloud', return_value=True), \
+             patch.object(upload_queue, 'enqueue') as enqueue:
+            ok, msg = drive_utils.upload_to_drive(str(path), 'FILE_A')
+        assert ok and 'Read-Only' in msg
+        enqueue.assert_not_called()
+
+    def test_local_write_is_queued(self, tmp_path):
+        path = tmp_path / 'event_master.json'
+        path.write_text('[]', encoding='utf-8')
+        with patch.object(drive_utils, '_is_cloud', return_value=False), \
+             patch.object(upload_queue, 'enqueue') as enqueue:
+            ok, _msg = drive_utils.upload_to_drive(str(path), 'FILE_A')
+        assert ok
+        enqueue.assert_called_once_with(str(path), 'FILE_A', drive_utils._upload_file)
@@ -0,0 +1,81 @@
+"""
+test_workbook.py - workbook モジュールの単体テスト
+
+ParsedWorkbook が返すDataFrameが pd.read_excel と同一であること、
+同じバイナリに対してパース結果が共有されることを検証する。
+"""
+
+import io
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import workbook as wb_module
+from logic.workbook import get_workbook, column_index
+
+
+def _build_excel_bytes():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = '商品マスタ'
+    ws.append(['ID', '商品名', '単価1', '単価1', '', '日付', 'フラグ'])
+    ws.append(['P001', 'テストA', 50000, 1.5, None, datetime(2025, 12, 14), True])
+    ws.append(['P002', None, 30000, 2, None, datetime(2025, 12, 15), False])
+    ws.append([None, '合計', None, 3.25, 'x', None, None])
+
+    ws2 = wb.create_sheet('クリマ2512')
+    ws2.append([None, '区分', 'ID'] + [None] * 33 + ['残数'])
+    for i in range(1, 5):
+        ws2.append([None, i, f'P00{i}'] + [None] * 33 + [i * 2])
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def excel_bytes():
+    wb_module._cache.clear()
+    return _build_excel_bytes()
+
+
+class TestParsedWorkbook:
+
+    @pytest.mark.parametrize("sheet, kwargs", [
+        ('商品マスタ', {}),
+        ('商品マスタ', {'header': None}),
+        ('クリマ2512', {'usecols': 'C,AK'}),
+        ('クリマ2512', {'header': None}),
+    ])
+    def test_matches_read_excel(self, excel_bytes, sheet, kwargs):
+        expected = pd.read_excel(io.BytesIO(excel_bytes), sheet_name=sheet, **kwargs)
+        actual = get_workbook(excel_bytes).sheet(sheet, **kwargs)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_same_bytes_share_workbook(self, excel_bytes):
+        first = get_workbook(excel_bytes)
+        second = get_workbook(bytes(excel_bytes))
+        assert first is second
+        assert first.sheet_names == ['商品マスタ', 'クリマ2512']
+
+    def test_returned_frame_is_copy(self, excel_bytes):
+        wb = get_workbook(excel_bytes)
+        df = wb.sheet('商品マスタ')
+        df['ID'] = 'changed'
+        assert wb.sheet('商品マスタ')['ID'].iloc[0] == 'P001'
+
+    def test_missing_sheet_raises(self, excel_bytes):
+        with pytest.raises(ValueError):
+            get_workbook(excel_bytes).sheet('イベントマスタ')
+
+
+def test_column_index():
+    assert column_index('A') == 0
+    assert column_index('C') == 2
+    assert column_index('ak') == 36
@@ -0,0 +1,37 @@
+"""
+test_zeus_chat.py - 軍師Zeus のプロンプト部品（本日の成果）の単体テスト
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from logic import history_store, zeus_chat
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "history_summary.jsonl")
+    with patch.object(history_store, 'HISTORY_PATH', path), \
+         patch.object(history_store, 'LEGACY_HISTORY_PATH', str(tmp_path / "history_summary.json")), \
+         patch.object(zeus_chat, 'load_master_columns', side_effect=FileNotFoundError):
+        yield path
+
+
+def _scan(ts, details):
+    return {"timestamp": ts, "type": "scan",
+            "details": {k: {"count": v, "target": 10} for k, v in details.items()}}
+
+
+def test_daily_achievements_skip_empty_details_before_today(store_path):
+    history_store.append_snapshot(_scan("2026-10-10T10:00:00", {"A": 1}))
+    history_store.append_snapshot(_scan("2026-10-16T10:00:00", {"A": 5}))
+    history_store.append_snapshot({"timestamp": "2026-10-17T10:00:00", "type": "scan", "details": {}})
+    history_store.append_snapshot(_scan("2026-10-18T10:00:00", {"A": 7}))
+
+    # 比較対象は最初のログ (A=1) ではなく、前日以前で details 付きの最後のログ (A=5)
+    assert zeus_chat.get_daily_achievements() == "★本日の成果: A +2！！"